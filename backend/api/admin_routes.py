@@ -0,0 +1,83 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from backend.services.detection_replay import replay_detections, DETECTION_CONF, DETECTION_ORDERS, RAW_DETECTION_FLOOR
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.image_quality import get_image_quality_stats
+from backend.services.migration_progress import get_migration_progress
+from backend.services.model_registry import get_model_registry, activate_model, rollback_model
+from backend.services.model.ImageQualityStats import ImageQualityStats
+from backend.services.model.MigrationProgress import MigrationProgress
+from backend.services.model.ModelRegistry import ModelRegistry, ModelSwap
+from backend.services.model.ReplayReport import ReplayReport
+from backend.services.model.ReprocessJob import ReprocessJob, ReprocessDiff
+from backend.services.reprocess_jobs import request_reprocess, get_reprocess_job, get_reprocess_diff, \
+    to_reprocess_job
+
+router = APIRouter()
+
+DETECTION_ORDER_PATTERN = f"^({'|'.join(DETECTION_ORDERS)})$"
+
+
+@router.get("/admin/migrations", response_model=list[MigrationProgress])
+async def get_migrations() -> list[MigrationProgress]:
+    return get_migration_progress()
+
+
+@router.post("/admin/reprocess-jobs", response_model=ReprocessJob, status_code=202)
+async def create_reprocess_job(model: Annotated[str, Query()] = "best.pt") -> ReprocessJob:
+    try:
+        return to_reprocess_job(request_reprocess(model))
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No model file with the given name.")
+
+
+@router.get("/admin/reprocess-jobs/{job_id}", response_model=ReprocessJob)
+async def get_reprocess_job_status(job_id: str) -> ReprocessJob:
+    try:
+        return to_reprocess_job(get_reprocess_job(job_id))
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No reprocessing job found with the given ID.")
+
+
+@router.get("/admin/reprocess-jobs/{job_id}/diff", response_model=list[ReprocessDiff])
+async def get_reprocess_job_diff(job_id: str) -> list[ReprocessDiff]:
+    try:
+        return get_reprocess_diff(job_id)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No reprocessing job found with the given ID.")
+
+
+@router.post("/admin/detections/replay", response_model=ReplayReport)
+async def replay_stored_detections(conf: Annotated[float, Query(ge=RAW_DETECTION_FLOOR, le=1)] = DETECTION_CONF,
+                                   order: Annotated[str, Query(pattern=DETECTION_ORDER_PATTERN)] = "x",
+                                   apply: Annotated[bool, Query()] = False) -> ReplayReport:
+    return ReplayReport(**await run_in_threadpool(replay_detections, conf, order, apply))
+
+
+@router.get("/admin/models", response_model=ModelRegistry)
+async def get_models() -> ModelRegistry:
+    return await run_in_threadpool(get_model_registry)
+
+
+@router.post("/admin/models/{name}/activate", response_model=ModelSwap, status_code=202)
+async def activate_model_version(name: str) -> ModelSwap:
+    try:
+        return await run_in_threadpool(activate_model, name)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No model file with the given name.")
+
+
+@router.post("/admin/models/rollback", response_model=ModelSwap, status_code=202)
+async def rollback_model_version() -> ModelSwap:
+    try:
+        return await run_in_threadpool(rollback_model)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No previous model version to roll back to.")
+
+
+@router.get("/admin/image-quality", response_model=ImageQualityStats)
+async def get_image_quality() -> ImageQualityStats:
+    return get_image_quality_stats()
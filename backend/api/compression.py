@@ -0,0 +1,69 @@
+"""
+Response compression negotiated per request from Accept-Encoding: brotli when the
+client accepts it (and the brotli package is installed), gzip otherwise.
+"""
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder, \
+    DEFAULT_EXCLUDED_CONTENT_TYPES
+from starlette.types import Receive, Scope, Send
+
+from backend.api.responses import accepted
+from backend.services.export_jobs import EXPORT_MEDIA_TYPES
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# exports other than csv are already compressed or binary
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + tuple(
+    media_type for file_format, media_type in EXPORT_MEDIA_TYPES.items() if file_format != "csv")
+# levels for dynamic responses, the maximum ones cost far more CPU than they save
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app, minimum_size: int = 1024):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL,
+                         exclude_content_types=EXCLUDED_CONTENT_TYPES)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and "br" in encodings:
+            responder = BrotliResponder(self.app, self.minimum_size, thread_minimum_size=self.thread_minimum_size,
+                                        exclude_content_types=self.exclude_content_types)
+        elif "gzip" in encodings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size,
+                                      exclude_content_types=self.exclude_content_types)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=self.exclude_content_types)
+        await responder(scope, receive, send)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, *, thread_minimum_size: int = 128 * 1024,
+                 exclude_content_types=EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # like gzip, large bodies are compressed off the event loop
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compressed = self._compressor.process(body)
+        return compressed + (self._compressor.flush() if more_body else self._compressor.finish())
@@ -1,18 +1,43 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Response, Query
+import os
+from datetime import date
+from typing import Annotated, Optional, Iterator
 
-from backend.services.crud.crud_files import get_file_from_db
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response, Query, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from backend.api.responses import negotiated_response
+from backend.services.annotated_images import get_annotated_image
+from backend.services.blob_store import LocalFile
+from backend.services.crud.crud_files import open_file_from_db, get_file_content_type
 from backend.services.crud.crud_monthly_consumption import get_monthly_consumption_from_db, \
-    get_all_monthly_consumption_from_db, \
+    get_all_monthly_consumption_rows, \
     update_monthly_consumption_in_db, delete_monthly_consumption_from_db, get_latest_monthly_consumption_from_db
 from backend.services.exception import ResultIsNotFoundException
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+from backend.services.exception.ImageQualityTooLowException import ImageQualityTooLowException
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.exception.ResultIsAlreadyExistsException import ResultIsAlreadyExistsException
-from backend.services.export_monthly_consumption import build_csv_bytes, build_xlsx_bytes, build_pdf_bytes
+from backend.services.export_jobs import request_export, wait_for_export_job, get_export_job, get_export_artifact, \
+    to_export_job, EXPORT_MEDIA_TYPES, EXPORT_FILENAMES
+from backend.services.export_monthly_consumption import EXPORT_COLUMNS
+from backend.services.image_renditions import get_rendition_file_id, RENDITION_SIZES
+from backend.services.model.ExportJob import ExportJob
 from backend.services.model.MonthlyConsumption import MonthlyConsumption
 from backend.services.process_image import ProcessImage
 
 router = APIRouter()
 
+FILE_STREAM_CHUNK_SIZE = 256 * 1024
+FILE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+RENDITION_SIZE_PATTERN = f"^({'|'.join(RENDITION_SIZES)})$"
+
+EXPORT_FORMAT_PATTERN = "^(csv|xlsx|pdf|parquet|arrow)$"
+# readings carry conf_chars/conf_values, ?expand=conf_array adds the per-digit objects
+EXPAND_PATTERN = "^conf_array$"
+# how long GET /monthly-consumptions/export waits for a background export before answering 202
+EXPORT_WAIT_SECONDS = 60
 
 
 @router.post("/monthly-consumption", response_model=MonthlyConsumption)
@@ -21,9 +46,9 @@ async def process_image(file: UploadFile = File(...)) -> MonthlyConsumption:
         image_processor = ProcessImage()
         monthly_consumption = image_processor.process_image(file)
         monthly_consumption.original_file = str(monthly_consumption.original_file)
-        monthly_consumption.label_file = str(monthly_consumption.label_file)
-        monthly_consumption.file_label_name = str(monthly_consumption.file_label_name)
         return monthly_consumption
+    except ImageQualityTooLowException as e:
+        raise HTTPException(status_code=422, detail=e.message)
     except ResultIsNotFoundException.ResultIsNotFoundException:
         raise HTTPException(status_code=422,
                             detail="No number has been found in the image. Please try again with a clearer image.")
@@ -33,18 +58,21 @@ async def process_image(file: UploadFile = File(...)) -> MonthlyConsumption:
 
 
 @router.get("/monthly-consumption/latest", response_model=MonthlyConsumption)
-async def get_latest_monthly_consumption() -> MonthlyConsumption:
+async def get_latest_monthly_consumption(
+        expand: Annotated[Optional[str], Query(pattern=EXPAND_PATTERN)] = None) -> MonthlyConsumption:
     try:
-        monthly_consumption = get_latest_monthly_consumption_from_db()
+        monthly_consumption = get_latest_monthly_consumption_from_db(expand == "conf_array")
         return monthly_consumption
     except NoObjectHasFoundException:
         raise HTTPException(status_code=404, detail="No object found with the given ID.")
 
 
 @router.get("/monthly-consumption/{monthly_consumption_id}", response_model=MonthlyConsumption)
-async def get_monthly_consumption(monthly_consumption_id: str) -> MonthlyConsumption:
+async def get_monthly_consumption(monthly_consumption_id: str,
+                                  expand: Annotated[Optional[str], Query(pattern=EXPAND_PATTERN)] = None
+                                  ) -> MonthlyConsumption:
     try:
-        monthly_consumption = get_monthly_consumption_from_db(monthly_consumption_id)
+        monthly_consumption = get_monthly_consumption_from_db(monthly_consumption_id, expand == "conf_array")
         return monthly_consumption
     except NoObjectHasFoundException:
         raise HTTPException(status_code=404, detail="No object found with the given ID.")
@@ -61,8 +89,11 @@ async def update_monthly_consumption(monthly_consumption_id: str,
 
 
 @router.get("/monthly-consumption", response_model=list[MonthlyConsumption])
-async def get_all_monthly_consumptions() -> list[MonthlyConsumption]:
-    return get_all_monthly_consumption_from_db()
+async def get_all_monthly_consumptions(
+        expand: Annotated[Optional[str], Query(pattern=EXPAND_PATTERN)] = None,
+        accept: Annotated[Optional[str], Header()] = None) -> Response:
+    # the rows already have the response shape, response_model only documents it
+    return negotiated_response(get_all_monthly_consumption_rows(expand == "conf_array"), accept)
 
 
 @router.delete("/monthly-consumption/{monthly_consumption_id}")
@@ -73,37 +104,185 @@ async def delete_monthly_consumption(monthly_consumption_id: str):
         raise HTTPException(status_code=404, detail="No object found with the given ID.")
 
 
+def _parse_range(range_header: str, length: int) -> Optional[tuple[int, int]]:
+    # only a single byte range is supported, anything else is answered with the full file
+    unit, _, spec = range_header.partition("=")
+    start, separator, end = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not separator:
+        return None
+    try:
+        if start:
+            first, last = int(start), int(end) if end else length - 1
+        else:
+            # suffix range: the last N bytes
+            first, last = max(length - int(end), 0), length - 1
+    except ValueError:
+        return None
+    if first >= length or last < first:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable.",
+                            headers={"Content-Range": f"bytes */{length}"})
+    return first, min(last, length - 1)
+
+
+def _iter_file(grid_out, start: int, length: int) -> Iterator[bytes]:
+    try:
+        grid_out.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = grid_out.read(min(FILE_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        grid_out.close()
+
+
 @router.get("/monthly-consumption/file/{file_id}")
-async def get_file(file_id: str):
-    file_data = get_file_from_db(file_id)
-    if file_data:
-        return Response(
-            content=file_data,
-            media_type="image/jpg",
-            headers={"Content-Disposition": f"attachment; filename={file_id}.jpg"})
-    else:
+async def get_file(file_id: str,
+                   size: Annotated[Optional[str], Query(pattern=RENDITION_SIZE_PATTERN)] = None,
+                   range_header: Annotated[Optional[str], Header(alias="Range")] = None,
+                   if_range: Annotated[Optional[str], Header()] = None,
+                   if_none_match: Annotated[Optional[str], Header()] = None):
+    try:
+        stored_file_id = file_id
+        if size:
+            stored_file_id = await run_in_threadpool(get_rendition_file_id, file_id, size)
+        grid_out = open_file_from_db(stored_file_id)
+    except NoObjectHasFoundException:
         raise HTTPException(status_code=404, detail="No file found with the given ID.")
+    except FileIsNotAnImageException:
+        raise HTTPException(status_code=415, detail="Renditions are only available for image files.")
 
+    # GridFS files are never modified in place, so the file id is a strong validator
+    etag = f'"{grid_out._id}"'
+    extension = os.path.splitext(grid_out.filename or "")[1] or ".jpg"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": FILE_CACHE_CONTROL,
+        "Content-Disposition": f"attachment; filename={file_id}{extension}",
+    }
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        grid_out.close()
+        return Response(status_code=304, headers=headers)
 
-@router.get("/monthly-consumptions/export")
-async def export_monthly_consumptions(file_format: str = Query("csv", pattern="^(csv|xlsx|pdf)$")):
-    if file_format == "csv":
-        data = build_csv_bytes()
-        media_type = "text/csv"
-        filename = "monthly_consumption.csv"
-
-    elif file_format == "xlsx":
-        data = build_xlsx_bytes()
-        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        filename = "monthly_consumption.xlsx"
-
-    else:
-        data = build_pdf_bytes()
-        media_type = "application/pdf"
-        filename = "monthly_consumption.pdf"
-
-    return Response(
-        content=data,
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    if isinstance(grid_out, LocalFile):
+        # served by path, FileResponse handles Range itself and uses sendfile where the server supports it
+        return FileResponse(grid_out.path, media_type=get_file_content_type(grid_out), headers=headers)
+
+    length = grid_out.length
+    byte_range = None
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, length)
+        except HTTPException:
+            grid_out.close()
+            raise
+
+    status_code = 200
+    start, end = 0, length - 1
+    if byte_range:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(grid_out, start, end - start + 1), status_code=status_code,
+                             media_type=get_file_content_type(grid_out), headers=headers)
+
+
+@router.get("/monthly-consumption/{monthly_consumption_id}/annotated")
+async def get_annotated_file(monthly_consumption_id: str,
+                             size: Annotated[Optional[str], Query(pattern=RENDITION_SIZE_PATTERN)] = None,
+                             if_none_match: Annotated[Optional[str], Header()] = None):
+    try:
+        data, media_type, key = await run_in_threadpool(get_annotated_image, monthly_consumption_id, size)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No object found with the given ID.")
+    except FileIsNotAnImageException:
+        raise HTTPException(status_code=415, detail="The original file is not an image.")
+
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+def _parse_export_filters(date_from: Optional[date], date_to: Optional[date],
+                          columns: Optional[str]) -> Optional[list[str]]:
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' date must not be after 'to' date.")
+
+    selected_columns = None
+    if columns:
+        selected_columns = [column.strip() for column in columns.split(",") if column.strip()] or None
+        unknown_columns = [column for column in selected_columns or [] if column not in EXPORT_COLUMNS]
+        if unknown_columns:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown export columns: {', '.join(unknown_columns)}. "
+                                       f"Allowed columns: {', '.join(EXPORT_COLUMNS)}.")
+    return selected_columns
+
+
+async def _export_file_response(job: dict) -> StreamingResponse:
+    filename = EXPORT_FILENAMES[job["file_format"]]
+    try:
+        grid_out = await run_in_threadpool(get_export_artifact, job)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=410, detail="The export has expired. Please request it again.")
+    return StreamingResponse(
+        _iter_file(grid_out, 0, grid_out.length),
+        media_type=EXPORT_MEDIA_TYPES[job["file_format"]],
+        headers={"Content-Disposition": f"attachment; filename={filename}", "Content-Length": str(grid_out.length)},
     )
+
+
+@router.get("/monthly-consumptions/export")
+async def export_monthly_consumptions(file_format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+                                      date_from: Annotated[Optional[date], Query(alias="from")] = None,
+                                      date_to: Annotated[Optional[date], Query(alias="to")] = None,
+                                      columns: Annotated[Optional[str], Query()] = None,
+                                      summary: Annotated[bool, Query()] = False):
+    selected_columns = _parse_export_filters(date_from, date_to, columns)
+
+    # served straight from the cached artifact when nothing changed since the last identical export
+    job = await run_in_threadpool(request_export, file_format, date_from, date_to, selected_columns, summary)
+    job = await wait_for_export_job(job, EXPORT_WAIT_SECONDS)
+
+    if job["status"] == "done":
+        return await _export_file_response(job)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail="The export could not be generated. Please try again.")
+    # still running: the client can poll the job instead of holding the request open
+    return JSONResponse(status_code=202, content=jsonable_encoder(to_export_job(job), by_alias=True))
+
+
+@router.post("/monthly-consumptions/export-jobs", response_model=ExportJob, status_code=202)
+async def create_export_job(file_format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+                            date_from: Annotated[Optional[date], Query(alias="from")] = None,
+                            date_to: Annotated[Optional[date], Query(alias="to")] = None,
+                            columns: Annotated[Optional[str], Query()] = None,
+                            summary: Annotated[bool, Query()] = False) -> ExportJob:
+    selected_columns = _parse_export_filters(date_from, date_to, columns)
+    job = await run_in_threadpool(request_export, file_format, date_from, date_to, selected_columns, summary)
+    return to_export_job(job)
+
+
+@router.get("/monthly-consumptions/export-jobs/{job_id}", response_model=ExportJob)
+async def get_export_job_status(job_id: str) -> ExportJob:
+    try:
+        return to_export_job(await run_in_threadpool(get_export_job, job_id))
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No export job found with the given ID.")
+
+
+@router.get("/monthly-consumptions/export-jobs/{job_id}/file")
+async def get_export_job_file(job_id: str):
+    try:
+        job = await run_in_threadpool(get_export_job, job_id)
+    except NoObjectHasFoundException:
+        raise HTTPException(status_code=404, detail="No export job found with the given ID.")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"The export is not ready yet (status: {job['status']}).")
+    return await _export_file_response(job)
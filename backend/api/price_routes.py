@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from typing import Annotated, Optional
 
-from backend.services.crud.crud_electricity_price import get_all_prices_from_db, get_price_from_db, save_price_to_db, \
+from fastapi import APIRouter, HTTPException, Response, Header
+
+from backend.api.responses import negotiated_response
+from backend.services.crud.crud_electricity_price import get_all_price_rows, get_price_from_db, save_price_to_db, \
     update_price_in_db, delete_price_from_db
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.model.ElectricityPrice import ElectricityPrice
@@ -9,8 +12,8 @@ router = APIRouter()
 
 
 @router.get("/electricity-prices", response_model=list[ElectricityPrice])
-async def get_prices() -> list[ElectricityPrice]:
-    return get_all_prices_from_db()
+async def get_prices(accept: Annotated[Optional[str], Header()] = None) -> Response:
+    return negotiated_response(get_all_price_rows(), accept)
 
 
 @router.get("/electricity-price/{electricity_price_id}", response_model=ElectricityPrice)
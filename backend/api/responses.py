@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import msgpack
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response for plain rows read from the database (dicts, lists, datetimes and
+    ObjectIds). The rows are encoded as they are, without a response_model pass, so
+    only use it for data this service stored itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_json_default)
+
+
+class MsgPackResponse(Response):
+    """
+    MessagePack version of ORJSONResponse. Datetimes are sent as MessagePack timestamps
+    (extension type -1), naive ones are taken as UTC like pymongo returns them.
+    """
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def negotiated_response(content: Any, accept: Optional[str]) -> Response:
+    """
+    MsgPackResponse when the Accept header asks for MessagePack, ORJSONResponse otherwise.
+    """
+    if accepts_msgpack(accept):
+        return MsgPackResponse(content, headers={"Vary": "Accept"})
+    return ORJSONResponse(content, headers={"Vary": "Accept"})
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    return not accepted(accept).isdisjoint(MSGPACK_MEDIA_TYPES)
+
+
+def accepted(header: Optional[str]) -> set[str]:
+    """
+    Lower-cased values of an Accept or Accept-Encoding header, without the ones the
+    client refuses with q=0.
+    """
+    values = set()
+    for item in (header or "").split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        quality = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            refused = float(quality) <= 0
+        except ValueError:
+            refused = False
+        if value and not refused:
+            values.add(value.lower())
+    return values
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        return msgpack.Timestamp.from_datetime(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not MessagePack serializable: {type(value).__name__}")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
 from backend.services.crud.crud_settings import get_setting_from_db, update_setting_in_db
+from backend.services.image_retention import get_retention_job
+from backend.services.model.RetentionJob import RetentionJob
 from backend.services.model.Settings import Settings
 
 router = APIRouter()
@@ -15,3 +17,8 @@ async def get_settings():
 async def update_settings(setting: Settings) -> Settings:
     update_setting_in_db(setting)
     return get_setting_from_db()
+
+
+@router.get("/settings/retention", response_model=RetentionJob)
+async def get_retention_status() -> RetentionJob:
+    return get_retention_job()
@@ -1,13 +1,39 @@
 import threading
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from pymongo.errors import PyMongoError
+from backend.api import admin_routes
+from backend.api.compression import CompressionMiddleware
 from backend.api import monthly_consumption_routes
 from backend.api import price_routes
 from backend.api import settings_routes
 from backend.migrations.runner import run_data_migrations
+from backend.services.crud.crud_files import create_file_ref_indexes
+from backend.services.crud.crud_monthly_consumption import create_monthly_consumption_indexes
 from backend.services.db_client import get_db
+from backend.services.export_jobs import create_export_job_indexes
+from backend.services.image_retention import run_retention_periodically
+from backend.services.reprocess_jobs import resume_reprocess_jobs
+
+# MongoDB may still be starting when the app does (docker compose starts both at once)
+INDEX_RETRY_SECONDS = 5
+
+
+def create_indexes():
+    # Indexes for the date-range export queries, file reference counts and the export job cache
+    # (no-op if they exist), retried until MongoDB is reachable
+    while True:
+        try:
+            create_monthly_consumption_indexes()
+            create_file_ref_indexes()
+            create_export_job_indexes()
+            return
+        except PyMongoError as e:
+            print(f"[Startup] Could not create indexes, retrying in {INDEX_RETRY_SECONDS}s: {e}")
+            time.sleep(INDEX_RETRY_SECONDS)
 
 
 @asynccontextmanager
@@ -15,9 +41,14 @@ async def lifespan(app: FastAPI):
 
     db = get_db()
 
-    # Run migrations in background (non-blocking)
+    # Create indexes and run migrations in background (non-blocking, so startup does not wait for
+    # MongoDB), then resume interrupted reprocessing jobs and run the image retention pass every
+    # RETENTION_INTERVAL_HOURS (no-op unless configured)
     def _run_migrations():
+        create_indexes()
         run_data_migrations(db)
+        resume_reprocess_jobs()
+        run_retention_periodically()
 
     thread = threading.Thread(
         target=_run_migrations,
@@ -50,7 +81,10 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+# brotli or gzip, whichever the client accepts
+app.add_middleware(CompressionMiddleware)
 
 app.include_router(monthly_consumption_routes.router)
 app.include_router(price_routes.router)
 app.include_router(settings_routes.router)
+app.include_router(admin_routes.router)
@@ -6,6 +6,7 @@ Backfills:
 - score
 
 For all documents in monthly_consumptions collection.
+Each batch is fetched concurrently, inferred in one model call and written with one bulk_write.
 Resumable and safe on restart.
 """
 
@@ -13,26 +14,29 @@ from datetime import datetime, timezone
 
 import cv2
 import numpy as np
-from bson import ObjectId
-from gridfs import GridFS
-from ultralytics import YOLO
+from pymongo import UpdateOne
+
+from backend.migrations.batching import batch_size, prefetch_files, throttle, torch_threads
+from backend.services.blob_store import get_blob_store
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.inference_model import load_model
+from backend.services.model_registry import active_model_path
 
 
 MIGRATION_ID = "20260217214100_backfill_new_fields"
 
 COLLECTION_NAME = "monthly_consumptions"
-BATCH_SIZE = 10
-MODEL_PATH = "models/best.pt"
+BATCH_SIZE = batch_size(32)
 
 
 # =========================
 # Entry Point
 # =========================
 
-def run(db):
+def run(db, lease=None):
     migrations = db["data_migrations"]
     collection = db[COLLECTION_NAME]
-    fs = GridFS(db)
+    store = get_blob_store()
 
     migration = migrations.find_one({"_id": MIGRATION_ID})
     if migration and migration.get("status") == "done":
@@ -42,11 +46,15 @@ def run(db):
 
     print(f"[Migration] Starting {MIGRATION_ID}")
 
-    model = YOLO(MODEL_PATH)
+    # its own instance of the active version, uploads keep using theirs concurrently
+    model = load_model(active_model_path())
     last_id = migration.get("last_id")
 
     try:
         while True:
+            if lease is not None:
+                lease.check()
+
             docs = _get_batch(collection, last_id)
 
             if not docs:
@@ -57,12 +65,15 @@ def run(db):
             last_id = _process_batch(
                 docs,
                 collection,
-                fs,
+                store,
                 model,
                 migrations,
                 last_id,
             )
 
+    except LeaseLostException:
+        # another process owns the migration now, its record is left to it
+        raise
     except Exception as e:
         _mark_failed(migrations, str(e))
         raise
@@ -133,23 +144,23 @@ def _get_batch(collection, last_id):
     )
 
 
-def _process_batch(docs, collection, fs, model, migrations, last_id):
-    processed_count = 0
-    new_last_id = last_id
+def _process_batch(docs, collection, store, model, migrations, last_id):
+    new_last_id = docs[-1]["_id"] if docs else last_id
 
-    for doc in docs:
-        new_last_id = doc["_id"]
-        _process_doc(doc, collection, fs, model)
-        processed_count += 1
+    operations = _process_docs(docs, store, model)
+    if operations:
+        collection.bulk_write(operations, ordered=False)
 
     migrations.update_one(
         {"_id": MIGRATION_ID},
         {
             "$set": {"last_id": new_last_id},
-            "$inc": {"processed": processed_count},
+            "$inc": {"processed": len(docs)},
         },
     )
 
+    throttle(len(docs))
+
     return new_last_id
 
 
@@ -157,28 +168,43 @@ def _process_batch(docs, collection, fs, model, migrations, last_id):
 # Document Processing
 # =========================
 
-def _process_doc(doc, collection, fs, model):
-    original_file_id = doc.get("original_file")
-    if not original_file_id:
-        return
+def _process_docs(docs, store, model):
+    files = prefetch_files(store, [doc.get("original_file") for doc in docs])
 
-    file_bytes = fs.get(ObjectId(original_file_id)).read()
+    doc_ids = []
+    images = []
+    for doc in docs:
+        file_bytes = files.get(doc.get("original_file"))
+        if file_bytes is None:
+            continue
 
-    image = _decode_image(file_bytes)
-    if image is None:
-        return
+        image = _decode_image(file_bytes)
+        if image is None:
+            continue
 
-    conf_array, score = _infer_conf_and_score(image, model)
+        doc_ids.append(doc["_id"])
+        images.append(image)
 
-    collection.update_one(
-        {"_id": doc["_id"]},
-        {
-            "$set": {
-                "conf_array": conf_array,
-                "score": score,
-            }
-        },
-    )
+    if not images:
+        return []
+
+    with torch_threads():
+        results = model(images)
+
+    operations = []
+    for doc_id, result in zip(doc_ids, results):
+        conf_array, score = _conf_and_score(result, model)
+        operations.append(UpdateOne(
+            {"_id": doc_id},
+            {
+                "$set": {
+                    "conf_array": conf_array,
+                    "score": score,
+                }
+            },
+        ))
+
+    return operations
 
 
 def _decode_image(file_bytes):
@@ -190,12 +216,10 @@ def _decode_image(file_bytes):
 # Model Inference
 # =========================
 
-def _infer_conf_and_score(image, model):
-    results = model(image)
-
+def _conf_and_score(result, model):
     detections = []
 
-    for box in results[0].obb:
+    for box in result.obb:
         cls = int(box.cls.item())
         conf = float(box.conf.item())
         label = model.names[cls]
@@ -0,0 +1,223 @@
+"""
+Migration: 20261019090000_detections_from_label_files
+
+Converts the eagerly stored annotation artifacts of every reading:
+- parses the YOLO OBB label file (file_label_name) into the detections field
+- deletes the annotated image (label_file), the label file and their renditions from the
+  blob store
+
+The annotated image is rendered on demand from the original and the detections afterwards.
+Resumable and safe on restart.
+"""
+
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from backend.migrations.batching import throttle
+from backend.services.annotated_images import detections_from_label_file
+from backend.services.blob_store import get_blob_store
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+
+MIGRATION_ID = "20261019090000_detections_from_label_files"
+
+COLLECTION_NAME = "monthly_consumptions"
+BATCH_SIZE = 50
+
+
+# =========================
+# Entry Point
+# =========================
+
+def run(db, lease=None):
+    migrations = db["data_migrations"]
+    collection = db[COLLECTION_NAME]
+    store = get_blob_store()
+
+    migration = migrations.find_one({"_id": MIGRATION_ID})
+    if migration and migration.get("status") == "done":
+        return
+
+    migration = _init_migration(migrations, migration)
+
+    print(f"[Migration] Starting {MIGRATION_ID}")
+
+    last_id = migration.get("last_id")
+
+    try:
+        while True:
+            if lease is not None:
+                lease.check()
+
+            docs = _get_batch(collection, last_id)
+
+            if not docs:
+                _mark_done(migrations)
+                print(f"[Migration] Finished {MIGRATION_ID}")
+                return
+
+            last_id = _process_batch(docs, collection, store, migrations, last_id)
+
+    except LeaseLostException:
+        # another process owns the migration now, its record is left to it
+        raise
+    except Exception as e:
+        _mark_failed(migrations, str(e))
+        raise
+
+
+# =========================
+# Migration Setup
+# =========================
+
+def _init_migration(migrations, migration):
+    if not migration:
+        migrations.insert_one(
+            {
+                "_id": MIGRATION_ID,
+                "status": "running",
+                "started_at": _utc_now(),
+                "processed": 0,
+                "last_id": None,
+            }
+        )
+        return migrations.find_one({"_id": MIGRATION_ID})
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"status": "running"}},
+    )
+    return migration
+
+
+def _mark_done(migrations):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "done",
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+def _mark_failed(migrations, error):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "failed",
+                "error": error,
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+# =========================
+# Batch Processing
+# =========================
+
+def _get_batch(collection, last_id):
+    query = {}
+    if last_id:
+        query["_id"] = {"$gt": last_id}
+
+    return list(
+        collection.find(query)
+        .sort("_id", 1)
+        .limit(BATCH_SIZE)
+    )
+
+
+def _process_batch(docs, collection, store, migrations, last_id):
+    processed_count = 0
+    new_last_id = last_id
+
+    for doc in docs:
+        new_last_id = doc["_id"]
+        _process_doc(doc, collection, store)
+        processed_count += 1
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {"last_id": new_last_id},
+            "$inc": {"processed": processed_count},
+        },
+    )
+
+    throttle(len(docs))
+
+    return new_last_id
+
+
+# =========================
+# Document Processing
+# =========================
+
+def _process_doc(doc, collection, store):
+    if "detections" in doc and not doc.get("label_file") and not doc.get("file_label_name"):
+        # uploaded after on-demand rendering was introduced, or already converted
+        return
+
+    detections = doc.get("detections") or _read_detections(doc, store)
+
+    label_file_id = doc.get("label_file")
+    update = {"$set": {"detections": detections, "label_file": None, "file_label_name": None}}
+    rendition_ids = []
+    if label_file_id:
+        rendition_ids = list((doc.get("renditions") or {}).get(str(label_file_id), {}).values())
+        update["$unset"] = {f"renditions.{label_file_id}": ""}
+
+    collection.update_one({"_id": doc["_id"]}, update)
+
+    # delete only after the reading no longer points at the files
+    for file_id in [label_file_id, doc.get("file_label_name"), *rendition_ids]:
+        _delete_file(store, file_id)
+
+
+def _read_detections(doc, store):
+    original_file_id = doc.get("original_file")
+    label_text_id = doc.get("file_label_name")
+    if not original_file_id or not label_text_id:
+        return []
+
+    label_text = _read_file(store, label_text_id)
+    original_bytes = _read_file(store, original_file_id)
+    if label_text is None or original_bytes is None:
+        return []
+
+    image = cv2.imdecode(np.frombuffer(original_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return []
+
+    height, width = image.shape[:2]
+    return detections_from_label_file(label_text.decode(errors="ignore"), width, height, doc.get("conf_array") or [])
+
+
+# =========================
+# Utils
+# =========================
+
+def _read_file(store, file_id):
+    try:
+        with store.open(ObjectId(str(file_id))) as file_data:
+            return file_data.read()
+    except NoFile:
+        return None
+
+
+def _delete_file(store, file_id):
+    # the blob store ignores ids that no longer exist
+    if file_id and ObjectId.is_valid(str(file_id)):
+        store.delete(ObjectId(str(file_id)))
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,224 @@
+"""
+Migration: 20261019100000_content_address_original_files
+
+Moves the original images stored before content-addressed storage into it:
+- hashes every original that has no sha256 in its file metadata
+- registers it in file_refs, or points the reading at an identical file that is
+  already registered and deletes the duplicate (and its renditions)
+
+Resumable and safe on restart: files are skipped once they carry their sha256, an
+interrupted document can at worst leave a reference count one too high, which
+keeps a file alive rather than deleting it early.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+
+from backend.migrations.batching import throttle
+from backend.services.blob_store import get_blob_store, LocalFile, LOCAL_FILES_COLLECTION
+from backend.services.crud.crud_files import FILE_REFS_COLLECTION
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+
+MIGRATION_ID = "20261019100000_content_address_original_files"
+
+COLLECTION_NAME = "monthly_consumptions"
+BATCH_SIZE = 50
+# hashing reads the files without decoding them, so there is no rate limit, only the pause for uploads
+MAX_DOCS_PER_SECOND = 0
+
+
+# =========================
+# Entry Point
+# =========================
+
+def run(db, lease=None):
+    migrations = db["data_migrations"]
+    collection = db[COLLECTION_NAME]
+    store = get_blob_store()
+
+    migration = migrations.find_one({"_id": MIGRATION_ID})
+    if migration and migration.get("status") == "done":
+        return
+
+    migration = _init_migration(migrations, migration)
+
+    print(f"[Migration] Starting {MIGRATION_ID}")
+
+    last_id = migration.get("last_id")
+
+    try:
+        while True:
+            if lease is not None:
+                lease.check()
+
+            docs = _get_batch(collection, last_id)
+
+            if not docs:
+                _mark_done(migrations)
+                print(f"[Migration] Finished {MIGRATION_ID}")
+                return
+
+            last_id = _process_batch(docs, db, store, migrations, last_id)
+
+    except LeaseLostException:
+        # another process owns the migration now, its record is left to it
+        raise
+    except Exception as e:
+        _mark_failed(migrations, str(e))
+        raise
+
+
+# =========================
+# Migration Setup
+# =========================
+
+def _init_migration(migrations, migration):
+    if not migration:
+        migrations.insert_one(
+            {
+                "_id": MIGRATION_ID,
+                "status": "running",
+                "started_at": _utc_now(),
+                "processed": 0,
+                "last_id": None,
+            }
+        )
+        return migrations.find_one({"_id": MIGRATION_ID})
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"status": "running"}},
+    )
+    return migration
+
+
+def _mark_done(migrations):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "done",
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+def _mark_failed(migrations, error):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "failed",
+                "error": error,
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+# =========================
+# Batch Processing
+# =========================
+
+def _get_batch(collection, last_id):
+    query = {}
+    if last_id:
+        query["_id"] = {"$gt": last_id}
+
+    return list(
+        collection.find(query)
+        .sort("_id", 1)
+        .limit(BATCH_SIZE)
+    )
+
+
+def _process_batch(docs, db, store, migrations, last_id):
+    processed_count = 0
+    new_last_id = last_id
+
+    for doc in docs:
+        new_last_id = doc["_id"]
+        _process_doc(doc, db, store)
+        processed_count += 1
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {"last_id": new_last_id},
+            "$inc": {"processed": processed_count},
+        },
+    )
+
+    throttle(len(docs), MAX_DOCS_PER_SECOND)
+
+    return new_last_id
+
+
+# =========================
+# Document Processing
+# =========================
+
+def _process_doc(doc, db, store):
+    original_file_id = doc.get("original_file")
+    if not original_file_id or not ObjectId.is_valid(str(original_file_id)):
+        return
+    original_file_id = ObjectId(str(original_file_id))
+
+    try:
+        file_data = store.open(original_file_id)
+    except NoFile:
+        return
+    with file_data:
+        metadata = file_data.metadata or {}
+        if metadata.get("sha256"):
+            # already stored content addressed
+            return
+        digest = _sha256(file_data)
+    # the metadata lives next to the file: local_files for files on disk, fs.files for GridFS
+    files_collection = LOCAL_FILES_COLLECTION if isinstance(file_data, LocalFile) else "fs.files"
+
+    file_ref = db[FILE_REFS_COLLECTION].find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refcount": 1}, "$setOnInsert": {"file_id": original_file_id}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if file_ref["file_id"] == original_file_id:
+        # set as a whole, files moved without metadata carry a null there
+        db[files_collection].update_one({"_id": original_file_id},
+                                        {"$set": {"metadata": {**metadata, "sha256": digest}}})
+        return
+
+    # an identical file is already stored, share it and drop the duplicate
+    rendition_ids = list((doc.get("renditions") or {}).get(str(original_file_id), {}).values())
+    db[COLLECTION_NAME].update_one(
+        {"_id": doc["_id"]},
+        {
+            "$set": {"original_file": file_ref["file_id"]},
+            "$unset": {f"renditions.{original_file_id}": ""},
+        },
+    )
+    for file_id in [original_file_id, *rendition_ids]:
+        store.delete(ObjectId(str(file_id)))
+
+
+def _sha256(file_data):
+    digest = hashlib.sha256()
+    for chunk in file_data:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =========================
+# Utils
+# =========================
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,191 @@
+"""
+Migration: 20261019110000_move_gridfs_files_to_local_store
+
+Moves every file of the default GridFS bucket to the local blob store, keeping its
+id, filename, upload date and metadata, so readings need no update.
+
+Only runs when BLOB_STORE=local; otherwise it is skipped without being recorded and
+runs on the first start with the local store enabled. Resumable and safe on restart:
+a file already in the local store is not copied again, only removed from GridFS.
+"""
+
+import os
+from datetime import datetime, timezone
+
+from gridfs import GridFSBucket
+
+from backend.migrations.batching import throttle
+from backend.services.blob_store import get_blob_store, LocalBlobStore, LOCAL_FILES_COLLECTION
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+
+MIGRATION_ID = "20261019110000_move_gridfs_files_to_local_store"
+
+COLLECTION_NAME = "fs.files"
+BATCH_SIZE = 50
+# copying files costs no CPU to speak of; the copy still pauses while uploads are inferred
+MAX_DOCS_PER_SECOND = 0
+
+
+# =========================
+# Entry Point
+# =========================
+
+def run(db, lease=None):
+    store = get_blob_store()
+    if not isinstance(store, LocalBlobStore):
+        return
+
+    migrations = db["data_migrations"]
+    bucket = GridFSBucket(db)
+
+    migration = migrations.find_one({"_id": MIGRATION_ID})
+    if migration and migration.get("status") == "done":
+        return
+
+    migration = _init_migration(migrations, migration)
+
+    print(f"[Migration] Starting {MIGRATION_ID} -> {os.path.abspath(store.root)}")
+
+    last_id = migration.get("last_id")
+
+    try:
+        while True:
+            if lease is not None:
+                lease.check()
+
+            files = _get_batch(db, last_id)
+
+            if not files:
+                _mark_done(migrations)
+                print(f"[Migration] Finished {MIGRATION_ID}")
+                return
+
+            last_id = _process_batch(files, db, bucket, store, migrations, last_id)
+
+    except LeaseLostException:
+        # another process owns the migration now, its record is left to it
+        raise
+    except Exception as e:
+        _mark_failed(migrations, str(e))
+        raise
+
+
+# =========================
+# Migration Setup
+# =========================
+
+def _init_migration(migrations, migration):
+    if not migration:
+        migrations.insert_one(
+            {
+                "_id": MIGRATION_ID,
+                "status": "running",
+                "started_at": _utc_now(),
+                "processed": 0,
+                "bytes_moved": 0,
+                "last_id": None,
+            }
+        )
+        return migrations.find_one({"_id": MIGRATION_ID})
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"status": "running"}},
+    )
+    return migration
+
+
+def _mark_done(migrations):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "done",
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+def _mark_failed(migrations, error):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "failed",
+                "error": error,
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+# =========================
+# Batch Processing
+# =========================
+
+def _get_batch(db, last_id):
+    query = {}
+    if last_id:
+        query["_id"] = {"$gt": last_id}
+
+    return list(
+        db[COLLECTION_NAME].find(query)
+        .sort("_id", 1)
+        .limit(BATCH_SIZE)
+    )
+
+
+def _process_batch(files, db, bucket, store, migrations, last_id):
+    processed_count = 0
+    bytes_moved = 0
+    new_last_id = last_id
+
+    for file_doc in files:
+        new_last_id = file_doc["_id"]
+        bytes_moved += _move_file(file_doc, db, bucket, store)
+        processed_count += 1
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {"last_id": new_last_id},
+            "$inc": {"processed": processed_count, "bytes_moved": bytes_moved},
+        },
+    )
+
+    throttle(len(files), MAX_DOCS_PER_SECOND)
+
+    return new_last_id
+
+
+# =========================
+# File Processing
+# =========================
+
+def _move_file(file_doc, db, bucket, store):
+    file_id = file_doc["_id"]
+    moved = 0
+    if db[LOCAL_FILES_COLLECTION].find_one({"_id": file_id}, {"_id": 1}) is None:
+        with bucket.open_download_stream(file_id) as grid_out:
+            store.upload(
+                file_doc.get("filename"),
+                grid_out,
+                metadata=file_doc.get("metadata"),
+                file_id=file_id,
+                upload_date=file_doc.get("uploadDate"),
+            )
+        moved = file_doc.get("length", 0)
+
+    # the local copy is complete (written atomically) before GridFS drops its chunks
+    bucket.delete(file_id)
+    return moved
+
+
+# =========================
+# Utils
+# =========================
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
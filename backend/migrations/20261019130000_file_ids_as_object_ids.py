@@ -0,0 +1,178 @@
+"""
+Migration: 20261019130000_file_ids_as_object_ids
+
+Converts the file references of readings edited through PUT back to ObjectIds:
+- original_file
+- label_file
+- file_label_name
+
+Updates used to write them back in their string form, which lookups by file id
+(renditions, retention, shared originals) do not match.
+Each batch is written with one bulk_write. Resumable and safe on restart.
+"""
+
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from backend.migrations.batching import batch_size, throttle
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+
+MIGRATION_ID = "20261019130000_file_ids_as_object_ids"
+
+COLLECTION_NAME = "monthly_consumptions"
+BATCH_SIZE = batch_size(500)
+# metadata only, not rate limited
+MAX_DOCS_PER_SECOND = 0
+FILE_FIELDS = ("original_file", "label_file", "file_label_name")
+
+
+# =========================
+# Entry Point
+# =========================
+
+def run(db, lease=None):
+    migrations = db["data_migrations"]
+    collection = db[COLLECTION_NAME]
+
+    migration = migrations.find_one({"_id": MIGRATION_ID})
+    if migration and migration.get("status") == "done":
+        return
+
+    migration = _init_migration(migrations, migration)
+
+    print(f"[Migration] Starting {MIGRATION_ID}")
+
+    last_id = migration.get("last_id")
+
+    try:
+        while True:
+            if lease is not None:
+                lease.check()
+
+            docs = _get_batch(collection, last_id)
+
+            if not docs:
+                _mark_done(migrations)
+                print(f"[Migration] Finished {MIGRATION_ID}")
+                return
+
+            last_id = _process_batch(docs, collection, migrations, last_id)
+
+    except LeaseLostException:
+        # another process owns the migration now, its record is left to it
+        raise
+    except Exception as e:
+        _mark_failed(migrations, str(e))
+        raise
+
+
+# =========================
+# Migration Setup
+# =========================
+
+def _init_migration(migrations, migration):
+    if not migration:
+        migrations.insert_one(
+            {
+                "_id": MIGRATION_ID,
+                "status": "running",
+                "started_at": _utc_now(),
+                "processed": 0,
+                "last_id": None,
+            }
+        )
+        return migrations.find_one({"_id": MIGRATION_ID})
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"status": "running"}},
+    )
+    return migration
+
+
+def _mark_done(migrations):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "done",
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+def _mark_failed(migrations, error):
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {
+                "status": "failed",
+                "error": error,
+                "finished_at": _utc_now(),
+            }
+        },
+    )
+
+
+# =========================
+# Batch Processing
+# =========================
+
+def _get_batch(collection, last_id):
+    query = {"$or": [{field: {"$type": "string"}} for field in FILE_FIELDS]}
+    if last_id:
+        query["_id"] = {"$gt": last_id}
+
+    return list(
+        collection.find(query, {field: 1 for field in FILE_FIELDS})
+        .sort("_id", 1)
+        .limit(BATCH_SIZE)
+    )
+
+
+def _process_batch(docs, collection, migrations, last_id):
+    new_last_id = docs[-1]["_id"] if docs else last_id
+
+    operations = [operation for operation in map(_convert_doc, docs) if operation]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+    migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {
+            "$set": {"last_id": new_last_id},
+            "$inc": {"processed": len(docs)},
+        },
+    )
+
+    throttle(len(docs), MAX_DOCS_PER_SECOND)
+
+    return new_last_id
+
+
+# =========================
+# Document Processing
+# =========================
+
+def _convert_doc(doc):
+    converted = {
+        field: ObjectId(doc[field])
+        for field in FILE_FIELDS
+        if isinstance(doc.get(field), str) and ObjectId.is_valid(doc[field])
+    }
+    if not converted:
+        return None
+
+    return UpdateOne({"_id": doc["_id"]}, {"$set": converted})
+
+
+# =========================
+# Utils
+# =========================
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
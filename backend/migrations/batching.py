@@ -0,0 +1,108 @@
+"""
+Helpers for migrations that read stored files in batches.
+
+The batch size comes from MIGRATION_BATCH_SIZE (falling back to the migration's own
+default), and the files of a batch are fetched concurrently from the blob store, so the
+next read does not wait for the previous one.
+
+Migrations run next to live traffic, so they also share a resource budget: throttle()
+after every batch waits while this worker is inferring uploads, and keeps migrations
+that decode images or run the model under MIGRATION_MAX_DOCS_PER_SECOND (metadata-only
+migrations pass their own rate, 0 for none); torch_threads() caps the torch threads
+of their model calls at MIGRATION_TORCH_THREADS.
+
+Both only act within the worker process running the migration. Uploads served by the
+other workers are not seen by throttle(), and the thread cap applies to the whole
+process, so an upload this worker starts during a migration's model call runs with the
+capped threads as well.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from backend.services.inference_activity import inference_busy
+
+
+PREFETCH_WORKERS = int(os.environ.get("MIGRATION_PREFETCH_WORKERS", 8))
+MAX_DOCS_PER_SECOND = float(os.environ.get("MIGRATION_MAX_DOCS_PER_SECOND", 20))
+TORCH_THREADS = int(os.environ.get("MIGRATION_TORCH_THREADS", 1))
+BUSY_POLL_SECONDS = 0.5
+
+_last_batch_at = None
+_threads_lock = threading.Lock()
+_threads_holders = 0
+_threads_restore = None
+
+
+def batch_size(default):
+    value = os.environ.get("MIGRATION_BATCH_SIZE")
+    return max(int(value), 1) if value else default
+
+
+def prefetch_files(store, file_ids, workers=PREFETCH_WORKERS):
+    """
+    Returns {file_id: bytes} for the given ids read from `store`, with None for files
+    that are missing.
+    """
+    return prefetch(lambda file_id: _read_file(store, file_id), file_ids, workers)
+
+
+def prefetch(read, file_ids, workers=PREFETCH_WORKERS):
+    file_ids = list(dict.fromkeys(file_id for file_id in file_ids if file_id))
+    if not file_ids:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(file_ids))) as executor:
+        return dict(zip(file_ids, executor.map(read, file_ids)))
+
+
+def _read_file(store, file_id):
+    try:
+        with store.open(ObjectId(str(file_id))) as file_data:
+            return file_data.read()
+    except NoFile:
+        return None
+
+
+def throttle(docs, max_docs_per_second=MAX_DOCS_PER_SECOND):
+    """
+    Called after a batch of `docs` documents; sleeps until the batch fits the rate limit
+    (none when `max_docs_per_second` is 0) and while request inference is busy.
+    """
+    global _last_batch_at
+    if max_docs_per_second > 0 and _last_batch_at is not None:
+        wait = docs / max_docs_per_second - (time.monotonic() - _last_batch_at)
+        if wait > 0:
+            time.sleep(wait)
+
+    while inference_busy():
+        time.sleep(BUSY_POLL_SECONDS)
+
+    _last_batch_at = time.monotonic()
+
+
+@contextmanager
+def torch_threads(threads=TORCH_THREADS):
+    # the setting is process-wide: overlapping callers (a migration and a reprocess job)
+    # share one cap, and the value from before the first of them is restored by the last
+    import torch
+
+    global _threads_holders, _threads_restore
+    with _threads_lock:
+        if _threads_holders == 0:
+            _threads_restore = torch.get_num_threads()
+            torch.set_num_threads(max(threads, 1))
+        _threads_holders += 1
+    try:
+        yield
+    finally:
+        with _threads_lock:
+            _threads_holders -= 1
+            if _threads_holders == 0:
+                torch.set_num_threads(_threads_restore)
@@ -1,18 +1,51 @@
 import importlib
 import pkgutil
+import time
+
 import backend.migrations as migrations_pkg
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.lease import Lease, lease_owner
+
+# how often a process waiting for another one's migration checks the lease again
+LEASE_POLL_SECONDS = 5
 
 
 def run_data_migrations(db):
     modules = [
         module_name
         for _, module_name, _ in pkgutil.iter_modules(migrations_pkg.__path__)
-        if module_name != "runner"
+        if module_name not in ("runner", "batching")
     ]
+    owner = lease_owner()
 
     # Sort by filename (timestamp prefix)
     for module_name in sorted(modules):
         module = importlib.import_module(f"backend.migrations.{module_name}")
 
         if hasattr(module, "run") and hasattr(module, "MIGRATION_ID"):
-            module.run(db)
+            _run_with_lease(db, module, owner)
+
+
+def _run_with_lease(db, module, owner):
+    # Only one worker/replica runs a migration; the others wait, since later migrations
+    # depend on it, and find it done once the lease is free.
+    migrations = db["data_migrations"]
+    lease = Lease(migrations, f"{module.MIGRATION_ID}:lease", owner)
+
+    while True:
+        if migrations.find_one({"_id": module.MIGRATION_ID, "status": "done"}, {"_id": 1}):
+            return
+        if not lease.acquire():
+            time.sleep(LEASE_POLL_SECONDS)
+            continue
+
+        try:
+            with lease.heartbeat():
+                # the migration checks the lease before every batch and before marking itself done
+                module.run(db, lease)
+            return
+        except LeaseLostException:
+            # another process took the migration over, wait for it like for any other owner
+            print(f"[Migration] Lost the lease of {module.MIGRATION_ID}, stopped")
+        finally:
+            lease.release()
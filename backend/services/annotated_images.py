@@ -0,0 +1,152 @@
+"""
+Annotated meter images rendered on demand.
+
+Readings store the detection geometry (OBB corners, class and confidence) instead
+of an annotated copy of the photo. The annotated image is drawn from the original
+when it is requested and kept in a bounded in-process LRU cache.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from backend.services.crud.crud_files import open_file_from_db
+from backend.services.crud.crud_monthly_consumption import get_monthly_consumption_detections_from_db
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+from backend.services.image_renditions import render_rendition, RENDITION_SIZES, RENDITION_CONTENT_TYPE
+
+ANNOTATED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ANNOTATED_CONTENT_TYPE = "image/jpeg"
+ANNOTATED_JPEG_QUALITY = 90
+BOX_COLOR = (56, 56, 255)
+TEXT_COLOR = (255, 255, 255)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class AnnotatedImageCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+_cache = AnnotatedImageCache(ANNOTATED_CACHE_MAX_BYTES)
+
+
+def detection_x_center(detection: dict) -> float:
+    return sum(x for x, _ in detection["corners"]) / len(detection["corners"])
+
+
+def detections_from_label_file(text: str, width: int, height: int, conf_array: list[dict]) -> list[dict]:
+    # YOLO OBB label rows: class x1 y1 ... x4 y4 [conf], corners normalized to the image size
+    detections = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 9:
+            continue
+        coords = [float(value) for value in parts[1:9]]
+        detections.append({
+            "char": None,
+            "class_id": int(float(parts[0])),
+            "conf": float(parts[9]) if len(parts) > 9 else None,
+            "corners": [[round(coords[i] * width, 1), round(coords[i + 1] * height, 1)] for i in range(0, 8, 2)],
+        })
+    detections.sort(key=detection_x_center)
+
+    # conf_array is in the same left-to-right order and carries the characters and confidences
+    aligned = len(conf_array) == len(detections)
+    for i, detection in enumerate(detections):
+        if aligned:
+            detection["char"] = str(conf_array[i]["char"])
+            if detection["conf"] is None:
+                detection["conf"] = float(conf_array[i]["conf"])
+        else:
+            detection["char"] = str(detection["class_id"])
+            if detection["conf"] is None:
+                detection["conf"] = 0.0
+    return detections
+
+
+def render_annotated_image(image_bytes: bytes, detections: list[dict]) -> bytes:
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileIsNotAnImageException()
+
+    thickness = max(2, round(max(image.shape[:2]) / 400))
+    text_thickness = max(1, thickness // 2)
+    font_scale = thickness / 3
+    for detection in detections:
+        corners = np.rint(np.array(detection["corners"])).astype(np.int32)
+        cv2.polylines(image, [corners], True, BOX_COLOR, thickness, cv2.LINE_AA)
+
+        label = f"{detection['char']} {detection['conf']:.2f}"
+        (text_width, text_height), baseline = cv2.getTextSize(label, FONT, font_scale, text_thickness)
+        left = int(corners[:, 0].min())
+        top = max(int(corners[:, 1].min()) - text_height - baseline, 0)
+        cv2.rectangle(image, (left, top), (left + text_width, top + text_height + baseline), BOX_COLOR, -1)
+        cv2.putText(image, label, (left, top + text_height), FONT, font_scale, TEXT_COLOR, text_thickness,
+                    cv2.LINE_AA)
+
+    encoded, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, ANNOTATED_JPEG_QUALITY])
+    if not encoded:
+        raise FileIsNotAnImageException("The image could not be encoded.")
+    return buffer.tobytes()
+
+
+def _cache_key(reading: dict, size: Optional[str]) -> str:
+    payload = json.dumps([str(reading["original_file"]), reading.get("detections"), size])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_annotated_image(monthly_consumption_id: str, size: Optional[str] = None) -> tuple[bytes, str, str]:
+    """
+    Returns the annotated image, its content type and a key that changes whenever the
+    original or the detections change (usable as an ETag).
+    """
+    reading = get_monthly_consumption_detections_from_db(monthly_consumption_id)
+    key = _cache_key(reading, size)
+    content_type = RENDITION_CONTENT_TYPE if size else ANNOTATED_CONTENT_TYPE
+
+    data = _cache.get(key)
+    if data is None:
+        if "detections" not in reading and reading.get("label_file"):
+            # not converted by the detections migration yet, serve the stored annotated copy
+            with open_file_from_db(reading["label_file"]) as grid_out:
+                data = grid_out.read()
+        else:
+            with open_file_from_db(reading["original_file"]) as grid_out:
+                data = render_annotated_image(grid_out.read(), reading.get("detections") or [])
+        if size:
+            data = render_rendition(data, RENDITION_SIZES[size])
+        _cache.put(key, data)
+    return data, content_type, key
@@ -0,0 +1,148 @@
+"""
+Blob storage for uploaded images and their derived files.
+
+Files are addressed by ObjectId whatever the backend, so readings keep the same
+references. ``BLOB_STORE=gridfs`` (the default) keeps files in the MongoDB GridFS
+bucket. ``BLOB_STORE=local`` writes new files below ``BLOB_STORE_PATH`` in sharded
+directories and keeps their metadata in the ``local_files`` collection. Files that
+are not found there are still read from GridFS, so both stores work side by side
+while the migration moves the existing files to disk.
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import Optional, Union, BinaryIO
+
+from bson import ObjectId
+from gridfs import GridOut
+from gridfs.errors import NoFile
+
+from backend.services.db_client import get_db, get_fs_bucket
+
+LOCAL_FILES_COLLECTION = "local_files"
+DEFAULT_BLOB_STORE_PATH = "data/blobs"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalFile:
+    """
+    Read handle for a file in the local store with the GridOut attributes used by the
+    callers. The file is opened on first read, so serving it by path costs no descriptor.
+    """
+
+    def __init__(self, doc: dict, path: str):
+        self._id = doc["_id"]
+        self.filename = doc.get("filename")
+        self.length = doc["length"]
+        self.metadata = doc.get("metadata")
+        self.upload_date = doc.get("uploadDate")
+        self.path = path
+        self._file: Optional[BinaryIO] = None
+
+    def _handle(self) -> BinaryIO:
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def read(self, size: int = -1) -> bytes:
+        return self._handle().read(size)
+
+    def seek(self, pos: int, whence: int = os.SEEK_SET) -> int:
+        return self._handle().seek(pos, whence)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        while chunk := self.read(COPY_CHUNK_SIZE):
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GridFSBlobStore:
+    def upload(self, filename: str, source: Union[bytes, BinaryIO], metadata: Optional[dict] = None) -> ObjectId:
+        return get_fs_bucket().upload_from_stream(filename, source, metadata=metadata)
+
+    def open(self, file_id: ObjectId) -> GridOut:
+        return get_fs_bucket().open_download_stream(file_id)
+
+    def delete(self, file_id: ObjectId):
+        try:
+            get_fs_bucket().delete(file_id)
+        except NoFile:
+            pass
+
+
+class LocalBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._gridfs = GridFSBlobStore()
+
+    def path_for(self, file_id: ObjectId) -> str:
+        # two directory levels from the low bytes of the id (counter part), so files spread evenly
+        name = str(file_id)
+        return os.path.join(self.root, name[-2:], name[-4:-2], name)
+
+    def upload(self, filename: str, source: Union[bytes, BinaryIO], metadata: Optional[dict] = None,
+               file_id: Optional[ObjectId] = None, upload_date: Optional[datetime] = None) -> ObjectId:
+        file_id = file_id or ObjectId()
+        path = self.path_for(file_id)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # write next to the target and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if isinstance(source, (bytes, bytearray)):
+                    out.write(source)
+                else:
+                    shutil.copyfileobj(source, out, COPY_CHUNK_SIZE)
+                out.flush()
+                os.fsync(out.fileno())
+                length = out.tell()
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        get_db()[LOCAL_FILES_COLLECTION].replace_one({"_id": file_id}, {
+            "_id": file_id,
+            "filename": filename,
+            "length": length,
+            "uploadDate": upload_date or datetime.now(timezone.utc),
+            "metadata": metadata,
+        }, upsert=True)
+        return file_id
+
+    def open(self, file_id: ObjectId) -> Union[LocalFile, GridOut]:
+        doc = get_db()[LOCAL_FILES_COLLECTION].find_one({"_id": file_id})
+        if doc is None:
+            # not moved to disk yet
+            return self._gridfs.open(file_id)
+        path = self.path_for(file_id)
+        if not os.path.isfile(path):
+            raise NoFile(f"no file in the local store with _id {file_id!r}")
+        return LocalFile(doc, path)
+
+    def delete(self, file_id: ObjectId):
+        get_db()[LOCAL_FILES_COLLECTION].delete_one({"_id": file_id})
+        try:
+            os.remove(self.path_for(file_id))
+        except FileNotFoundError:
+            self._gridfs.delete(file_id)
+
+
+def get_blob_store() -> Union[GridFSBlobStore, LocalBlobStore]:
+    if os.environ.get("BLOB_STORE", "gridfs").lower() == "local":
+        return LocalBlobStore(os.environ.get("BLOB_STORE_PATH", DEFAULT_BLOB_STORE_PATH))
+    return GridFSBlobStore()
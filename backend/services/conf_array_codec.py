@@ -0,0 +1,83 @@
+"""
+Compact storage of per-digit confidences.
+
+Readings store the recognised characters as one string (conf_chars) and their
+confidences as a packed little-endian float32 array (conf_packed), instead of a
+conf_array list of {"char", "conf"} sub-documents. API responses carry the compact
+conf_chars/conf_values pair and expand conf_array only when a client asks for it.
+"""
+from typing import Optional
+
+import numpy as np
+from bson import Binary
+
+CONF_DTYPE = np.dtype("<f4")
+# float32 keeps ~7 digits, responses only need the ones the UI shows
+CONF_DECIMALS = 4
+
+
+def pack_conf_array(conf_array: list[dict]) -> Optional[dict]:
+    """
+    Storage fields for conf_array, or None when a character is not a single letter or
+    digit (such entries stay in the list form).
+    """
+    chars = [str(entry["char"]) for entry in conf_array]
+    if any(len(char) != 1 for char in chars):
+        return None
+    return {
+        "conf_chars": "".join(chars),
+        "conf_packed": Binary(np.asarray([entry["conf"] for entry in conf_array], CONF_DTYPE).tobytes()),
+    }
+
+
+def conf_storage_fields(conf_array: Optional[list[dict]]) -> dict:
+    packed = pack_conf_array(conf_array or [])
+    return packed if packed is not None else {"conf_array": conf_array}
+
+
+def unpack_conf(doc: dict) -> tuple[str, list[float]]:
+    """
+    (characters, confidences) of a stored reading, in either storage form.
+    """
+    packed = doc.get("conf_packed")
+    if packed is not None:
+        values = np.frombuffer(packed, CONF_DTYPE).astype(np.float64).round(CONF_DECIMALS)
+        return doc.get("conf_chars", ""), values.tolist()
+
+    conf_array = doc.get("conf_array") or []
+    return "".join(str(entry["char"]) for entry in conf_array), [float(entry["conf"]) for entry in conf_array]
+
+
+def expand_conf_array(chars: str, values: list[float]) -> list[dict]:
+    return [{"char": char, "conf": conf} for char, conf in zip(chars, values)]
+
+
+def unpack_conf_many(docs: list[dict]) -> list[tuple[str, list[float]]]:
+    """
+    unpack_conf for a list of readings, with the packed confidences of all of them
+    decoded and rounded in one numpy call instead of one per reading.
+    """
+    packed = [doc.get("conf_packed") for doc in docs]
+    buffer = b"".join(conf for conf in packed if conf is not None)
+    values = np.frombuffer(buffer, CONF_DTYPE).astype(np.float64).round(CONF_DECIMALS).tolist()
+
+    unpacked = []
+    offset = 0
+    for doc, conf in zip(docs, packed):
+        if conf is None:
+            unpacked.append(unpack_conf(doc))
+            continue
+        count = len(conf) // CONF_DTYPE.itemsize
+        unpacked.append((doc.get("conf_chars", ""), values[offset:offset + count]))
+        offset += count
+    return unpacked
+
+
+def conf_response_fields(doc: dict, expand: bool = False, unpacked: Optional[tuple[str, list[float]]] = None) -> dict:
+    chars, values = unpacked if unpacked is not None else unpack_conf(doc)
+    fields = {"conf_chars": chars, "conf_values": values}
+    if expand:
+        # entries kept in list form may have multi-character labels, return them as stored
+        stored = doc.get("conf_array") if doc.get("conf_packed") is None else None
+        fields["conf_array"] = stored or expand_conf_array(chars, values)
+    return fields
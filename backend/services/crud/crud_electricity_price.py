@@ -1,11 +1,14 @@
 from datetime import datetime
 
 from bson.objectid import ObjectId
+from pydantic import TypeAdapter
 
 from backend.services.db_client import get_db
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.model.ElectricityPrice import ElectricityPrice
 
+_PRICES = TypeAdapter(list[ElectricityPrice])
+
 
 def get_price_from_db(price_id):
     collection = get_db()["electricity-prices"]
@@ -59,19 +62,25 @@ def update_price_in_db(electricity_price_id: str, updated_electricity_price: Ele
 
 
 def get_all_prices_from_db():
+    return _PRICES.validate_python(get_all_price_rows())
+
+
+def get_all_price_rows() -> list[dict]:
+    """
+    Prices in the response shape of ElectricityPrice, without model validation.
+    """
     collection = get_db()["electricity-prices"]
-    results = collection.find()
-    prices = []
-    for doc in results:
-        prices.append(ElectricityPrice(
-            _id=doc["_id"],
-            price=doc["price"],
-            date=doc["date"],
-            created_at=doc["created_at"],
-            updated_at=doc["updated_at"],
-            is_default=doc["is_default"]
-        ))
-    return prices
+    return [
+        {
+            "_id": doc["_id"],
+            "price": doc["price"],
+            "date": doc["date"],
+            "created_at": doc["created_at"],
+            "updated_at": doc["updated_at"],
+            "is_default": doc["is_default"],
+        }
+        for doc in collection.find()
+    ]
 
 
 def delete_price_from_db(price_id: str):
@@ -1,18 +1,103 @@
+import hashlib
+import mimetypes
+from typing import Union
+
+import pymongo
 from bson.objectid import ObjectId
+from gridfs import GridOut
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from backend.services.db_client import get_fs_bucket
+from backend.services.blob_store import get_blob_store, LocalFile
+from backend.services.db_client import get_db
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+# sha256 -> stored file id and the number of readings referencing it
+FILE_REFS_COLLECTION = "file_refs"
+
 
 def get_file_from_db(file_id):
-    file_data = get_fs_bucket().open_download_stream(ObjectId(file_id))
+    file_data = get_blob_store().open(ObjectId(file_id))
     if file_data:
-        return file_data.read()
+        with file_data:
+            return file_data.read()
     else:
         raise NoObjectHasFoundException()
 
 
+def open_file_from_db(file_id) -> Union[GridOut, LocalFile]:
+    # returns the file handle without reading it, the caller streams and closes it
+    if not ObjectId.is_valid(file_id):
+        raise NoObjectHasFoundException()
+    try:
+        return get_blob_store().open(ObjectId(file_id))
+    except NoFile:
+        raise NoObjectHasFoundException()
+
+
+def get_file_content_type(grid_out: Union[GridOut, LocalFile]) -> str:
+    # files saved before the content type was stored fall back to a guess from the filename
+    metadata = grid_out.metadata or {}
+    return metadata.get("contentType") or mimetypes.guess_type(grid_out.filename or "")[0] or DEFAULT_CONTENT_TYPE
+
+
 def save_file_to_db(path, filename):
+    # content addressed: identical bytes are stored once and shared through a reference count
+    content_type = mimetypes.guess_type(filename)[0] or DEFAULT_CONTENT_TYPE
     with open(path, "rb") as file_data:
-        file_id = get_fs_bucket().upload_from_stream(filename, file_data)
+        digest = hashlib.file_digest(file_data, "sha256").hexdigest()
+        file_id = _add_file_reference(digest)
+        if file_id:
+            return file_id
+
+        file_data.seek(0)
+        file_id = get_blob_store().upload(filename, file_data, metadata={"contentType": content_type, "sha256": digest})
+
+    try:
+        get_db()[FILE_REFS_COLLECTION].insert_one({"_id": digest, "file_id": file_id, "refcount": 1})
+    except DuplicateKeyError:
+        # the same bytes were stored concurrently, keep the other copy
+        get_blob_store().delete(file_id)
+        file_id = _add_file_reference(digest)
+        if file_id is None:
+            # the other copy was released in the meantime
+            return save_file_to_db(path, filename)
     return file_id
+
+
+def _add_file_reference(digest: str):
+    file_ref = get_db()[FILE_REFS_COLLECTION].find_one_and_update(
+        {"_id": digest, "refcount": {"$gt": 0}}, {"$inc": {"refcount": 1}})
+    return file_ref["file_id"] if file_ref else None
+
+
+def release_file_from_db(file_id):
+    """
+    Drops one reference to a stored file and deletes it once nothing references it.
+    Files stored without a reference count are deleted right away.
+    """
+    file_id = ObjectId(str(file_id))
+    file_refs = get_db()[FILE_REFS_COLLECTION]
+    file_ref = file_refs.find_one_and_update({"file_id": file_id}, {"$inc": {"refcount": -1}},
+                                             return_document=ReturnDocument.AFTER)
+    if file_ref is not None:
+        if file_ref["refcount"] > 0:
+            return
+        # a concurrent save may have taken a new reference, only delete if still unreferenced
+        if file_refs.delete_one({"_id": file_ref["_id"], "refcount": {"$lte": 0}}).deleted_count == 0:
+            return
+    get_blob_store().delete(file_id)
+
+
+def create_file_ref_indexes():
+    get_db()[FILE_REFS_COLLECTION].create_index([("file_id", pymongo.ASCENDING)])
+
+
+def save_bytes_to_db(data: bytes, filename: str, content_type: str):
+    return get_blob_store().upload(filename, data, metadata={"contentType": content_type})
+
+
+def delete_file_from_db(file_id):
+    get_blob_store().delete(ObjectId(str(file_id)))
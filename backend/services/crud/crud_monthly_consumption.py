@@ -1,15 +1,20 @@
-from datetime import datetime
+from datetime import datetime, date, time, timedelta
 
 import pymongo
 from bson.objectid import ObjectId
-from torch.fft import ifft
+from pydantic import TypeAdapter
 
+from backend.services.conf_array_codec import conf_storage_fields, conf_response_fields, unpack_conf_many
+from backend.services.crud.crud_files import release_file_from_db, delete_file_from_db
 from backend.services.crud.crud_settings import get_setting_from_db
-from backend.services.db_client import get_db, get_fs_bucket
+from backend.services.db_client import get_db
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.exception.ResultIsAlreadyExistsException import ResultIsAlreadyExistsException
 from backend.services.model.MonthlyConsumption import MonthlyConsumption
 
+# built once, building the schema for every call costs more than validating the list
+_MONTHLY_CONSUMPTIONS = TypeAdapter(list[MonthlyConsumption])
+
 
 def save_monthly_consumption_to_db(monthly_consumption):
     collection = get_db()["monthly_consumptions"]
@@ -22,123 +27,180 @@ def save_monthly_consumption_to_db(monthly_consumption):
         "file_name": monthly_consumption.file_name,
         "label_file": monthly_consumption.label_file,
         "file_label_name": monthly_consumption.file_label_name,
-        "conf_array": monthly_consumption.conf_array,
+        **conf_storage_fields(monthly_consumption.conf_array),
+        "detections": monthly_consumption.detections,
+        "raw_detections": monthly_consumption.raw_detections,
+        "model_version": monthly_consumption.model_version,
         "score": monthly_consumption.score
 
     }
     result = collection.insert_one(monthly_consumption_dict)
+    bump_monthly_consumption_data_version()
     return result.inserted_id
 
 
-def get_monthly_consumption_from_db(monthly_consumption_id):
+def get_monthly_consumption_from_db(monthly_consumption_id, expand_conf_array: bool = False):
     collection = get_db()["monthly_consumptions"]
     result = collection.find_one({"_id": ObjectId(monthly_consumption_id)})
     if result:
-        return MonthlyConsumption(
-            _id=result["_id"],
-            modified_date=result["modified_date"],
-            date=result["date"],
-            total_kwh_consumed=result["total_kwh_consumed"],
-            price=result["price"],
-            original_file=str(result["original_file"]) if isinstance(result["original_file"], ObjectId) else result[
-                "original_file"],
-            file_name=result["file_name"],
-            label_file=str(result["label_file"]) if isinstance(result["label_file"], ObjectId) else result[
-                "label_file"],
-            file_label_name=str(result["file_label_name"]) if isinstance(result["file_label_name"], ObjectId) else
-            result["file_label_name"],
-            conf_array=result["conf_array"],
-            score=result["score"]
-        )
+        return MonthlyConsumption(**monthly_consumption_row(result, expand_conf_array))
     else:
         raise NoObjectHasFoundException()
 
 
-def get_latest_monthly_consumption_from_db():
+def get_monthly_consumption_detections_from_db(monthly_consumption_id):
+    if not ObjectId.is_valid(monthly_consumption_id):
+        raise NoObjectHasFoundException()
+    collection = get_db()["monthly_consumptions"]
+    result = collection.find_one({"_id": ObjectId(monthly_consumption_id)},
+                                 {"original_file": 1, "label_file": 1, "detections": 1})
+    if not result or not result.get("original_file"):
+        raise NoObjectHasFoundException()
+    return result
+
+
+def get_latest_monthly_consumption_from_db(expand_conf_array: bool = False):
     collection = get_db()["monthly_consumptions"]
     result = collection.find().sort("date", pymongo.DESCENDING).limit(1)
     monthly_consumption = list(result)
     if monthly_consumption:
-        doc = monthly_consumption[0]
-        return MonthlyConsumption(
-            _id=doc["_id"],
-            modified_date=doc["modified_date"],
-            date=doc["date"],
-            total_kwh_consumed=doc["total_kwh_consumed"],
-            price=doc["price"],
-            original_file=str(doc["original_file"]) if isinstance(doc["original_file"], ObjectId) else doc[
-                "original_file"],
-            file_name=doc["file_name"],
-            label_file=str(doc["label_file"]) if isinstance(doc["label_file"], ObjectId) else doc["label_file"],
-            file_label_name=str(doc["file_label_name"]) if isinstance(doc["file_label_name"], ObjectId) else doc[
-                "file_label_name"],
-            conf_array=doc["conf_array"],
-            score=doc["score"]
-        )
+        return MonthlyConsumption(**monthly_consumption_row(monthly_consumption[0], expand_conf_array))
     else:
         raise NoObjectHasFoundException()
 
 
-def get_all_monthly_consumption_from_db():
+def get_all_monthly_consumption_from_db(expand_conf_array: bool = False):
+    return _MONTHLY_CONSUMPTIONS.validate_python(get_all_monthly_consumption_rows(expand_conf_array))
+
+
+def get_all_monthly_consumption_rows(expand_conf_array: bool = False) -> list[dict]:
+    """
+    Readings in the response shape of MonthlyConsumption, built from the stored documents
+    without model validation. The documents are written by this service only, so the list
+    route sends these rows as they are.
+    """
     collection = get_db()["monthly_consumptions"]
-    results = collection.find()
-    monthly_consumptions = []
-    for doc in results:
-        monthly_consumptions.append(MonthlyConsumption(
-            _id=doc["_id"],
-            modified_date=doc["modified_date"],
-            date=doc["date"],
-            total_kwh_consumed=doc["total_kwh_consumed"],
-            price=doc["price"],
-            original_file=str(doc["original_file"]) if isinstance(doc["original_file"], ObjectId) else doc[
-                "original_file"],
-            file_name=doc["file_name"],
-            label_file=str(doc["label_file"]) if isinstance(doc["label_file"], ObjectId) else doc["label_file"],
-            file_label_name=str(doc["file_label_name"]) if isinstance(doc["file_label_name"], ObjectId) else doc[
-                "file_label_name"],
-            conf_array=doc.get("conf_array", []),
-            score=doc.get("score",0.0)
-        ))
-    return monthly_consumptions
+    # the binary detection data is only needed for replays and annotated images
+    docs = list(collection.find({}, {"detections": 0, "raw_detections": 0}))
+    return [monthly_consumption_row(doc, expand_conf_array, unpacked)
+            for doc, unpacked in zip(docs, unpack_conf_many(docs))]
+
+
+def monthly_consumption_row(doc: dict, expand_conf_array: bool = False, unpacked=None) -> dict:
+    conf_fields = conf_response_fields(doc, expand_conf_array, unpacked)
+    conf_fields.setdefault("conf_array", None)
+    return {
+        "_id": doc["_id"],
+        "modified_date": doc["modified_date"],
+        "date": doc["date"],
+        "total_kwh_consumed": doc["total_kwh_consumed"],
+        "price": doc["price"],
+        "original_file": _file_id(doc["original_file"]),
+        "file_name": doc["file_name"],
+        "label_file": _file_id(doc["label_file"]),
+        "file_label_name": _file_id(doc["file_label_name"]),
+        **conf_fields,
+        "model_version": doc.get("model_version"),
+        "score": doc.get("score", 0.0),
+    }
+
+
+def _file_id(value):
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def get_monthly_consumptions_for_export(date_from: date | None = None, date_to: date | None = None,
+                                        fields=("modified_date", "date", "total_kwh_consumed", "price")):
+    collection = get_db()["monthly_consumptions"]
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in fields})
+    return collection.find(build_date_range_query(date_from, date_to), projection).sort("date", pymongo.ASCENDING)
+
+
+def get_previous_total_kwh_consumed(before_date: date):
+    collection = get_db()["monthly_consumptions"]
+    previous_consumption = collection.find_one(
+        {"date": {"$lt": datetime.combine(before_date, time.min)}},
+        {"_id": 0, "total_kwh_consumed": 1},
+        sort=[("date", pymongo.DESCENDING)]
+    )
+    return previous_consumption["total_kwh_consumed"] if previous_consumption else None
+
+
+def build_date_range_query(date_from: date | None = None, date_to: date | None = None) -> dict:
+    # readings are stored as datetimes, so "to" is inclusive of the whole day
+    date_range = {}
+    if date_from is not None:
+        date_range["$gte"] = datetime.combine(date_from, time.min)
+    if date_to is not None:
+        date_range["$lt"] = datetime.combine(date_to + timedelta(days=1), time.min)
+    return {"date": date_range} if date_range else {}
+
+
+def get_monthly_consumption_data_version() -> int:
+    # increases on every write to monthly_consumptions, used to key cached exports
+    result = get_db()["data_versions"].find_one({"_id": "monthly_consumptions"})
+    return result["version"] if result else 0
+
+
+def bump_monthly_consumption_data_version():
+    get_db()["data_versions"].update_one({"_id": "monthly_consumptions"}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def create_monthly_consumption_indexes():
+    collection = get_db()["monthly_consumptions"]
+    collection.create_index([("date", pymongo.ASCENDING)])
+    # rendition lookups find the reading by one of its image file ids
+    collection.create_index([("original_file", pymongo.ASCENDING)])
+    collection.create_index([("label_file", pymongo.ASCENDING)])
 
 
 def update_monthly_consumption_in_db(monthly_consumption_id: str, updated_monthly_consumption: MonthlyConsumption):
     existing_consumption = get_monthly_consumption_from_db(monthly_consumption_id)
+    corrected = existing_consumption.total_kwh_consumed != updated_monthly_consumption.total_kwh_consumed
     existing_consumption.total_kwh_consumed = updated_monthly_consumption.total_kwh_consumed
     existing_consumption.price = updated_monthly_consumption.price
     existing_consumption.modified_date = datetime.now()
     existing_consumption.date = updated_monthly_consumption.date
 
     collection = get_db()["monthly_consumptions"]
+    # the file references are left as stored (ObjectIds); the model only carries their string form
     updated_monthly_consumption = {
         "modified_date": existing_consumption.modified_date,
         "date": existing_consumption.date,
         "total_kwh_consumed": existing_consumption.total_kwh_consumed,
         "price": calculate_price_for_custom_date(existing_consumption.date, existing_consumption.total_kwh_consumed),
-        "original_file": existing_consumption.original_file,
-        "file_name": existing_consumption.file_name,
-        "label_file": existing_consumption.label_file,
-        "file_label_name": existing_consumption.file_label_name
     }
+    if corrected:
+        # a value corrected by hand is kept when detections are replayed
+        updated_monthly_consumption["manually_edited"] = True
     result = collection.update_one({"_id": ObjectId(monthly_consumption_id)}, {"$set": updated_monthly_consumption})
 
     if result.modified_count == 0:
         raise NoObjectHasFoundException()
+    bump_monthly_consumption_data_version()
 
 
 def delete_monthly_consumption_from_db(monthly_consumption_id: str):
     collection = get_db()["monthly_consumptions"]
     existing_consumption = get_monthly_consumption_from_db(monthly_consumption_id)
-    if existing_consumption.original_file:
-        get_fs_bucket().delete(ObjectId(str(existing_consumption.original_file)))
-    if existing_consumption.label_file:
-        get_fs_bucket().delete(ObjectId(str(existing_consumption.label_file)))
-    if existing_consumption.file_label_name:
-        get_fs_bucket().delete(ObjectId(str(existing_consumption.file_label_name)))
+    renditions = collection.find_one({"_id": ObjectId(monthly_consumption_id)}, {"renditions": 1}) or {}
     result = collection.delete_one({"_id": ObjectId(monthly_consumption_id)})
     if result.deleted_count == 0:
         raise NoObjectHasFoundException()
 
+    # originals can be shared by readings with identical photos, so they are released rather than deleted
+    if existing_consumption.original_file:
+        release_file_from_db(existing_consumption.original_file)
+    if existing_consumption.label_file:
+        release_file_from_db(existing_consumption.label_file)
+    if existing_consumption.file_label_name:
+        release_file_from_db(existing_consumption.file_label_name)
+    for sizes in renditions.get("renditions", {}).values():
+        for rendition_id in sizes.values():
+            delete_file_from_db(rendition_id)
+    bump_monthly_consumption_data_version()
+
 
 def calculate_price_from_current_consumption_from_last_month(current_total_kwh_consumed: float) -> float:
     settings = get_setting_from_db()
@@ -167,17 +229,21 @@ def calculate_price_from_current_consumption_from_last_month(current_total_kwh_c
 
 
 def calculate_price_for_custom_date(selected_date: datetime, total_kwh: float) -> float:
-    db = get_db()
-    settings = get_setting_from_db()
-    if not settings.calculate_price:
-        return 0.0
-
-    previous_consumption = db["monthly_consumptions"].find_one(
+    previous_consumption = get_db()["monthly_consumptions"].find_one(
         {"date": {"$lt": selected_date}},
         sort=[("date", pymongo.DESCENDING)]
     )
 
-    price_doc = db["electricity-prices"].find_one(
+    previous_kwh = previous_consumption["total_kwh_consumed"] if previous_consumption else 0
+    return calculate_price_for_delta(selected_date, total_kwh - previous_kwh)
+
+
+def calculate_price_for_delta(selected_date: datetime, delta_kwh: float) -> float:
+    settings = get_setting_from_db()
+    if not settings.calculate_price:
+        return 0.0
+
+    price_doc = get_db()["electricity-prices"].find_one(
         {"date": {"$lte": selected_date.strftime('%Y/%m/%d')}},
         sort=[("date", pymongo.DESCENDING)]
     )
@@ -185,7 +251,4 @@ def calculate_price_for_custom_date(selected_date: datetime, total_kwh: float) -
     if not price_doc:
         raise NoObjectHasFoundException("No price found for the selected date")
 
-    previous_kwh = previous_consumption["total_kwh_consumed"] if previous_consumption else 0
-    delta_kwh = total_kwh - previous_kwh
-
     return round(delta_kwh * price_doc["price"], 2)
@@ -1,9 +1,18 @@
+import time
 from datetime import datetime
+from typing import Optional
 
 from backend.services.db_client import get_db
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.model.Settings import Settings
 
+SETTINGS_CACHE_TTL_SECONDS = 30
+# the data version exports are keyed by (see crud_monthly_consumption); settings writes bump it too,
+# since exports embed the currency
+DATA_VERSION_ID = "monthly_consumptions"
+
+_settings_cache = {"settings": None, "loaded_at": 0.0, "data_version": None}
+
 
 def save_setting_to_db(setting: Settings):
     collection = get_db()["settings"]
@@ -17,6 +26,7 @@ def save_setting_to_db(setting: Settings):
         "updated_at": datetime.now()
     }
     result = collection.insert_one(setting_dict)
+    _settings_changed()
     return str(result.inserted_id)
 
 
@@ -49,6 +59,28 @@ def get_setting_from_db():
         raise NoObjectHasFoundException()
 
 
+def get_cached_setting_from_db(data_version: Optional[int] = None):
+    # settings change rarely; the TTL bounds staleness across workers, and a caller passing the
+    # current data version reloads as soon as any worker wrote the settings
+    if _settings_cache["settings"] is None or \
+            time.monotonic() - _settings_cache["loaded_at"] > SETTINGS_CACHE_TTL_SECONDS or \
+            (data_version is not None and data_version != _settings_cache["data_version"]):
+        _settings_cache["settings"] = get_setting_from_db()
+        _settings_cache["loaded_at"] = time.monotonic()
+        _settings_cache["data_version"] = data_version
+    return _settings_cache["settings"]
+
+
+def invalidate_settings_cache():
+    _settings_cache["settings"] = None
+
+
+def _settings_changed():
+    invalidate_settings_cache()
+    # cached exports are rebuilt, and other workers reload the settings with the new version
+    get_db()["data_versions"].update_one({"_id": DATA_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+
 def update_setting_in_db(updated_setting: Settings):
     existing_setting = get_setting_from_db()
     collection = get_db()["settings"]
@@ -63,6 +95,7 @@ def update_setting_in_db(updated_setting: Settings):
     }
 
     result = collection.update_one({"_id": 1}, {"$set": updated_setting_dict})
+    _settings_changed()
 
     if result.modified_count == 0:
         raise NoObjectHasFoundException()
@@ -10,3 +10,7 @@ def get_db():
 
 def get_fs_bucket():
     return gridfs.GridFSBucket(get_db())
+
+
+def get_export_fs_bucket():
+    return gridfs.GridFSBucket(get_db(), bucket_name="exports")
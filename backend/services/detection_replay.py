@@ -0,0 +1,202 @@
+"""
+Raw detections and threshold replay.
+
+Uploads run the model with a low confidence floor and store every box on the reading
+as packed little-endian float32 arrays (xywhr, conf, cls) together with the class
+names. The reading, conf_array, score and detections are then decoded from those
+arrays, so a new confidence threshold or digit ordering can be replayed over the whole
+history with numpy alone, without the model.
+
+Boxes that pass a threshold are the same as a model run at that threshold, since NMS
+only suppresses a box in favour of one with a higher confidence. Readings whose value
+was corrected by hand (manually_edited) are never replayed.
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+import pymongo
+from bson import Binary
+from pymongo import UpdateOne
+
+from backend.services.conf_array_codec import conf_storage_fields
+from backend.services.crud.crud_monthly_consumption import bump_monthly_consumption_data_version, \
+    calculate_price_for_delta
+from backend.services.db_client import get_db
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+
+COLLECTION_NAME = "monthly_consumptions"
+# lowest confidence kept on the reading, and the one readings are decoded with
+RAW_DETECTION_FLOOR = 0.1
+DETECTION_CONF = 0.5
+DETECTION_ORDERS = ("x", "angle")
+RAW_DTYPE = np.dtype("<f4")
+
+
+def raw_detections_from_result(result, names, floor: float = RAW_DETECTION_FLOOR) -> dict:
+    obb = result.obb
+    return {
+        "floor": floor,
+        "names": [str(names[i]) for i in range(len(names))],
+        "xywhr": Binary(_to_numpy(obb.xywhr).astype(RAW_DTYPE).tobytes()),
+        "conf": Binary(_to_numpy(obb.conf).astype(RAW_DTYPE).tobytes()),
+        "cls": Binary(_to_numpy(obb.cls).astype(RAW_DTYPE).tobytes()),
+    }
+
+
+def unpack_raw_detections(raw: dict):
+    xywhr = np.frombuffer(raw["xywhr"], RAW_DTYPE).reshape(-1, 5)
+    conf = np.frombuffer(raw["conf"], RAW_DTYPE)
+    cls = np.frombuffer(raw["cls"], RAW_DTYPE).astype(np.int64)
+    return xywhr, conf, cls
+
+
+def detections_from_raw(raw: dict, conf_threshold: float = DETECTION_CONF, order: str = "x") -> list[dict]:
+    """
+    Detections above `conf_threshold`, ordered left to right along the x axis ("x") or
+    along the median box angle ("angle", for meters photographed at a tilt).
+    """
+    xywhr, conf, cls = unpack_raw_detections(raw)
+    keep = conf >= np.float32(conf_threshold)
+    xywhr, conf, cls = xywhr[keep], conf[keep], cls[keep]
+
+    if order == "angle" and len(xywhr):
+        angle = float(np.median(xywhr[:, 4]))
+        position = xywhr[:, 0] * math.cos(angle) + xywhr[:, 1] * math.sin(angle)
+    else:
+        position = xywhr[:, 0]
+
+    names = raw["names"]
+    detections = []
+    for i in np.argsort(position, kind="stable"):
+        detections.append({
+            "char": names[cls[i]],
+            "class_id": int(cls[i]),
+            "conf": float(conf[i]),
+            "corners": _corners(xywhr[i]),
+        })
+    return detections
+
+
+def summarize_detections(detections: list[dict]):
+    """
+    Returns (reading, conf_array, score) of detections sorted left to right; the
+    reading is None when the digits do not form a number.
+    """
+    conf_array = [{"char": detection["char"], "conf": detection["conf"]} for detection in detections]
+    score = sum(detection["conf"] for detection in detections) / len(detections) if detections else 0.0
+
+    try:
+        output = float(''.join(detection["char"] for detection in detections))
+    except ValueError:
+        output = None
+    return output, conf_array, score
+
+
+def replay_detections(conf_threshold: float = DETECTION_CONF, order: str = "x", apply: bool = False) -> dict:
+    """
+    Decodes every reading with raw detections under the given rules and reports the
+    readings whose value would change. With `apply`, decodable changes are written
+    (value, conf_array, score and detections) together with the recalculated price of
+    each changed reading and of the reading after it. Changes without an electricity
+    price for their date are left out and counted as unpriced.
+    """
+    collection = get_db()[COLLECTION_NAME]
+    docs = collection.find({"raw_detections": {"$exists": True}, "manually_edited": {"$ne": True}},
+                           {"raw_detections": 1, "total_kwh_consumed": 1, "score": 1, "date": 1})
+
+    replayed = 0
+    diffs = []
+    changes = []
+    for doc in docs:
+        replayed += 1
+        detections = detections_from_raw(doc["raw_detections"], conf_threshold, order)
+        value, conf_array, score = summarize_detections(detections)
+        if value == doc.get("total_kwh_consumed"):
+            continue
+
+        diffs.append({
+            "reading_id": doc["_id"],
+            "date": doc.get("date"),
+            "old_value": doc.get("total_kwh_consumed"),
+            "new_value": value,
+            "old_score": doc.get("score"),
+            "new_score": score,
+        })
+        if apply and value is not None:
+            changes.append((doc, {
+                "total_kwh_consumed": value,
+                **conf_storage_fields(conf_array),
+                "score": score,
+                "detections": detections,
+                "modified_date": datetime.now(),
+            }))
+
+    updates, unpriced = _priced_updates(collection, changes)
+    if updates:
+        collection.bulk_write([UpdateOne({"_id": reading_id}, {"$set": fields})
+                               for reading_id, fields in updates.items()], ordered=False)
+        bump_monthly_consumption_data_version()
+
+    return {"replayed": replayed, "changed": len(diffs), "applied": len(changes) - unpriced, "unpriced": unpriced,
+            "diffs": diffs}
+
+
+def _priced_updates(collection, changes: list[tuple[dict, dict]]) -> tuple[dict, int]:
+    """
+    Prices every change before anything is written, so values and prices land in one
+    bulk_write. A reading's price is the delta to the one before it, so changes are
+    priced in date order against the new value of an earlier change, and the reading
+    after each change is repriced against it too.
+    """
+    updates = {}
+    unpriced = 0
+    new_values = {}
+    for doc, fields in sorted(changes, key=lambda change: change[0]["date"]):
+        try:
+            fields["price"] = calculate_price_for_delta(
+                doc["date"], fields["total_kwh_consumed"] - _previous_kwh(collection, doc["date"], new_values))
+        except NoObjectHasFoundException:
+            unpriced += 1
+            continue
+        updates[doc["_id"]] = fields
+        new_values[doc["_id"]] = fields["total_kwh_consumed"]
+
+    for doc, fields in changes:
+        if doc["_id"] not in new_values:
+            continue
+        following = collection.find_one({"date": {"$gt": doc["date"]}}, {"date": 1, "total_kwh_consumed": 1},
+                                        sort=[("date", pymongo.ASCENDING)])
+        if following and following["_id"] not in updates:
+            # priced from a later date than the change, so a price is known for it as well
+            updates[following["_id"]] = {"price": calculate_price_for_delta(
+                following["date"], following["total_kwh_consumed"] - fields["total_kwh_consumed"])}
+    return updates, unpriced
+
+
+def _previous_kwh(collection, date: datetime, new_values: dict) -> float:
+    previous = collection.find_one({"date": {"$lt": date}}, {"total_kwh_consumed": 1},
+                                   sort=[("date", pymongo.DESCENDING)])
+    if previous is None:
+        return 0
+    return new_values.get(previous["_id"], previous["total_kwh_consumed"])
+
+
+def _corners(box) -> list[list[float]]:
+    x, y, w, h, r = (float(value) for value in box)
+    cos, sin = math.cos(r), math.sin(r)
+    # same vertex order as ultralytics' xywhr2xyxyxyxy
+    dx1, dy1 = w / 2 * cos, w / 2 * sin
+    dx2, dy2 = -h / 2 * sin, h / 2 * cos
+    return [
+        [round(x + dx1 + dx2, 1), round(y + dy1 + dy2, 1)],
+        [round(x + dx1 - dx2, 1), round(y + dy1 - dy2, 1)],
+        [round(x - dx1 - dx2, 1), round(y - dy1 - dy2, 1)],
+        [round(x - dx1 + dx2, 1), round(y - dy1 + dy2, 1)],
+    ]
+
+
+def _to_numpy(values) -> np.ndarray:
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
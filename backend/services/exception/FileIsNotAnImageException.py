@@ -0,0 +1,8 @@
+class FileIsNotAnImageException(Exception):
+    """
+    Exception raised when a stored file cannot be decoded as an image.
+    """
+
+    def __init__(self, message: str = "The file is not an image."):
+        super().__init__(message)
+        self.message = message
@@ -0,0 +1,10 @@
+class ImageQualityTooLowException(Exception):
+    """
+    Exception raised when an uploaded photo is too small, too dark, too bright or too
+    blurry to be read.
+    """
+
+    def __init__(self, reason: str, message: str = "The image quality is too low to read the meter."):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
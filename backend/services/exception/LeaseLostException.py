@@ -0,0 +1,9 @@
+class LeaseLostException(Exception):
+    """
+    Exception raised at a checkpoint of work whose lease expired or was taken over by
+    another process, which may be running the same work now.
+    """
+
+    def __init__(self, message: str = ""):
+        super().__init__(message)
+        self.message = message
@@ -0,0 +1,250 @@
+"""
+Background export jobs.
+
+Each export is generated once per (format, filters, currency, data version) by a
+worker thread and stored in the "exports" GridFS bucket. Identical requests are
+served from the stored artifact until monthly_consumptions changes, and old or
+least recently used artifacts are evicted after every finished job. An artifact read
+within the last EXPORT_EVICTION_GRACE is never evicted, so a download in progress is
+not cut off.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Optional, List
+
+import pymongo
+from bson import ObjectId
+from gridfs import GridOut
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from backend.services.crud.crud_monthly_consumption import get_monthly_consumption_data_version
+from backend.services.crud.crud_settings import get_cached_setting_from_db
+from backend.services.db_client import get_db, get_export_fs_bucket
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.export_monthly_consumption import build_csv_bytes, build_xlsx_bytes, build_pdf_bytes, \
+    build_parquet_bytes, build_arrow_bytes
+from backend.services.model.ExportJob import ExportJob
+
+EXPORT_JOBS_COLLECTION = "export_jobs"
+EXPORT_JOB_WORKERS = 1
+# a queued/running job older than this is assumed lost (e.g. the worker restarted) and is queued again
+EXPORT_JOB_TIMEOUT = timedelta(minutes=10)
+EXPORT_JOB_POLL_SECONDS = 0.25
+EXPORT_CACHE_MAX_ARTIFACTS = 20
+EXPORT_CACHE_MAX_AGE = timedelta(days=7)
+EXPORT_EVICTION_GRACE = timedelta(minutes=10)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXPORT_FILENAMES = {
+    "csv": "monthly_consumption.csv",
+    "xlsx": "monthly_consumption.xlsx",
+    "pdf": "monthly_consumption.pdf",
+    "parquet": "monthly_consumption.parquet",
+    "arrow": "monthly_consumption.arrows",
+}
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_JOB_WORKERS, thread_name_prefix="export-job")
+
+
+def create_export_job_indexes():
+    jobs = get_db()[EXPORT_JOBS_COLLECTION]
+    jobs.create_index([("key", pymongo.ASCENDING)], unique=True)
+    jobs.create_index([("last_accessed_at", pymongo.DESCENDING)])
+
+
+def request_export(file_format: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   columns: Optional[List[str]] = None, summary: bool = False) -> dict:
+    filters = {
+        "from": date_from.isoformat() if date_from else None,
+        "to": date_to.isoformat() if date_to else None,
+        "columns": columns,
+        "summary": bool(summary) and file_format == "xlsx",
+    }
+    data_version = get_monthly_consumption_data_version()
+    currency = getattr(get_cached_setting_from_db(data_version), "currency", "") or ""
+    key = _export_key(file_format, filters, currency, data_version)
+
+    jobs = get_db()[EXPORT_JOBS_COLLECTION]
+    now = datetime.now()
+    new_id = ObjectId()
+    try:
+        job = jobs.find_one_and_update(
+            {"key": key},
+            {
+                "$setOnInsert": {
+                    "_id": new_id,
+                    "file_format": file_format,
+                    "filters": filters,
+                    "currency": currency,
+                    "data_version": data_version,
+                    "status": "queued",
+                    "created_at": now,
+                },
+                "$set": {"last_accessed_at": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # a concurrent request inserted the same key first
+        job = jobs.find_one({"key": key})
+
+    if job["_id"] == new_id:
+        _executor.submit(run_export_job, new_id)
+    elif _needs_retry(job, now):
+        job = jobs.find_one_and_update(
+            {"_id": job["_id"], "status": job["status"]},
+            {"$set": {"status": "queued", "created_at": now, "error": None}},
+            return_document=ReturnDocument.AFTER,
+        ) or job
+        _executor.submit(run_export_job, job["_id"])
+    return job
+
+
+def _needs_retry(job: dict, now: datetime) -> bool:
+    # an artifact being evicted is generated again rather than served
+    if job["status"] in ("failed", "evicting"):
+        return True
+    return job["status"] in ("queued", "running") and now - job["created_at"] > EXPORT_JOB_TIMEOUT
+
+
+def _export_key(file_format: str, filters: dict, currency: str, data_version: int) -> str:
+    payload = json.dumps([file_format, filters, currency.upper(), data_version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _build_export(file_format: str, filters: dict) -> bytes:
+    date_from = date.fromisoformat(filters["from"]) if filters["from"] else None
+    date_to = date.fromisoformat(filters["to"]) if filters["to"] else None
+    if file_format == "csv":
+        return build_csv_bytes(date_from, date_to, filters["columns"])
+    if file_format == "xlsx":
+        return build_xlsx_bytes(date_from, date_to, filters["columns"], filters["summary"])
+    if file_format == "parquet":
+        return build_parquet_bytes(date_from, date_to, filters["columns"])
+    if file_format == "arrow":
+        return build_arrow_bytes(date_from, date_to, filters["columns"])
+    return build_pdf_bytes(date_from, date_to, filters["columns"])
+
+
+def run_export_job(job_id: ObjectId):
+    jobs = get_db()[EXPORT_JOBS_COLLECTION]
+    job = jobs.find_one_and_update(
+        {"_id": job_id, "status": "queued"},
+        {"$set": {"status": "running", "started_at": datetime.now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job is None:
+        # already picked up by another worker
+        return
+
+    try:
+        data = _build_export(job["file_format"], job["filters"])
+        file_id = get_export_fs_bucket().upload_from_stream(
+            EXPORT_FILENAMES[job["file_format"]], data, metadata={"key": job["key"]})
+    except Exception as e:
+        jobs.update_one({"_id": job_id},
+                        {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now()}})
+        return
+
+    jobs.update_one({"_id": job_id}, {
+        "$set": {"status": "done", "file_id": file_id, "size": len(data), "finished_at": datetime.now()}
+    })
+    evict_export_artifacts()
+
+
+def get_export_job(job_id) -> dict:
+    if not ObjectId.is_valid(job_id):
+        raise NoObjectHasFoundException()
+    job = get_db()[EXPORT_JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+    if job is None:
+        raise NoObjectHasFoundException()
+    return job
+
+
+async def wait_for_export_job(job: dict, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        await asyncio.sleep(EXPORT_JOB_POLL_SECONDS)
+        job = await run_in_threadpool(get_export_job, job["_id"])
+    return job
+
+
+def get_export_artifact(job: dict) -> GridOut:
+    # marks the artifact as read before opening it, eviction skips it for EXPORT_EVICTION_GRACE
+    result = get_db()[EXPORT_JOBS_COLLECTION].update_one({"_id": job["_id"], "status": "done"},
+                                                         {"$set": {"last_accessed_at": datetime.now()}})
+    if result.matched_count == 0:
+        raise NoObjectHasFoundException()
+    try:
+        return get_export_fs_bucket().open_download_stream(job["file_id"])
+    except NoFile:
+        raise NoObjectHasFoundException()
+
+
+def evict_export_artifacts() -> int:
+    jobs = get_db()[EXPORT_JOBS_COLLECTION]
+    now = datetime.now()
+    cutoff = now - EXPORT_CACHE_MAX_AGE
+    data_version = get_monthly_consumption_data_version()
+
+    # artifacts of an older data version can never be hit again
+    evicted = list(jobs.find({
+        "status": {"$in": ["done", "failed"]},
+        "$or": [{"data_version": {"$lt": data_version}}, {"finished_at": {"$lt": cutoff}}],
+    }, {"file_id": 1}))
+    evicted_ids = [job["_id"] for job in evicted]
+    evicted += list(
+        jobs.find({"status": "done", "_id": {"$nin": evicted_ids}}, {"file_id": 1})
+        .sort("last_accessed_at", pymongo.DESCENDING)
+        .skip(EXPORT_CACHE_MAX_ARTIFACTS)
+    )
+
+    bucket = get_export_fs_bucket()
+    evicted_count = 0
+    for job in evicted:
+        # claimed only if nobody read it within the grace period; a read after this finds it gone
+        claimed = jobs.find_one_and_update(
+            {"_id": job["_id"], "status": {"$in": ["done", "failed"]},
+             "last_accessed_at": {"$lt": now - EXPORT_EVICTION_GRACE}},
+            {"$set": {"status": "evicting"}},
+        )
+        if claimed is None:
+            continue
+        if job.get("file_id"):
+            bucket.delete(job["file_id"])
+        # a request for the same export may have queued it again meanwhile
+        jobs.delete_one({"_id": job["_id"], "status": "evicting"})
+        evicted_count += 1
+    return evicted_count
+
+
+def to_export_job(job: dict) -> ExportJob:
+    filters = job["filters"]
+    return ExportJob(
+        _id=job["_id"],
+        status=job["status"],
+        file_format=job["file_format"],
+        date_from=filters["from"],
+        date_to=filters["to"],
+        columns=filters["columns"],
+        summary=filters["summary"],
+        data_version=job["data_version"],
+        size=job.get("size"),
+        error=job.get("error"),
+        created_at=job["created_at"],
+        finished_at=job.get("finished_at"),
+    )
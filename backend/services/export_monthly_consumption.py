@@ -1,14 +1,47 @@
 import io
-from datetime import datetime
-from typing import List, Any, IO, cast
+import itertools
+from datetime import date
+from typing import List, Any, IO, Iterable, Iterator, Optional, cast
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.shapes import Drawing, String
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 
-from backend.services.crud.crud_monthly_consumption import get_all_monthly_consumption_from_db
-from backend.services.crud.crud_settings import get_setting_from_db
+from backend.services.crud.crud_monthly_consumption import get_monthly_consumptions_for_export, \
+    get_previous_total_kwh_consumed
+from backend.services.crud.crud_settings import get_cached_setting_from_db
+
+EXPORT_COLUMNS = ["modified_date", "date", "total_kwh_consumed", "price", "delta_kwh"]
+# fields the summary totals are computed from, fetched even when not exported as columns
+SUMMARY_FIELDS = ["date", "total_kwh_consumed", "price"]
+EXPORT_CHUNK_SIZE = 5000
+
+ARROW_TYPES = {
+    "modified_date": pa.timestamp("us"),
+    "date": pa.timestamp("us"),
+    "total_kwh_consumed": pa.float64(),
+    "price": pa.float64(),
+    "delta_kwh": pa.float64(),
+}
+ARROW_COMPRESSION = "zstd"
+
+PDF_ROW_HEIGHT = 16
+PDF_CHART_HEIGHT = 220
+PDF_CHART_MAX_BARS = 36
+PDF_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("FONTSIZE", (0, 0), (-1, -1), 9),
+])
 
 
 def _get_currency_symbol(currency_code: str) -> str:
@@ -29,106 +62,376 @@ def _get_currency_symbol(currency_code: str) -> str:
     return symbols.get(code, code)
 
 
-def _prepare_dataframe(items: List[Any]) -> pd.DataFrame:
-    # items are MonthlyConsumption model instances
-    # build list of dicts sorted by date ascending
-    rows = []
-    for it in items:
-        rows.append({
-            "modified_date": it.modified_date,
-            "date": it.date,
-            "total_kwh_consumed": it.total_kwh_consumed,
-            "price": it.price,
-        })
-
-    # sort by date ascending
-    df = pd.DataFrame(rows)
-    if df.empty:
-        return df
-    df = df.sort_values("date").reset_index(drop=True)
+def _fields_for_columns(columns: List[str]) -> List[str]:
+    # delta_kwh is derived from total_kwh_consumed, everything else maps 1:1 to a stored field
+    fields = []
+    for column in columns:
+        field = "total_kwh_consumed" if column == "delta_kwh" else column
+        if field not in fields:
+            fields.append(field)
+    return fields
 
-    # compute delta compared to previous month
-    df["delta_kwh"] = df["total_kwh_consumed"].diff().fillna(df["total_kwh_consumed"]).round(3)
 
-    # format dates to ISO strings
-    df["modified_date"] = df["modified_date"].apply(lambda x: x.isoformat() if isinstance(x, datetime) else str(x))
-    df["date"] = df["date"].apply(lambda x: x.date().isoformat() if isinstance(x, datetime) else str(x))
+def _query_export_rows(date_from: Optional[date], date_to: Optional[date], fields: List[str], with_delta: bool):
+    # filtering, projection and sorting are done by MongoDB (indexed on date)
+    rows = get_monthly_consumptions_for_export(date_from, date_to, fields)
 
-    # format price values using currency symbol from settings
+    # the first delta of a filtered range is relative to the reading just before it
+    previous_kwh = None
+    if date_from is not None and with_delta:
+        previous_kwh = get_previous_total_kwh_consumed(date_from)
+
+    return rows, previous_kwh
+
+
+def _load_dataframe(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    columns: Optional[List[str]] = None) -> pd.DataFrame:
+    columns = columns or EXPORT_COLUMNS
+    rows, previous_kwh = _query_export_rows(date_from, date_to, _fields_for_columns(columns), "delta_kwh" in columns)
+    return _prepare_dataframe(rows, columns, previous_kwh)
+
+
+def _iter_raw_frames(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     columns: Optional[List[str]] = None, summary: Optional["ExportSummary"] = None,
+                     chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    # yields unformatted frames of at most chunk_size rows, so memory is bounded by the chunk and not the history
+    columns = columns or EXPORT_COLUMNS
+    fields = _fields_for_columns(columns + (SUMMARY_FIELDS if summary is not None else []))
+    rows, previous_kwh = _query_export_rows(date_from, date_to, fields,
+                                            "delta_kwh" in columns or summary is not None)
+
+    rows = iter(rows)
+    while True:
+        df = _build_raw_frame(_read_columns(itertools.islice(rows, chunk_size), fields), previous_kwh)
+        if df.empty:
+            return
+        if summary is not None:
+            summary.add(df, has_previous=previous_kwh is not None)
+        if "total_kwh_consumed" in df:
+            # carry the last reading over so the next chunk's first delta is correct
+            previous_kwh = df["total_kwh_consumed"].iloc[-1]
+        yield df
+
+
+def _iter_dataframes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     columns: Optional[List[str]] = None, summary: Optional["ExportSummary"] = None,
+                     chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    columns = columns or EXPORT_COLUMNS
+    symbol = _get_export_currency_symbol() if "price" in columns else ""
+    for df in _iter_raw_frames(date_from, date_to, columns, summary, chunk_size):
+        yield _format_frame(df, columns, symbol)
+
+
+def _read_columns(rows: Iterable[dict], fields: List[str]) -> dict:
+    # single pass over the cursor, appending straight into one list per column
+    data = {field: [] for field in fields}
+    appenders = [(field, data[field].append) for field in fields]
+    for row in rows:
+        for field, append in appenders:
+            append(row.get(field))
+    return data
+
+
+def _format_iso_datetimes(values: pd.Series) -> pd.Series:
+    # same output as datetime.isoformat(): seconds precision unless there are microseconds
+    stamps = pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[us]")
+    with_seconds = np.datetime_as_string(stamps, unit="s")
+    with_micros = np.datetime_as_string(stamps, unit="us")
+    has_micros = stamps.astype(np.int64) % 1_000_000 != 0
+    formatted = np.where(has_micros, with_micros, with_seconds)
+    return pd.Series(np.where(np.isnat(stamps), "", formatted), index=values.index, dtype="str")
+
+
+def _format_iso_dates(values: pd.Series) -> pd.Series:
+    stamps = pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[us]")
+    formatted = np.datetime_as_string(stamps, unit="D")
+    return pd.Series(np.where(np.isnat(stamps), "", formatted), index=values.index, dtype="str")
+
+
+def _format_prices(values: pd.Series, symbol: str) -> pd.Series:
+    # build "<symbol><units>.<cents>" from integer cents instead of formatting each float
+    prices = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    missing = np.isnan(prices)
+    cents = np.rint(np.abs(np.where(missing, 0.0, prices)) * 100).astype(np.int64)
+    units = (cents // 100).astype(str)
+    fraction = np.char.zfill((cents % 100).astype(str), 2)
+    sign = np.where((prices < 0) & (cents > 0), "-", "")
+    formatted = np.char.add(np.char.add(np.char.add(symbol, sign), units), np.char.add(".", fraction))
+    return pd.Series(np.where(missing, "", formatted), index=values.index, dtype="str")
+
+
+def _get_export_currency_code() -> str:
     try:
-        settings = get_setting_from_db()
-        currency_code = getattr(settings, "currency", "") or ""
+        settings = get_cached_setting_from_db()
+        return getattr(settings, "currency", "") or ""
     except Exception:
-        # if settings retrieval fails, fall back to no symbol
-        currency_code = ""
+        # if settings retrieval fails, fall back to no currency
+        return ""
 
-    symbol = _get_currency_symbol(currency_code)
 
-    # ensure numeric prices are formatted with 2 decimals and prefixed with symbol
-    def _format_price(val):
-        if val is None or (isinstance(val, float) and pd.isna(val)):
-            return ""
-        try:
-            # try to coerce to float then format
-            return f"{symbol}{float(val):.2f}"
-        except Exception:
-            # fallback to str
-            return f"{symbol}{val}"
+def _get_export_currency_symbol() -> str:
+    # format price values using currency symbol from settings
+    return _get_currency_symbol(_get_export_currency_code())
 
-    df["price"] = df["price"].apply(_format_price)
 
-    # reorder columns
-    df = df[["modified_date", "date", "total_kwh_consumed", "price", "delta_kwh"]]
+def _build_raw_frame(data: dict, previous_kwh: Optional[float] = None) -> pd.DataFrame:
+    df = pd.DataFrame(data)
+
+    # compute delta compared to previous month
+    if "total_kwh_consumed" in df and not df.empty:
+        first_delta = df["total_kwh_consumed"] - (previous_kwh or 0)
+        df["delta_kwh"] = df["total_kwh_consumed"].diff().fillna(first_delta).round(3)
     return df
 
 
-def build_csv_bytes() -> bytes:
-    items = get_all_monthly_consumption_from_db()
-    df = _prepare_dataframe(items)
+def _format_frame(df: pd.DataFrame, columns: List[str], symbol: str) -> pd.DataFrame:
+    # format dates to ISO strings
+    if "modified_date" in columns:
+        df["modified_date"] = _format_iso_datetimes(df["modified_date"])
+    if "date" in columns:
+        df["date"] = _format_iso_dates(df["date"])
+    if "price" in columns:
+        df["price"] = _format_prices(df["price"], symbol)
+
+    # reorder columns
+    return df[columns]
+
+
+def _prepare_dataframe(rows: Iterable[dict], columns: Optional[List[str]] = None,
+                       previous_kwh: Optional[float] = None) -> pd.DataFrame:
+    # rows are projected monthly_consumptions documents, already sorted by date ascending
+    columns = columns or EXPORT_COLUMNS
+    df = _build_raw_frame(_read_columns(rows, _fields_for_columns(columns)), previous_kwh)
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    symbol = _get_export_currency_symbol() if "price" in columns else ""
+    return _format_frame(df, columns, symbol)
+
+
+class ExportSummary:
+    """
+    Monthly and yearly totals accumulated chunk by chunk while the rows are exported.
+    The first reading without an earlier one counts as 0 kWh consumed, its delta would
+    be the whole meter reading.
+    """
+
+    def __init__(self):
+        # (year, month) -> [consumed kWh, price, readings]
+        self.monthly = {}
+
+    def add(self, df: pd.DataFrame, has_previous: bool = True):
+        dates = pd.to_datetime(df["date"], errors="coerce")
+        kwh = df["delta_kwh"]
+        if not has_previous:
+            kwh = kwh.copy()
+            kwh.iloc[0] = 0.0
+        chunk = pd.DataFrame({
+            "year": dates.dt.year,
+            "month": dates.dt.month,
+            "kwh": kwh,
+            "price": pd.to_numeric(df["price"], errors="coerce").fillna(0.0),
+        }).dropna(subset=["year"])
+        grouped = chunk.groupby(["year", "month"]).agg(kwh=("kwh", "sum"), price=("price", "sum"),
+                                                       readings=("kwh", "size"))
+        for (year, month), kwh, price, readings in grouped.itertuples(name=None):
+            totals = self.monthly.setdefault((int(year), int(month)), [0.0, 0.0, 0])
+            totals[0] += kwh
+            totals[1] += price
+            totals[2] += readings
+
+    def monthly_rows(self) -> List[tuple]:
+        return [(f"{year:04d}-{month:02d}", round(kwh, 3), round(price, 2), readings)
+                for (year, month), (kwh, price, readings) in sorted(self.monthly.items())]
+
+    def yearly_rows(self) -> List[tuple]:
+        yearly = {}
+        for (year, _), (kwh, price, readings) in self.monthly.items():
+            totals = yearly.setdefault(year, [0.0, 0.0, 0])
+            totals[0] += kwh
+            totals[1] += price
+            totals[2] += readings
+        return [(year, round(kwh, 3), round(price, 2), readings)
+                for year, (kwh, price, readings) in sorted(yearly.items())]
+
+    def totals(self) -> tuple:
+        kwh = sum(totals[0] for totals in self.monthly.values())
+        price = sum(totals[1] for totals in self.monthly.values())
+        readings = sum(totals[2] for totals in self.monthly.values())
+        return round(kwh, 3), round(price, 2), readings
+
+
+def build_csv_bytes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    columns: Optional[List[str]] = None) -> bytes:
+    df = _load_dataframe(date_from, date_to, columns)
     buf = io.BytesIO()
     # cast to a file-like for the type checker
     df.to_csv(cast(IO[Any], buf), index=False)
     return buf.getvalue()
 
 
-def build_xlsx_bytes() -> bytes:
-    items = get_all_monthly_consumption_from_db()
-    df = _prepare_dataframe(items)
+def build_xlsx_bytes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     columns: Optional[List[str]] = None, summary: bool = False) -> bytes:
+    columns = columns or EXPORT_COLUMNS
+    export_summary = ExportSummary() if summary else None
+
+    # write-only workbook: rows are streamed to a temp file instead of kept as cell objects in RAM
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("monthly_consumption")
+    sheet.append(columns)
+    for df in _iter_dataframes(date_from, date_to, columns, export_summary):
+        for row in df.itertuples(index=False, name=None):
+            sheet.append(row)
+
+    if export_summary is not None:
+        summary_sheet = workbook.create_sheet("summary")
+        summary_sheet.append(["month", "consumption_kwh", "price", "readings"])
+        for row in export_summary.monthly_rows():
+            summary_sheet.append(row)
+        summary_sheet.append([])
+        summary_sheet.append(["year", "consumption_kwh", "price", "readings"])
+        for row in export_summary.yearly_rows():
+            summary_sheet.append(row)
+
     buf = io.BytesIO()
-    # use openpyxl engine (already a dependency)
-    with pd.ExcelWriter(cast(IO[Any], buf), engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="monthly_consumption")
+    workbook.save(buf)
     return buf.getvalue()
 
 
-def build_pdf_bytes() -> bytes:
-    items = get_all_monthly_consumption_from_db()
-    df = _prepare_dataframe(items)
+def _arrow_schema(columns: List[str]) -> pa.Schema:
+    # prices stay numeric, so the currency code travels as schema metadata
+    schema = pa.schema([pa.field(column, ARROW_TYPES[column]) for column in columns])
+    return schema.with_metadata({"currency": _get_export_currency_code().upper()})
+
+
+def _iter_record_batches(date_from: Optional[date], date_to: Optional[date], columns: List[str],
+                         schema: pa.Schema, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pa.RecordBatch]:
+    for df in _iter_raw_frames(date_from, date_to, columns, chunk_size=chunk_size):
+        arrays = []
+        for field in schema:
+            if pa.types.is_timestamp(field.type):
+                values = pd.to_datetime(df[field.name], errors="coerce")
+            else:
+                values = pd.to_numeric(df[field.name], errors="coerce")
+            # NaN/NaT become nulls
+            arrays.append(pa.Array.from_pandas(values, type=field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def build_parquet_bytes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        columns: Optional[List[str]] = None) -> bytes:
+    columns = columns or EXPORT_COLUMNS
+    schema = _arrow_schema(columns)
+    sink = pa.BufferOutputStream()
+    # one row group per chunk read from the cursor
+    with pq.ParquetWriter(sink, schema, compression=ARROW_COMPRESSION) as writer:
+        for batch in _iter_record_batches(date_from, date_to, columns, schema):
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def build_arrow_bytes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                      columns: Optional[List[str]] = None) -> bytes:
+    columns = columns or EXPORT_COLUMNS
+    schema = _arrow_schema(columns)
+    sink = pa.BufferOutputStream()
+    # Arrow IPC stream format, record batches compressed individually
+    options = pa.ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        for batch in _iter_record_batches(date_from, date_to, columns, schema):
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _pdf_table(data: List[list], col_widths: List[float], row_height: Optional[float] = None) -> Table:
+    # fixed column widths and row heights spare reportlab from measuring every cell
+    table = Table(data, colWidths=col_widths, rowHeights=row_height, repeatRows=1)
+    table.setStyle(PDF_TABLE_STYLE)
+    return table
+
+
+def _pdf_chart(title: str, labels: List[str], values: List[float], width: float, height: float) -> Drawing:
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 12, title, fontSize=10, textAnchor="middle"))
+    chart = VerticalBarChart()
+    chart.x = 40
+    chart.y = 40
+    chart.width = width - 60
+    chart.height = height - 70
+    chart.data = [values]
+    chart.bars[0].fillColor = colors.steelblue
+    chart.valueAxis.valueMin = min(0.0, min(values))
+    chart.categoryAxis.categoryNames = labels
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.fontSize = 6
+    drawing.add(chart)
+    return drawing
+
+
+def _pdf_summary(summary: ExportSummary, symbol: str, width: float, date_from: Optional[date],
+                 date_to: Optional[date]) -> list:
+    styles = getSampleStyleSheet()
+    period = ""
+    if date_from or date_to:
+        period = f" ({date_from.isoformat() if date_from else '...'} to {date_to.isoformat() if date_to else '...'})"
+    kwh, price, readings = summary.totals()
+
+    elements = [
+        Paragraph(f"Monthly consumption report{period}", styles["Title"]),
+        _pdf_table([
+            ["readings", "consumption_kwh", "price"],
+            [str(readings), f"{kwh:.3f}", f"{symbol}{price:.2f}"],
+        ], [width / 3] * 3),
+        Spacer(1, 12),
+    ]
+
+    # one bar per month for short histories, otherwise one per year to keep the charts readable
+    rows = summary.monthly_rows()
+    if len(rows) > PDF_CHART_MAX_BARS:
+        rows = summary.yearly_rows()
+    if rows:
+        labels = [str(row[0]) for row in rows]
+        elements.append(Table([[
+            _pdf_chart("Consumption (kWh)", labels, [row[1] for row in rows], width / 2, PDF_CHART_HEIGHT),
+            _pdf_chart(f"Cost ({symbol})" if symbol else "Cost", labels, [row[2] for row in rows], width / 2,
+                       PDF_CHART_HEIGHT),
+        ]], colWidths=[width / 2] * 2))
+    return elements
+
+
+def build_pdf_bytes(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    columns: Optional[List[str]] = None) -> bytes:
+    columns = columns or EXPORT_COLUMNS
+    summary = ExportSummary()
     buf = io.BytesIO()
 
-    # create a PDF with a simple table using reportlab
+    # create a PDF report using reportlab: totals and charts first, then the readings
     doc = SimpleDocTemplate(buf, pagesize=landscape(letter))
-    elements = []
+    col_widths = [doc.width / len(columns)] * len(columns)
+    # the frame adds 6pt of padding on each side; one row is left for the repeated header
+    rows_per_table = int((doc.height - 12) // PDF_ROW_HEIGHT) - 1
 
-    if df.empty:
-        data = [["No data available"]]
+    # page-sized tables keep layout cost linear in the number of rows; rows left over at the end of
+    # a chunk are carried into the next one, so only the last table of the document is partial
+    tables = []
+    pending = []
+    for df in _iter_dataframes(date_from, date_to, columns, summary):
+        pending += [["" if v is None else str(v) for v in row] for row in df.itertuples(index=False, name=None)]
+        full = len(pending) - len(pending) % rows_per_table
+        for start in range(0, full, rows_per_table):
+            tables.append(_pdf_table([columns] + pending[start:start + rows_per_table], col_widths,
+                                     PDF_ROW_HEIGHT))
+        pending = pending[full:]
+    if pending:
+        tables.append(_pdf_table([columns] + pending, col_widths, PDF_ROW_HEIGHT))
+
+    if not tables:
+        elements = [_pdf_table([["No data available"]], [doc.width])]
     else:
-        # build table data including header
-        cols = list(df.columns)
-        data = [cols] + df.values.tolist()
-        # convert any non-string entries to str for reportlab
-        for i in range(len(data)):
-            data[i] = ["" if v is None else str(v) for v in data[i]]
-
-    table = Table(data)
-    table_style = TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-    ])
-    table.setStyle(table_style)
-    elements.append(table)
+        symbol = _get_export_currency_symbol()
+        elements = _pdf_summary(summary, symbol, doc.width, date_from, date_to) + [PageBreak()] + tables
 
     doc.build(elements)
     buf.seek(0)
-    return buf.getvalue()
\ No newline at end of file
+    return buf.getvalue()
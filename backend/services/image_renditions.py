@@ -0,0 +1,74 @@
+"""
+Downscaled renditions of stored meter images.
+
+Renditions are rendered lazily on the first request for a size, stored in the blob
+store and linked from the reading under ``renditions.<source file id>.<size>``, so every
+later request streams the small file directly.
+"""
+import cv2
+import numpy as np
+from bson import ObjectId
+
+from backend.services.crud.crud_files import open_file_from_db, save_bytes_to_db, delete_file_from_db
+from backend.services.db_client import get_db
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+
+# longest edge in pixels, images are never upscaled
+RENDITION_SIZES = {
+    "thumbnail": 160,
+    "medium": 640,
+}
+RENDITION_EXTENSION = ".webp"
+RENDITION_CONTENT_TYPE = "image/webp"
+RENDITION_QUALITY = 80
+
+
+def render_rendition(image_bytes: bytes, max_edge: int) -> bytes:
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileIsNotAnImageException()
+
+    height, width = image.shape[:2]
+    scale = max_edge / max(height, width)
+    if scale < 1:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    encoded, buffer = cv2.imencode(RENDITION_EXTENSION, image, [cv2.IMWRITE_WEBP_QUALITY, RENDITION_QUALITY])
+    if not encoded:
+        raise FileIsNotAnImageException("The image could not be encoded.")
+    return buffer.tobytes()
+
+
+def get_rendition_file_id(file_id: str, size: str) -> ObjectId:
+    if not ObjectId.is_valid(file_id):
+        raise NoObjectHasFoundException()
+    source_id = ObjectId(file_id)
+    collection = get_db()["monthly_consumptions"]
+    # only images that belong to a reading get renditions; readings edited before
+    # 20261019130000_file_ids_as_object_ids ran may still hold the id as a string
+    source_ids = {"$in": [source_id, file_id]}
+    reading = collection.find_one({"$or": [{"original_file": source_ids}, {"label_file": source_ids}]},
+                                  {"renditions": 1})
+    if reading is None:
+        raise NoObjectHasFoundException()
+
+    rendition_id = reading.get("renditions", {}).get(file_id, {}).get(size)
+    if rendition_id:
+        return rendition_id
+
+    with open_file_from_db(file_id) as grid_out:
+        image_bytes = grid_out.read()
+    rendition_id = save_bytes_to_db(render_rendition(image_bytes, RENDITION_SIZES[size]),
+                                    f"{file_id}_{size}{RENDITION_EXTENSION}", RENDITION_CONTENT_TYPE)
+
+    field = f"renditions.{file_id}.{size}"
+    result = collection.update_one({"_id": reading["_id"], field: {"$exists": False}},
+                                   {"$set": {field: rendition_id}})
+    if result.modified_count == 0:
+        # a concurrent request linked its rendition first, keep that one
+        delete_file_from_db(rendition_id)
+        reading = collection.find_one({"_id": reading["_id"]}, {"renditions": 1})
+        return reading["renditions"][file_id][size]
+    return rendition_id
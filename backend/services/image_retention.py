@@ -0,0 +1,303 @@
+"""
+Image retention and storage tiering.
+
+A background pass over the readings that:
+- re-encodes originals of readings older than RETENTION_REENCODE_AFTER_MONTHS as
+  JPEG at RETENTION_REENCODE_QUALITY (same pixel size, so stored detections stay valid)
+- drops derived files (renditions and legacy annotated/label files) of readings older
+  than RETENTION_DROP_DERIVED_AFTER_MONTHS; they are rendered again when viewed
+
+Readings themselves are never deleted. Each rule is off while its variable is unset.
+Progress is checkpointed in the background_jobs collection like data_migrations, so an
+interrupted pass resumes where it stopped, and every pass records the bytes reclaimed.
+"""
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+import cv2
+import numpy as np
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from backend.services.crud.crud_files import open_file_from_db, save_bytes_to_db, delete_file_from_db, \
+    release_file_from_db, FILE_REFS_COLLECTION
+from backend.services.db_client import get_db
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.lease import Lease, lease_owner
+from backend.services.model.RetentionJob import RetentionJob
+
+RETENTION_JOB_ID = "image_retention"
+JOBS_COLLECTION = "background_jobs"
+COLLECTION_NAME = "monthly_consumptions"
+BATCH_SIZE = 20
+# re-encoded copies that do not save at least this share of the original are not kept
+REENCODE_MIN_SAVING = 0.1
+REENCODE_CONTENT_TYPE = "image/jpeg"
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    reencode_after_months: Optional[int] = None
+    reencode_quality: int = 60
+    drop_derived_after_months: Optional[int] = None
+    interval_hours: float = 24
+    # pause after every reading so the pass does not compete with request traffic
+    throttle_seconds: float = 0.2
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        def optional_int(name):
+            value = os.environ.get(name)
+            return int(value) if value else None
+
+        return cls(
+            reencode_after_months=optional_int("RETENTION_REENCODE_AFTER_MONTHS"),
+            reencode_quality=int(os.environ.get("RETENTION_REENCODE_QUALITY", cls.reencode_quality)),
+            drop_derived_after_months=optional_int("RETENTION_DROP_DERIVED_AFTER_MONTHS"),
+            interval_hours=float(os.environ.get("RETENTION_INTERVAL_HOURS", cls.interval_hours)),
+            throttle_seconds=float(os.environ.get("RETENTION_THROTTLE_SECONDS", cls.throttle_seconds)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.reencode_after_months is not None or self.drop_derived_after_months is not None
+
+
+def months_ago(now: datetime, months: int) -> datetime:
+    month_index = now.year * 12 + now.month - 1 - months
+    year, month = divmod(month_index, 12)
+    # clamp the day for shorter months (e.g. 31 March - 1 month)
+    for day in range(now.day, 27, -1):
+        try:
+            return now.replace(year=year, month=month + 1, day=day)
+        except ValueError:
+            continue
+    return now.replace(year=year, month=month + 1, day=min(now.day, 28))
+
+
+def run_retention(policy: Optional[RetentionPolicy] = None, now: Optional[datetime] = None,
+                  lease: Optional[Lease] = None) -> dict:
+    policy = policy or RetentionPolicy.from_env()
+    jobs = get_db()[JOBS_COLLECTION]
+    job = jobs.find_one({"_id": RETENTION_JOB_ID})
+    if not policy.enabled:
+        return job or {}
+
+    if job is None or job.get("status") != "running":
+        job = _start_run(jobs, policy, now or datetime.now())
+
+    collection = get_db()[COLLECTION_NAME]
+    reencode_before = job.get("reencode_before")
+    drop_derived_before = job.get("drop_derived_before")
+    newest_cutoff = max(cutoff for cutoff in (reencode_before, drop_derived_before) if cutoff)
+    last_id = job.get("last_id")
+    bytes_reclaimed = job.get("bytes_reclaimed", 0)
+
+    try:
+        while True:
+            query = {"date": {"$lt": newest_cutoff}}
+            if last_id:
+                query["_id"] = {"$gt": last_id}
+            readings = list(collection.find(query).sort("_id", 1).limit(BATCH_SIZE))
+            if not readings:
+                break
+
+            reclaimed = 0
+            for reading in readings:
+                if lease is not None:
+                    # stop before touching files another worker may now be handling
+                    lease.check()
+                last_id = reading["_id"]
+                if drop_derived_before and reading["date"] < drop_derived_before:
+                    reclaimed += _drop_derived_files(reading)
+                if reencode_before and reading["date"] < reencode_before:
+                    reclaimed += _reencode_original(reading, policy.reencode_quality)
+                time.sleep(policy.throttle_seconds)
+
+            jobs.update_one({"_id": RETENTION_JOB_ID}, {
+                "$set": {"last_id": last_id},
+                "$inc": {"processed": len(readings), "bytes_reclaimed": reclaimed},
+            })
+            bytes_reclaimed += reclaimed
+    except LeaseLostException:
+        # the pass stays running, the worker holding the lease now resumes it from last_id
+        raise
+    except Exception as e:
+        jobs.update_one({"_id": RETENTION_JOB_ID},
+                        {"$set": {"status": "failed", "error": str(e), "finished_at": _utc_now()}})
+        raise
+
+    jobs.update_one({"_id": RETENTION_JOB_ID}, {
+        "$set": {"status": "done", "finished_at": _utc_now()},
+        "$inc": {"total_bytes_reclaimed": bytes_reclaimed},
+    })
+    return jobs.find_one({"_id": RETENTION_JOB_ID})
+
+
+def run_retention_periodically():
+    # every worker runs this loop, the lease lets one of them do each pass
+    lease = Lease(get_db()[JOBS_COLLECTION], f"{RETENTION_JOB_ID}:lease", lease_owner())
+    while True:
+        policy = RetentionPolicy.from_env()
+        if policy.enabled and _pass_is_due(policy) and lease.acquire():
+            try:
+                with lease.heartbeat():
+                    run_retention(policy, lease=lease)
+            except LeaseLostException:
+                print("[Retention] Lease lost, another worker continues the pass")
+            except Exception as e:
+                print(f"[Retention] Failed: {e}")
+            finally:
+                lease.release()
+        time.sleep(policy.interval_hours * 3600)
+
+
+def _pass_is_due(policy: RetentionPolicy) -> bool:
+    # another worker may have finished a pass while this one was sleeping
+    job = get_db()[JOBS_COLLECTION].find_one({"_id": RETENTION_JOB_ID}, {"status": 1, "finished_at": 1})
+    if not job or job.get("status") != "done" or not job.get("finished_at"):
+        return True
+    finished_at = datetime.fromisoformat(job["finished_at"])
+    return datetime.now(timezone.utc) - finished_at >= timedelta(hours=policy.interval_hours)
+
+
+def get_retention_job() -> RetentionJob:
+    policy = RetentionPolicy.from_env()
+    job = get_db()[JOBS_COLLECTION].find_one({"_id": RETENTION_JOB_ID}) or {}
+    return RetentionJob(
+        enabled=policy.enabled,
+        reencode_after_months=policy.reencode_after_months,
+        reencode_quality=policy.reencode_quality,
+        drop_derived_after_months=policy.drop_derived_after_months,
+        **{field: job[field] for field in RetentionJob.model_fields if job.get(field) is not None
+           and field not in ("enabled", "reencode_after_months", "reencode_quality", "drop_derived_after_months")},
+    )
+
+
+def _start_run(jobs, policy: RetentionPolicy, now: datetime) -> dict:
+    # cutoffs are fixed for the whole pass, so a resumed pass applies the same rules
+    run = {
+        "status": "running",
+        "started_at": _utc_now(),
+        "finished_at": None,
+        "error": None,
+        "last_id": None,
+        "processed": 0,
+        "bytes_reclaimed": 0,
+        "reencode_before": months_ago(now, policy.reencode_after_months)
+        if policy.reencode_after_months is not None else None,
+        "drop_derived_before": months_ago(now, policy.drop_derived_after_months)
+        if policy.drop_derived_after_months is not None else None,
+    }
+    jobs.update_one({"_id": RETENTION_JOB_ID}, {"$set": run}, upsert=True)
+    return {"_id": RETENTION_JOB_ID, **run}
+
+
+def _file_length(file_id) -> int:
+    try:
+        with open_file_from_db(str(file_id)) as stored_file:
+            return stored_file.length
+    except NoObjectHasFoundException:
+        return 0
+
+
+def _drop_derived_files(reading: dict) -> int:
+    reclaimed = 0
+    update = {}
+    for field in ("label_file", "file_label_name"):
+        if reading.get(field):
+            reclaimed += _file_length(reading[field])
+            release_file_from_db(reading[field])
+            update.setdefault("$set", {})[field] = None
+
+    renditions = reading.get("renditions") or {}
+    for sizes in renditions.values():
+        for rendition_id in sizes.values():
+            reclaimed += _file_length(rendition_id)
+            delete_file_from_db(rendition_id)
+    if renditions:
+        update["$unset"] = {"renditions": ""}
+
+    if update:
+        get_db()[COLLECTION_NAME].update_one({"_id": reading["_id"]}, update)
+    return reclaimed
+
+
+def _reencode_original(reading: dict, quality: int) -> int:
+    collection = get_db()[COLLECTION_NAME]
+    # a reading earlier in the batch may have shared this original and moved it already
+    reading = collection.find_one({"_id": reading["_id"]}, {"original_file": 1, "original_reencoded": 1}) or {}
+    if reading.get("original_reencoded") or not reading.get("original_file"):
+        return 0
+    original_id = ObjectId(str(reading["original_file"]))
+    # readings edited before 20261019130000_file_ids_as_object_ids hold the id as a string
+    sharing_query = {"original_file": {"$in": [original_id, str(original_id)]}}
+
+    try:
+        with open_file_from_db(str(original_id)) as stored_file:
+            filename = stored_file.filename
+            original = stored_file.read()
+    except NoObjectHasFoundException:
+        return 0
+
+    image = cv2.imdecode(np.frombuffer(original, np.uint8), cv2.IMREAD_COLOR)
+    encoded, buffer = (False, None) if image is None else \
+        cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not encoded or len(buffer) > len(original) * (1 - REENCODE_MIN_SAVING):
+        # not an image or already compact, keep the original as it is
+        collection.update_many(sharing_query, {"$set": {"original_reencoded": True}})
+        return 0
+
+    data = buffer.tobytes()
+    new_id = save_bytes_to_db(data, f"{os.path.splitext(filename or str(original_id))[0]}.jpg",
+                              REENCODE_CONTENT_TYPE)
+    # the original's digest stops deduplicating first, so a new upload of the same photo
+    # stores a full quality copy instead of sharing the lossy one
+    file_refs = get_db()[FILE_REFS_COLLECTION]
+    original_ref = file_refs.find_one_and_delete({"file_id": original_id})
+
+    # readings can share the original, move all of them and drop renditions of the old file
+    sharing = list(collection.find(sharing_query, {"renditions": 1}))
+    moved = collection.update_many(sharing_query, {
+        "$set": {"original_file": new_id, "original_reencoded": True},
+        "$unset": {f"renditions.{original_id}": ""},
+    }).modified_count
+    if moved == 0:
+        # the readings were deleted meanwhile
+        delete_file_from_db(new_id)
+        return 0
+    _add_reencoded_reference(file_refs, collection, data, new_id, moved)
+
+    for shared in sharing:
+        for rendition_id in ((shared.get("renditions") or {}).get(str(original_id)) or {}).values():
+            delete_file_from_db(rendition_id)
+
+    # an upload that took a reference to the original just before its digest was dropped
+    # saves its reading after the move, the original is kept for it
+    if (original_ref and original_ref["refcount"] > moved) or collection.find_one(sharing_query, {"_id": 1}):
+        print(f"[Retention] Kept original {original_id}, it is still referenced")
+        return 0
+    delete_file_from_db(original_id)
+    return len(original) - len(data)
+
+
+def _add_reencoded_reference(file_refs, collection, data: bytes, new_id: ObjectId, readings: int):
+    file_ref = file_refs.find_one_and_update(
+        {"_id": hashlib.sha256(data).hexdigest()},
+        {"$inc": {"refcount": readings}, "$setOnInsert": {"file_id": new_id}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if file_ref["file_id"] != new_id:
+        # the same bytes are already stored (another original re-encoded to identical pixels), share them
+        collection.update_many({"original_file": new_id}, {"$set": {"original_file": file_ref["file_id"]}})
+        delete_file_from_db(new_id)
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,33 @@
+"""
+Tracks request-time model inference in this process, so background work such as the
+data migrations can step aside while uploads are being processed. The count is per
+worker: with several workers, background work only yields to the uploads of its own.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# background work keeps pausing this long after the last request inference finished
+BUSY_GRACE_SECONDS = 2.0
+
+_lock = threading.Lock()
+_in_flight = 0
+_last_finished = 0.0
+
+
+@contextmanager
+def request_inference():
+    global _in_flight, _last_finished
+    with _lock:
+        _in_flight += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_flight -= 1
+            _last_finished = time.monotonic()
+
+
+def inference_busy(grace_seconds: float = BUSY_GRACE_SECONDS) -> bool:
+    with _lock:
+        return _in_flight > 0 or time.monotonic() - _last_finished < grace_seconds
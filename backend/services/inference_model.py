@@ -0,0 +1,150 @@
+"""
+Loading YOLO models for inference (the version uploads use is picked by model_registry).
+
+Fusing the layers is done once per weights file: the fused model is
+saved next to it as <name>-<sha256 prefix>.fused.pt (by scripts/build_model_artifact.py
+at image build time, or by the first load) and later loads read that artifact instead.
+The checksum in its name ties it to the weights it was built from, so replaced weights
+are never served from a stale artifact.
+
+Under gunicorn with preload_app (gunicorn.conf.py) the master process loads and warms
+up the model before forking, so the workers share the weights copy-on-write instead of
+each holding its own copy. Torch thread counts are set per worker after the fork.
+"""
+import gc
+import hashlib
+import os
+import time
+from datetime import datetime
+
+MODEL_PATH = "models/best.pt"
+ARTIFACT_SUFFIX = ".fused.pt"
+
+# seconds spent in each step of the last model load, for the startup log
+load_timings: dict = {}
+
+
+def model_version(model_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as model_file:
+        for chunk in iter(lambda: model_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    # used as a field name, so no dots
+    return f"{os.path.splitext(os.path.basename(model_path))[0]}-{digest.hexdigest()[:12]}"
+
+
+def artifact_path(model_path: str) -> str:
+    return os.path.join(os.path.dirname(model_path), f"{model_version(model_path)}{ARTIFACT_SUFFIX}")
+
+
+def load_model(model_path: str):
+    """
+    The fused model of `model_path`, from its artifact when there is one. Otherwise the
+    weights are loaded and fused, and the artifact is written for the next load.
+    """
+    started = time.perf_counter()
+    # torch and ultralytics take seconds to import, only pay for them when inference runs
+    from ultralytics import YOLO
+    timings = {"import": time.perf_counter() - started}
+
+    step = time.perf_counter()
+    artifact = artifact_path(model_path)
+    timings["checksum"] = time.perf_counter() - step
+
+    model = None
+    step = time.perf_counter()
+    if os.path.exists(artifact):
+        try:
+            model = YOLO(artifact)
+            timings["load_artifact"] = time.perf_counter() - step
+        except Exception as e:
+            print(f"[Model] Ignoring unreadable artifact {artifact}: {e}")
+
+    if model is None:
+        step = time.perf_counter()
+        model = YOLO(model_path)
+        timings["load_weights"] = time.perf_counter() - step
+        step = time.perf_counter()
+        model.fuse()
+        timings["fuse"] = time.perf_counter() - step
+        try:
+            save_artifact(model, artifact)
+        except OSError as e:
+            # read-only model folder, the next load fuses again
+            print(f"[Model] Could not write artifact {artifact}: {e}")
+
+    timings["total"] = time.perf_counter() - started
+    load_timings.clear()
+    load_timings.update(timings)
+    print(f"[Model] Loaded {artifact if 'load_artifact' in timings else model_path} in {timings['total']:.2f}s "
+          f"({', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items() if name != 'total')})")
+    return model
+
+
+def build_artifact(model_path: str = MODEL_PATH) -> str:
+    """
+    Fuses the weights at `model_path` and saves the artifact, replacing an existing one.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    model.fuse()
+    artifact = artifact_path(model_path)
+    save_artifact(model, artifact)
+    return artifact
+
+
+def save_artifact(model, artifact: str):
+    import torch
+
+    # same layout as an ultralytics checkpoint, so YOLO() loads it; the fused layers are kept as they are
+    checkpoint = {
+        "model": model.model,
+        "train_args": (model.ckpt or {}).get("train_args", {}),
+        "date": datetime.now().isoformat(),
+        "source": os.path.basename(artifact)[:-len(ARTIFACT_SUFFIX)],
+    }
+    # workers starting together may all write it, each one replaces the file in a single step
+    temp_path = f"{artifact}.{os.getpid()}.tmp"
+    torch.save(checkpoint, temp_path)
+    os.replace(temp_path, artifact)
+
+
+def preload_model():
+    """
+    Loads and warms up the model in a process that is about to fork its workers.
+    """
+    import torch
+
+    from backend.services.model_registry import load_active_model
+
+    # OpenMP thread pools started before a fork hang in the children, the master stays on one thread
+    torch.set_num_threads(1)
+    model, _ = load_active_model()
+    warm_up(model)
+    # objects that exist now are never collected, so the collector does not write to (and copy) their pages
+    gc.freeze()
+
+
+def warm_up(model):
+    import numpy as np
+
+    from backend.services.process_image import INFERENCE_ARGS
+
+    started = time.perf_counter()
+    # the first prediction imports torchvision and sets up the predictor, not the first upload
+    model(np.zeros((64, 64, 3), np.uint8), **INFERENCE_ARGS, verbose=False)
+    load_timings["warmup"] = time.perf_counter() - started
+    print(f"[Model] Warmed up in {load_timings['warmup']:.2f}s")
+
+
+def set_worker_threads(workers: int):
+    """
+    Torch threads of a forked worker: INFERENCE_TORCH_THREADS, or the CPUs split
+    between the workers.
+    """
+    import torch
+
+    threads = int(os.environ.get("INFERENCE_TORCH_THREADS", 0)) or max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(threads)
+    return threads
@@ -0,0 +1,116 @@
+"""
+Lease locks kept in a MongoDB collection.
+
+A lease document holds the owner, its last heartbeat and an expiry. Only one process
+holds a lease at a time; while it works a heartbeat thread pushes the expiry forward,
+and a lease whose owner stopped heart-beating (crashed or was killed) expires and is
+taken over by the next process that asks for it.
+
+A failed renewal is retried until the lease would expire. Once it is lost, `lost` is
+set and check() raises at the owner's next checkpoint, so the work stops before the
+new owner's run is overwritten.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+LEASE_TTL = timedelta(seconds=int(os.environ.get("LEASE_TTL_SECONDS", 60)))
+RENEW_RETRY_SECONDS = 1
+
+
+def lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    def __init__(self, collection, lease_id: str, owner: str, ttl: timedelta = LEASE_TTL):
+        self.collection = collection
+        self.lease_id = lease_id
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = threading.Event()
+
+    def acquire(self) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            lease = self.collection.find_one_and_update(
+                {"_id": self.lease_id, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {
+                    "$set": {
+                        "kind": "lease",
+                        "owner": self.owner,
+                        "acquired_at": now,
+                        "heartbeat_at": now,
+                        "expires_at": now + self.ttl,
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # held by a live owner
+            return False
+        acquired = lease is not None and lease.get("owner") == self.owner
+        if acquired:
+            self.lost.clear()
+        return acquired
+
+    def renew(self) -> bool:
+        now = datetime.now(timezone.utc)
+        result = self.collection.update_one(
+            {"_id": self.lease_id, "owner": self.owner},
+            {"$set": {"heartbeat_at": now, "expires_at": now + self.ttl}},
+        )
+        return result.matched_count == 1
+
+    def release(self):
+        self.collection.delete_one({"_id": self.lease_id, "owner": self.owner})
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLostException(f"Lost the lease {self.lease_id}")
+
+    @contextmanager
+    def heartbeat(self):
+        stop = threading.Event()
+        ttl = self.ttl.total_seconds()
+
+        def _beat():
+            expires_at = time.monotonic() + ttl
+            wait = ttl / 3
+            while not stop.wait(wait):
+                renewing_at = time.monotonic()
+                try:
+                    renewed = self.renew()
+                except Exception as e:
+                    if time.monotonic() >= expires_at:
+                        print(f"[Lease] Lost {self.lease_id}, it expired before it could be renewed: {e}")
+                        self.lost.set()
+                        return
+                    # e.g. a transient MongoDB error, retried while the lease is still ours
+                    print(f"[Lease] Could not renew {self.lease_id}, retrying: {e}")
+                    wait = min(RENEW_RETRY_SECONDS, ttl / 3)
+                    continue
+                if not renewed:
+                    print(f"[Lease] Lost {self.lease_id}, owned by another process now")
+                    self.lost.set()
+                    return
+                expires_at = renewing_at + ttl
+                wait = ttl / 3
+
+        thread = threading.Thread(target=_beat, daemon=True, name=f"lease-{self.lease_id}")
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
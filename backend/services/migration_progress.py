@@ -0,0 +1,74 @@
+"""
+Progress of the data migrations, read from their data_migrations records.
+
+Remaining documents are counted past the record's last_id in the collection the
+migration walks (its COLLECTION_NAME), so they are exact for migrations that process
+every document in _id order.
+"""
+import importlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from backend.services.db_client import get_db
+from backend.services.model.MigrationProgress import MigrationProgress
+
+MIGRATIONS_COLLECTION = "data_migrations"
+
+
+def get_migration_progress() -> list[MigrationProgress]:
+    db = get_db()
+    records = db[MIGRATIONS_COLLECTION].find({"kind": {"$ne": "lease"}}).sort("_id", 1)
+    return [_to_progress(db, record) for record in records]
+
+
+def _to_progress(db, record: dict) -> MigrationProgress:
+    status = record.get("status", "running")
+    processed = record.get("processed", 0)
+    started_at = _parse_time(record.get("started_at"))
+    finished_at = _parse_time(record.get("finished_at"))
+
+    remaining = 0 if status == "done" else _count_remaining(db, record)
+
+    docs_per_second = None
+    if started_at:
+        elapsed = ((finished_at or datetime.now(timezone.utc)) - started_at).total_seconds()
+        if elapsed > 0:
+            docs_per_second = round(processed / elapsed, 2)
+
+    eta_seconds = None
+    if status == "running" and remaining is not None and docs_per_second:
+        eta_seconds = round(remaining / docs_per_second, 1)
+
+    return MigrationProgress(
+        migration_id=record["_id"],
+        status=status,
+        processed=processed,
+        remaining=remaining,
+        docs_per_second=docs_per_second,
+        eta_seconds=eta_seconds,
+        error=record.get("error"),
+        started_at=started_at,
+        finished_at=finished_at,
+    )
+
+
+def _count_remaining(db, record: dict) -> Optional[int]:
+    try:
+        module = importlib.import_module(f"backend.migrations.{record['_id']}")
+    except ImportError:
+        # the migration was removed from the code base
+        return None
+
+    collection_name = getattr(module, "COLLECTION_NAME", None)
+    if collection_name is None:
+        return None
+
+    query = {"_id": {"$gt": record["last_id"]}} if record.get("last_id") else {}
+    return db[collection_name].count_documents(query)
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
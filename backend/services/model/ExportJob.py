@@ -0,0 +1,28 @@
+from datetime import datetime, date
+from typing import Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+from backend.services.model.MonthlyConsumption import PyObjectId
+
+
+class ExportJob(BaseModel):
+    oid: PyObjectId = Field(default=None, alias="_id")
+    status: str
+    file_format: str
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    columns: Optional[list[str]] = None
+    summary: bool = False
+    data_version: int
+    size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = {
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str},
+        "populate_by_name": True,
+    }
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class ImageQualityStats(BaseModel):
+    thresholds: dict
+    checked: int = 0
+    rejected: int = 0
+    rejection_rate: float = 0.0
+    rejected_by_reason: dict[str, int] = {}
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class MigrationProgress(BaseModel):
+    migration_id: str
+    status: str
+    processed: int = 0
+    remaining: Optional[int] = None
+    docs_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
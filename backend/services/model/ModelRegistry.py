@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ModelVersion(BaseModel):
+    name: str
+    version: str
+    size_bytes: int
+    modified_at: datetime
+    metadata: dict = {}
+    active: bool = False
+
+
+class ModelSwap(BaseModel):
+    # idle, loading or failed, for the worker that answered
+    state: str
+    target_version: Optional[str] = None
+    loaded_version: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ModelRegistry(BaseModel):
+    active_version: Optional[str] = None
+    models: list[ModelVersion]
+    # versions rollback goes back to, most recent last
+    history: list[str] = []
+    swap: ModelSwap
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
 
 from bson import ObjectId
 from pydantic import BaseModel, Field
@@ -41,7 +41,16 @@ class MonthlyConsumption(BaseModel):
     file_name: str
     label_file: object
     file_label_name: object
-    conf_array: list[dict]
+    # compact per-digit confidences; conf_array is only filled when a client asks for it
+    conf_chars: Optional[str] = None
+    conf_values: Optional[list[float]] = None
+    conf_array: Optional[list[dict]] = None
+    # OBB geometry used to render the annotated image, not part of API responses
+    detections: list[dict] = Field(default_factory=list, exclude=True)
+    # every box down to the raw floor as packed float32 arrays, used to replay thresholds
+    raw_detections: Optional[dict] = Field(default=None, exclude=True)
+    # registry version of the model that read the meter, None for manual and older readings
+    model_version: Optional[str] = None
     score: float
 
     class ConfigDict:
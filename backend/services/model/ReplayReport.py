@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+from backend.services.model.ReprocessJob import ReprocessDiff
+
+
+class ReplayReport(BaseModel):
+    replayed: int
+    changed: int
+    applied: int
+    # changed readings left as they were because no electricity price covers their date
+    unpriced: int
+    diffs: list[ReprocessDiff]
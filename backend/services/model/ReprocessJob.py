@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+from backend.services.model.MonthlyConsumption import PyObjectId
+
+
+class ReprocessJob(BaseModel):
+    oid: PyObjectId = Field(default=None, alias="_id")
+    status: str
+    model_version: str
+    processed: int = 0
+    changed: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = {
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str},
+        "populate_by_name": True,
+    }
+
+
+class ReprocessDiff(BaseModel):
+    reading_id: PyObjectId
+    date: Optional[datetime] = None
+    old_value: Optional[float] = None
+    new_value: Optional[float] = None
+    old_score: Optional[float] = None
+    new_score: Optional[float] = None
+
+    model_config = {
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str},
+    }
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RetentionJob(BaseModel):
+    enabled: bool
+    status: Optional[str] = None
+    reencode_after_months: Optional[int] = None
+    reencode_quality: int
+    drop_derived_after_months: Optional[int] = None
+    reencode_before: Optional[datetime] = None
+    drop_derived_before: Optional[datetime] = None
+    processed: int = 0
+    bytes_reclaimed: int = 0
+    total_bytes_reclaimed: int = 0
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,202 @@
+"""
+Model registry: versioned weights in MODEL_REGISTRY_DIR and the version uploads use.
+
+Every <name>.pt in the directory is a model version, identified by model_version()
+(file name plus a sha256 prefix of the weights), with optional metadata in <name>.json
+next to it. The active version and the versions it replaced are recorded in the
+model_registry collection, best.pt is active until another one is activated.
+
+Activating a version loads and warms it up in a background thread while uploads keep
+using the current model, then swaps it in with a single assignment: uploads already
+running finish with the model they started with. The registry record is only written
+after the new model warmed up, and every other worker polls it and swaps the same way.
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backend.services.db_client import get_db
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.inference_model import load_model, model_version, warm_up
+from backend.services.model.ModelRegistry import ModelRegistry, ModelSwap, ModelVersion
+
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "models")
+MODEL_NAME_PATTERN = re.compile(r"^[\w-]+\.pt$")
+DEFAULT_MODEL = "best.pt"
+REGISTRY_COLLECTION = "model_registry"
+REGISTRY_ID = "active"
+# how often workers check the registry for a version activated by another worker
+POLL_SECONDS = 10
+
+_lock = threading.Lock()
+# (model, version) used by uploads in this process
+_active = None
+_swap = {"state": "idle", "target_version": None, "error": None}
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-swap")
+_watcher_pid = None
+
+
+def model_path(name: str) -> str:
+    path = os.path.join(MODEL_REGISTRY_DIR, name)
+    if not MODEL_NAME_PATTERN.match(name) or not os.path.isfile(path):
+        raise NoObjectHasFoundException()
+    return path
+
+
+def list_models() -> list[ModelVersion]:
+    active = _registry().get("active") or {}
+    models = []
+    for name in sorted(os.listdir(MODEL_REGISTRY_DIR)):
+        path = os.path.join(MODEL_REGISTRY_DIR, name)
+        if not MODEL_NAME_PATTERN.match(name) or not os.path.isfile(path):
+            continue
+        version = model_version(path)
+        models.append(ModelVersion(
+            name=name,
+            version=version,
+            size_bytes=os.path.getsize(path),
+            modified_at=datetime.fromtimestamp(os.path.getmtime(path)),
+            metadata=_metadata(path),
+            active=version == active.get("version") if active else name == DEFAULT_MODEL,
+        ))
+    return models
+
+
+def get_model_registry() -> ModelRegistry:
+    registry = _registry()
+    active = registry.get("active") or {}
+    return ModelRegistry(
+        active_version=active.get("version"),
+        models=list_models(),
+        history=[entry["version"] for entry in registry.get("history", [])],
+        swap=get_model_swap(),
+    )
+
+
+def get_model_swap() -> ModelSwap:
+    return ModelSwap(**_swap, loaded_version=_active[1] if _active else None)
+
+
+def get_active_model():
+    """
+    (model, version) for uploads. The first call loads the active version, later ones
+    return the loaded model right away.
+    """
+    _watch_registry()
+    return load_active_model()
+
+
+def load_active_model():
+    global _active
+    if _active is None:
+        with _lock:
+            if _active is None:
+                path = active_model_path()
+                _active = (load_model(path), model_version(path))
+    return _active
+
+
+def active_model_path() -> str:
+    return model_path((_registry().get("active") or {}).get("name", DEFAULT_MODEL))
+
+
+def activate_model(name: str) -> ModelSwap:
+    path = model_path(name)
+    version = model_version(path)
+    current = _registry().get("active") or _default_entry()
+    if current["version"] == version:
+        # already serving it, recording it again would make the next rollback a no-op swap
+        return get_model_swap()
+    _start_swap(name, version, {"$push": {"history": current}})
+    return get_model_swap()
+
+
+def rollback_model() -> ModelSwap:
+    """
+    Activates the version the active one replaced.
+    """
+    history = _registry().get("history") or []
+    if not history:
+        raise NoObjectHasFoundException()
+    previous = history[-1]
+    path = model_path(previous["name"])
+    if model_version(path) != previous["version"]:
+        # the file was replaced since, that version is gone
+        raise NoObjectHasFoundException()
+    _start_swap(previous["name"], previous["version"], {"$pop": {"history": 1}})
+    return get_model_swap()
+
+
+def watch_registry():
+    """
+    Starts this process's registry poller; called by every worker after the fork.
+    """
+    global _watcher_pid
+    _watcher_pid = os.getpid()
+    threading.Thread(target=_poll_registry, daemon=True, name="model-registry").start()
+
+
+def _watch_registry():
+    # threads do not survive a fork, each process starts its own poller
+    if _watcher_pid != os.getpid():
+        watch_registry()
+
+
+def _poll_registry():
+    while True:
+        time.sleep(POLL_SECONDS)
+        try:
+            active = _registry().get("active")
+            if not active or _active is None or _active[1] == active["version"]:
+                continue
+            if _swap["state"] == "loading" or (_swap["state"] == "failed" and _swap["target_version"] == active["version"]):
+                continue
+            _start_swap(active["name"], active["version"])
+        except Exception as e:
+            print(f"[Model] Registry check failed: {e}")
+
+
+def _start_swap(name: str, version: str, record: dict = None):
+    _swap.update(state="loading", target_version=version, error=None)
+    _executor.submit(_swap_model, name, version, record)
+
+
+def _swap_model(name: str, version: str, record: dict = None):
+    global _active
+    try:
+        path = model_path(name)
+        model = load_model(path)
+        warm_up(model)
+        with _lock:
+            _active = (model, version)
+        if record is not None:
+            get_db()[REGISTRY_COLLECTION].update_one({"_id": REGISTRY_ID}, {
+                "$set": {"active": {"name": name, "version": version, "activated_at": datetime.now()}},
+                **record,
+            }, upsert=True)
+        _swap.update(state="idle", target_version=None)
+        print(f"[Model] Now serving {version}")
+    except Exception as e:
+        _swap.update(state="failed", error=str(e))
+        print(f"[Model] Could not load {version}: {e}")
+
+
+def _registry() -> dict:
+    return get_db()[REGISTRY_COLLECTION].find_one({"_id": REGISTRY_ID}) or {}
+
+
+def _default_entry() -> dict:
+    path = model_path(DEFAULT_MODEL)
+    return {"name": DEFAULT_MODEL, "version": model_version(path), "activated_at": None}
+
+
+def _metadata(path: str) -> dict:
+    metadata_path = f"{os.path.splitext(path)[0]}.json"
+    if not os.path.isfile(metadata_path):
+        return {}
+    with open(metadata_path) as metadata_file:
+        return json.load(metadata_file)
@@ -3,75 +3,76 @@ import shutil
 from datetime import datetime
 
 from starlette.datastructures import UploadFile
-from ultralytics import YOLO
 
 from backend.services.crud import crud_files, crud_monthly_consumption
+from backend.services.detection_replay import RAW_DETECTION_FLOOR, raw_detections_from_result, \
+    detections_from_raw, summarize_detections
 from backend.services.exception.ResultIsNotFoundException import ResultIsNotFoundException
+from backend.services.image_quality import check_image_quality
+from backend.services.inference_activity import request_inference
 from backend.services.model.MonthlyConsumption import MonthlyConsumption
+from backend.services.model_registry import get_active_model
 
 DETECT_FOLDER = "runs/obb/predict/"
+# every box down to the raw floor is kept, readings are decoded from them at DETECTION_CONF
+INFERENCE_ARGS = {"rect": True, "imgsz": 1280, "conf": RAW_DETECTION_FLOOR}
 
 
 class ProcessImage:
-    def __init__(self):
-        self.model = YOLO("models/best.pt")
-
     def process_image(self, file: UploadFile):
+        # unreadable photos are rejected here, before the model is even loaded
+        check_image_quality(file.file.read())
+        file.file.seek(0)
+        # a swap to another version does not affect an upload that already started
+        self.model, self.model_version = get_active_model()
+
         cleanup("", DETECT_FOLDER)
         temp_file_path = f"temp_{file.filename}"
-        with open(temp_file_path, "wb") as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-
-        results = self.model(temp_file_path, save=True, rect=True, save_txt=True, imgsz=1280, conf=0.5)
-
-        detections = []
-        for box in results[0].obb:
-            cls = int(box.cls.item())
-            conf = float(box.conf.item())
-            label = self.model.names[cls]
-            x_center = box.xywhr[0][0].item()
-            detections.append((x_center, label, conf))
-
-        detections.sort(key=lambda x: x[0])
-
-        output = ''.join([lbl for _, lbl, _ in detections])
-        with_conf = ' '.join([f"{lbl}:{conf:.2f}" for _, lbl, conf in detections])
-
-        conf_arry = []
-        score_avg = 0
-        for _, lbl, conf in detections:
-            conf_arry.append({"char": str(lbl), "conf": float(conf)})
-            score_avg += conf
-        score_avg /= len(detections) if conf_arry else 0.0
-
         try:
-            output = float(output)
-        except ValueError:
+            with open(temp_file_path, "wb") as temp_file:
+                shutil.copyfileobj(file.file, temp_file)
+            return self._read_meter(temp_file_path, file.filename)
+        finally:
+            cleanup(temp_file_path, DETECT_FOLDER)
+
+    def _read_meter(self, temp_file_path, file_name):
+        # the annotated image is rendered on demand from the stored detections, nothing is saved to disk
+        with request_inference():
+            results = self.model(temp_file_path, **INFERENCE_ARGS)
+
+        raw_detections = raw_detections_from_result(results[0], self.model.names)
+        detections = detections_from_raw(raw_detections)
+        output, conf_arry, score_avg = summarize_detections(detections)
+        with_conf = ' '.join([f"{detection['char']}:{detection['conf']:.2f}" for detection in detections])
+
+        if output is None:
             raise ResultIsNotFoundException()
 
         print("Predicted Number:", float(output))
         print("Digits with Confidence:", with_conf)
 
+        original_file = crud_files.save_file_to_db(temp_file_path, file_name)
         monthly_consumption = MonthlyConsumption(
             modified_date=datetime.now(),
             date=datetime.now(),
             total_kwh_consumed=float(output),
             price=0.0,
-            original_file=crud_files.save_file_to_db(temp_file_path, file.filename),
-            file_name=file.filename,
-            label_file=crud_files.save_file_to_db(
-                DETECT_FOLDER + temp_file_path.replace(extract_file_name_type(temp_file_path)[1], ".jpg"),
-                temp_file_path.replace(extract_file_name_type(temp_file_path)[1], ".jpg")),
-            file_label_name=crud_files.save_file_to_db(
-                DETECT_FOLDER + "labels/" + temp_file_path.replace(extract_file_name_type(temp_file_path)[1], ".txt"),
-                temp_file_path.replace(extract_file_name_type(temp_file_path)[1], ".txt")),
-            conf_array = conf_arry,
+            original_file=original_file,
+            file_name=file_name,
+            label_file=None,
+            file_label_name=None,
+            conf_array=conf_arry,
+            detections=detections,
+            raw_detections=raw_detections,
+            model_version=self.model_version,
             score=score_avg)
 
-
-        monthly_consumption_id = crud_monthly_consumption.save_monthly_consumption_to_db(monthly_consumption)
-
-        cleanup(temp_file_path, DETECT_FOLDER)
+        try:
+            monthly_consumption_id = crud_monthly_consumption.save_monthly_consumption_to_db(monthly_consumption)
+        except Exception:
+            # the reading was not stored, so nothing else holds the reference taken above
+            crud_files.release_file_from_db(original_file)
+            raise
 
         return crud_monthly_consumption.get_monthly_consumption_from_db(monthly_consumption_id)
 
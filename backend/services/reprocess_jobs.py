@@ -0,0 +1,200 @@
+"""
+Reprocessing jobs: re-score stored readings with another model version.
+
+A job runs the chosen weights from the model registry over the stored originals in
+batches (files fetched concurrently, one model call per batch, one bulk_write), under
+the same resource budget as the data migrations. Results are stored next to the
+current ones in model_results.<model version>, the reading itself is left untouched,
+and every reading whose value would change is written to the job's diff report.
+
+Jobs checkpoint by _id, so a job interrupted by a restart resumes where it stopped.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import cv2
+import numpy as np
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo import UpdateOne
+
+from backend.migrations.batching import batch_size, prefetch, throttle, torch_threads
+from backend.services.conf_array_codec import conf_storage_fields
+from backend.services.crud.crud_files import get_file_from_db
+from backend.services.db_client import get_db
+from backend.services.detection_replay import raw_detections_from_result, detections_from_raw, summarize_detections
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.inference_model import model_version, load_model
+from backend.services.lease import Lease, lease_owner
+from backend.services.model.ReprocessJob import ReprocessJob, ReprocessDiff
+from backend.services.model_registry import model_path
+from backend.services.process_image import INFERENCE_ARGS
+
+REPROCESS_JOBS_COLLECTION = "reprocess_jobs"
+REPROCESS_DIFFS_COLLECTION = "reprocess_diffs"
+LEASES_COLLECTION = "background_jobs"
+COLLECTION_NAME = "monthly_consumptions"
+BATCH_SIZE = batch_size(16)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reprocess-job")
+
+
+def request_reprocess(model_name: str) -> dict:
+    path = model_path(model_name)
+
+    job = {
+        "_id": ObjectId(),
+        "model_path": path,
+        "model_version": model_version(path),
+        "status": "queued",
+        "last_id": None,
+        "processed": 0,
+        "changed": 0,
+        "created_at": datetime.now(),
+    }
+    get_db()[REPROCESS_JOBS_COLLECTION].insert_one(job)
+    _executor.submit(run_reprocess_job, job["_id"])
+    return job
+
+
+def resume_reprocess_jobs():
+    for job in get_db()[REPROCESS_JOBS_COLLECTION].find({"status": {"$in": ["queued", "running"]}}, {"_id": 1}):
+        _executor.submit(run_reprocess_job, job["_id"])
+
+
+def run_reprocess_job(job_id: ObjectId):
+    # every worker resumes unfinished jobs on startup, the lease lets one of them run each job
+    lease = Lease(get_db()[LEASES_COLLECTION], f"reprocess_{job_id}:lease", lease_owner())
+    if not lease.acquire():
+        return
+    try:
+        with lease.heartbeat():
+            _run_job(job_id, lease)
+    except LeaseLostException:
+        print(f"[Reprocess] Lost the lease of job {job_id}, stopped")
+    finally:
+        lease.release()
+
+
+def _run_job(job_id: ObjectId, lease: Optional[Lease] = None):
+    jobs = get_db()[REPROCESS_JOBS_COLLECTION]
+    job = jobs.find_one_and_update(
+        {"_id": job_id, "status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "running", "started_at": datetime.now()}},
+    )
+    if job is None:
+        return
+
+    collection = get_db()[COLLECTION_NAME]
+    last_id = job.get("last_id")
+    try:
+        model = load_model(job["model_path"])
+        while True:
+            if lease is not None:
+                lease.check()
+
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            docs = list(collection.find(query, {"original_file": 1, "total_kwh_consumed": 1, "score": 1, "date": 1})
+                        .sort("_id", 1).limit(BATCH_SIZE))
+            if not docs:
+                break
+
+            changed = _process_batch(docs, job, collection, model)
+            last_id = docs[-1]["_id"]
+            jobs.update_one({"_id": job_id}, {
+                "$set": {"last_id": last_id},
+                "$inc": {"processed": len(docs), "changed": changed},
+            })
+            throttle(len(docs))
+    except LeaseLostException:
+        # the job stays running, the worker holding the lease now resumes it from last_id
+        raise
+    except Exception as e:
+        jobs.update_one({"_id": job_id},
+                        {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now()}})
+        return
+
+    jobs.update_one({"_id": job_id}, {"$set": {"status": "done", "finished_at": datetime.now()}})
+
+
+def _process_batch(docs, job, collection, model) -> int:
+    files = prefetch(_read_original, [doc.get("original_file") for doc in docs])
+
+    batch = []
+    for doc in docs:
+        file_bytes = files.get(doc.get("original_file"))
+        image = cv2.imdecode(np.frombuffer(file_bytes, np.uint8), cv2.IMREAD_COLOR) if file_bytes else None
+        if image is not None:
+            batch.append((doc, image))
+    if not batch:
+        return 0
+
+    with torch_threads():
+        results = model([image for _, image in batch], **INFERENCE_ARGS)
+
+    version = job["model_version"]
+    operations = []
+    diffs = []
+    for (doc, _), result in zip(batch, results):
+        raw_detections = raw_detections_from_result(result, model.names)
+        value, conf_array, score = summarize_detections(detections_from_raw(raw_detections))
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {f"model_results.{version}": {
+            "total_kwh_consumed": value,
+            **conf_storage_fields(conf_array),
+            "score": score,
+            "raw_detections": raw_detections,
+            "job_id": job["_id"],
+            "created_at": datetime.now(),
+        }}}))
+        if value != doc.get("total_kwh_consumed"):
+            diffs.append({
+                "job_id": job["_id"],
+                "reading_id": doc["_id"],
+                "date": doc.get("date"),
+                "old_value": doc.get("total_kwh_consumed"),
+                "new_value": value,
+                "old_score": doc.get("score"),
+                "new_score": score,
+            })
+
+    collection.bulk_write(operations, ordered=False)
+    if diffs:
+        get_db()[REPROCESS_DIFFS_COLLECTION].insert_many(diffs)
+    return len(diffs)
+
+
+def _read_original(file_id):
+    try:
+        return get_file_from_db(file_id)
+    except (NoFile, NoObjectHasFoundException):
+        return None
+
+
+def get_reprocess_job(job_id) -> dict:
+    if not ObjectId.is_valid(job_id):
+        raise NoObjectHasFoundException()
+    job = get_db()[REPROCESS_JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+    if job is None:
+        raise NoObjectHasFoundException()
+    return job
+
+
+def get_reprocess_diff(job_id) -> list[ReprocessDiff]:
+    job = get_reprocess_job(job_id)
+    diffs = get_db()[REPROCESS_DIFFS_COLLECTION].find({"job_id": job["_id"]}).sort("reading_id", 1)
+    return [ReprocessDiff(**diff) for diff in diffs]
+
+
+def to_reprocess_job(job: dict) -> ReprocessJob:
+    return ReprocessJob(
+        _id=job["_id"],
+        status=job["status"],
+        model_version=job["model_version"],
+        processed=job.get("processed", 0),
+        changed=job.get("changed", 0),
+        error=job.get("error"),
+        created_at=job["created_at"],
+        finished_at=job.get("finished_at"),
+    )
@@ -46,6 +46,7 @@ export default function ConsumptionHistory() {
         formatDate,
         formatTimestamp,
         getFileUrl,
+        getAnnotatedUrl,
         handleEditFormChange,
         handleEditSubmit,
         handleDelete,
@@ -208,6 +209,7 @@ export default function ConsumptionHistory() {
                                     activeImageTab={activeImageTab}
                                     onImageTabChange={setActiveImageTab}
                                     getFileUrl={getFileUrl}
+                                    getAnnotatedUrl={getAnnotatedUrl}
                                     formatDate={formatDate}
                                     formatTimestamp={formatTimestamp}
                                     getCurrencySymbol={getCurrencySymbol}
@@ -319,6 +321,7 @@ export default function ConsumptionHistory() {
                                                         activeImageTab={activeImageTab}
                                                         onImageTabChange={setActiveImageTab}
                                                         getFileUrl={getFileUrl}
+                                                        getAnnotatedUrl={getAnnotatedUrl}
                                                         formatDate={formatDate}
                                                         formatTimestamp={formatTimestamp}
                                                         getCurrencySymbol={getCurrencySymbol}
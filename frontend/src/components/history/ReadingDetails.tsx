@@ -1,13 +1,14 @@
 import {useState} from 'react';
 import {Paper, Typography, Grid, Tabs, Tab, Box, Tooltip, Dialog, DialogContent, IconButton} from '@mui/material';
 import {Image, Label, Info, Close, ZoomIn} from '@mui/icons-material';
-import type {MonthlyConsumption, ImageTab} from './types';
+import type {MonthlyConsumption, ImageTab, ImageSize} from './types';
 
 interface ReadingDetailsProps {
     reading: MonthlyConsumption;
     activeImageTab: ImageTab;
     onImageTabChange: (tab: ImageTab) => void;
-    getFileUrl: (fileId: string | undefined) => string;
+    getFileUrl: (fileId: string | undefined, size?: ImageSize) => string;
+    getAnnotatedUrl: (readingId: string, size?: ImageSize) => string;
     formatDate: (dateString: string | undefined) => string;
     formatTimestamp: (dateString: string | undefined) => string;
     getCurrencySymbol: (currencyCode: string) => string;
@@ -20,6 +21,7 @@ export default function ReadingDetails({
     activeImageTab,
     onImageTabChange,
     getFileUrl,
+    getAnnotatedUrl,
     formatDate,
     formatTimestamp,
     getCurrencySymbol,
@@ -27,6 +29,13 @@ export default function ReadingDetails({
     isMobile
 }: ReadingDetailsProps) {
     const [zoomSrc, setZoomSrc] = useState<string | null>(null);
+    // compact per-digit confidences, conf_array is only sent with ?expand=conf_array
+    const confidences = reading.conf_values != null
+        ? reading.conf_values.map((conf, i) => ({char: reading.conf_chars?.[i] ?? '?', conf}))
+        : (reading.conf_array ?? []).map(item => ({
+            char: (item as { char?: string }).char ?? '?',
+            conf: (item as { conf?: number }).conf,
+        }));
 
     return (
         <Paper elevation={1} sx={{p: 2, mb: 2}}>
@@ -51,13 +60,11 @@ export default function ReadingDetails({
                             <Typography>{(Number(reading.score) * 100).toFixed(1)}%</Typography>
                         </>
                     )}
-                    {reading.conf_array != null && reading.conf_array.length > 0 && (
+                    {confidences.length > 0 && (
                         <Tooltip
                             title={
                                 <Box component="span" sx={{display: 'block', py: 0.5}}>
-                                    {reading.conf_array.map((item, i) => {
-                                        const char = (item as { char?: string }).char ?? '?';
-                                        const conf = (item as { conf?: number }).conf;
+                                    {confidences.map(({char, conf}, i) => {
                                         const pct = typeof conf === 'number' ? (conf * 100).toFixed(2) + '%' : '—';
                                         return (
                                             <Typography key={i} component="span" sx={{display: 'block', fontSize: '0.8rem', lineHeight: 1.5}}>
@@ -77,13 +84,13 @@ export default function ReadingDetails({
                         >
                             <Box component="span" sx={{cursor: 'help', display: 'inline-block'}}>
                                 <Typography variant="body2" color="text.secondary">Confidence (items)</Typography>
-                                <Typography>{reading.conf_array.length} detection(s)</Typography>
+                                <Typography>{confidences.length} detection(s)</Typography>
                             </Box>
                         </Tooltip>
                     )}
                 </Grid>
 
-                {(reading.original_file || reading.label_file) && (
+                {reading.original_file && (
                     <Grid sx={{flex: 1, mt: {xs: 0, md: -6}}}>
                         <Tabs
                             value={activeImageTab}
@@ -104,7 +111,7 @@ export default function ReadingDetails({
                                     }}
                                 />
                             )}
-                            {reading.label_file && (
+                            {reading.original_file && (
                                 <Tab
                                     icon={<Label sx={{fontSize: isMobile ? 28 : 20}}/>}
                                     label="Labeled"
@@ -122,7 +129,7 @@ export default function ReadingDetails({
                                 <Box sx={{ position: 'relative', display: 'inline-block', cursor: 'zoom-in' }}
                                      onClick={() => setZoomSrc(getFileUrl(reading.original_file ?? undefined))}>
                                     <img
-                                        src={getFileUrl(reading.original_file ?? undefined)}
+                                        src={getFileUrl(reading.original_file ?? undefined, 'medium')}
                                         alt="Original reading"
                                         style={{
                                             maxWidth: '100%',
@@ -143,11 +150,11 @@ export default function ReadingDetails({
                                     </Box>
                                 </Box>
                             )}
-                            {activeImageTab === 'labeled' && reading.label_file && (
+                            {activeImageTab === 'labeled' && reading.original_file && (
                                 <Box sx={{ position: 'relative', display: 'inline-block', cursor: 'zoom-in' }}
-                                     onClick={() => setZoomSrc(getFileUrl(reading.label_file ?? undefined))}>
+                                     onClick={() => setZoomSrc(getAnnotatedUrl(reading._id))}>
                                     <img
-                                        src={getFileUrl(reading.label_file ?? undefined)}
+                                        src={getAnnotatedUrl(reading._id, 'medium')}
                                         alt="Labeled reading"
                                         style={{
                                             maxWidth: '100%',
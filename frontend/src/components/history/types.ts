@@ -9,7 +9,10 @@ export interface MonthlyConsumption {
     file_label_name: string | null;
     created_at: string;
     updated_at: string;
-    conf_array?: Record<string, unknown>[];
+    conf_chars?: string | null;
+    conf_values?: number[] | null;
+    conf_array?: Record<string, unknown>[] | null;
+    model_version?: string | null;
     score?: number;
 }
 
@@ -31,6 +34,8 @@ export interface ConsumptionStats {
 
 export type ImageTab = 'original' | 'labeled';
 
+export type ImageSize = 'thumbnail' | 'medium';
+
 export interface ConsumptionStatsProps {
     stats: ConsumptionStats;
     currency: string;
@@ -58,7 +63,8 @@ export interface ReadingDetailsProps {
     reading: MonthlyConsumption;
     activeImageTab: ImageTab;
     onImageTabChange: (tab: ImageTab) => void;
-    getFileUrl: (fileId: string | undefined) => string;
+    getFileUrl: (fileId: string | undefined, size?: ImageSize) => string;
+    getAnnotatedUrl: (readingId: string, size?: ImageSize) => string;
     formatDate: (dateString: string | undefined) => string;
     formatTimestamp: (dateString: string | undefined) => string;
     getCurrencySymbol: (currencyCode: string) => string;
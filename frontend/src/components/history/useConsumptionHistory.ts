@@ -1,7 +1,7 @@
 import {useEffect, useState} from 'react';
 import axios from 'axios';
 import {API_URL} from '../../config';
-import type {ConsumptionStats, ImageTab, MonthlyConsumption, YearlyTotal} from './types';
+import type {ConsumptionStats, ImageSize, ImageTab, MonthlyConsumption, YearlyTotal} from './types';
 
 export function useConsumptionHistory() {
     const [readings, setReadings] = useState<MonthlyConsumption[]>([]);
@@ -168,9 +168,15 @@ export function useConsumptionHistory() {
         setActionMenuId(null);
     };
 
-    const getFileUrl = (fileId: string | undefined): string => {
+    const getFileUrl = (fileId: string | undefined, size?: ImageSize): string => {
         if (!fileId) return '';
-        return `${API_URL}/monthly-consumption/file/${fileId}`;
+        const query = size ? `?size=${size}` : '';
+        return `${API_URL}/monthly-consumption/file/${fileId}${query}`;
+    };
+
+    const getAnnotatedUrl = (readingId: string, size?: ImageSize): string => {
+        const query = size ? `?size=${size}` : '';
+        return `${API_URL}/monthly-consumption/${readingId}/annotated${query}`;
     };
 
     const getCurrencySymbol = (currencyCode: string): string => {
@@ -437,6 +443,7 @@ export function useConsumptionHistory() {
         handleActionMenuOpen,
         handleActionMenuClose,
         getFileUrl,
+        getAnnotatedUrl,
         getCurrencySymbol,
         formatDate,
         formatTimestamp,
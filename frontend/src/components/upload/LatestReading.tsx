@@ -32,7 +32,7 @@ export default function LatestReading({ reading }: LatestReadingProps) {
                 background: 'none',
             }}>
                 <img
-                    src={`${API_URL}/monthly-consumption/file/${reading.original_file}`}
+                    src={`${API_URL}/monthly-consumption/file/${reading.original_file}?size=medium`}
                     alt="Latest Reading"
                     style={{
                         width: '100%',
@@ -7,7 +7,10 @@ export interface MonthlyConsumption {
     file_name: string;
     label_file: string | null;
     file_label_name: string | null;
-    conf_array?: Record<string, unknown>[];
+    conf_chars?: string | null;
+    conf_values?: number[] | null;
+    conf_array?: Record<string, unknown>[] | null;
+    model_version?: string | null;
     score?: number;
 }
 
@@ -0,0 +1,35 @@
+"""
+Multi-worker launch mode:
+
+    gunicorn -c gunicorn.conf.py backend.main:app
+
+The app and the YOLO model are loaded once in the master (preload_app) and the workers
+are forked from it, so they share the model weights copy-on-write instead of each
+loading its own copy. Every worker then runs torch with its share of the CPUs.
+
+WEB_CONCURRENCY sets the number of workers, INFERENCE_TORCH_THREADS overrides the
+torch threads per worker.
+"""
+import os
+
+from backend.services.inference_model import preload_model, set_worker_threads
+from backend.services.model_registry import watch_registry
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# uploads run the model inside the request
+timeout = 120
+
+
+def on_starting(server):
+    preload_model()
+    server.log.info("Model loaded before forking %s workers", server.cfg.workers)
+
+
+def post_fork(server, worker):
+    threads = set_worker_threads(server.cfg.workers)
+    server.log.info("Worker %s uses %s torch threads", worker.pid, threads)
+    # follow versions activated through another worker
+    watch_registry()
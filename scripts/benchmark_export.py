@@ -0,0 +1,88 @@
+"""
+Benchmark the monthly consumption export on synthetic data.
+
+Usage:
+    PYTHONPATH=. python scripts/benchmark_export.py --rows 100000 --formats csv xlsx pdf parquet arrow [--trace-memory]
+
+The MongoDB query is replaced by an in-memory list of projected rows, so the
+numbers cover frame building and file generation only.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from backend.services import export_monthly_consumption as export
+from backend.services.model.Settings import Settings
+
+
+def make_rows(count):
+    start = datetime(2000, 1, 1)
+    return [
+        {
+            "modified_date": start + timedelta(hours=i, microseconds=(i % 7) * 1000),
+            "date": start + timedelta(days=i),
+            "total_kwh_consumed": 1000.0 + i * 12.5,
+            "price": round(i * 0.37 % 250, 4),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_prepare_dataframe(rows, symbol):
+    # the previous row-wise implementation, kept here as the baseline
+    df = pd.DataFrame(list(rows))
+    df["delta_kwh"] = df["total_kwh_consumed"].diff().fillna(df["total_kwh_consumed"]).round(3)
+    df["modified_date"] = df["modified_date"].apply(lambda x: x.isoformat() if isinstance(x, datetime) else str(x))
+    df["date"] = df["date"].apply(lambda x: x.date().isoformat() if isinstance(x, datetime) else str(x))
+    df["price"] = df["price"].apply(lambda val: f"{symbol}{float(val):.2f}")
+    return df[export.EXPORT_COLUMNS]
+
+
+def timed(label, func, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = ""
+    if trace_memory:
+        peak = f"{tracemalloc.get_traced_memory()[1] / 1024 / 1024:>10.1f} MiB peak"
+        tracemalloc.stop()
+    print(f"{label:<28}{elapsed:>10.3f}s{peak}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--formats", nargs="*", default=["csv", "xlsx", "pdf"], choices=["csv", "xlsx", "pdf", "parquet", "arrow"])
+    parser.add_argument("--summary", action="store_true", help="add the xlsx summary sheet")
+    parser.add_argument("--trace-memory", action="store_true", help="report peak Python allocations (slower)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    export.get_monthly_consumptions_for_export = lambda *_: rows
+    export.get_cached_setting_from_db = lambda: Settings(currency="usd")
+
+    print(f"rows: {args.rows}")
+    legacy = timed("frame (row-wise, legacy)", lambda: legacy_prepare_dataframe(rows, "$"))
+    columnar = timed("frame (columnar)", lambda: export._prepare_dataframe(rows))
+    assert legacy.equals(columnar), "columnar frame differs from the legacy frame"
+
+    builders = {
+        "csv": export.build_csv_bytes,
+        "xlsx": lambda: export.build_xlsx_bytes(summary=args.summary),
+        "pdf": export.build_pdf_bytes,
+        "parquet": export.build_parquet_bytes,
+        "arrow": export.build_arrow_bytes,
+    }
+    for file_format in args.formats:
+        data = timed(f"{file_format} export", builders[file_format], args.trace_memory)
+        print(f"{'':<28}{len(data) / 1024 / 1024:>10.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the GET /monthly-consumption read path on synthetic readings.
+
+Usage:
+    PYTHONPATH=. python scripts/benchmark_serialization.py --rows 10000 [--expand] [--repeat 5]
+
+The MongoDB query is replaced by an in-memory list of stored documents, so the
+numbers cover building the response and encoding it to JSON only.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from backend.api.responses import ORJSONResponse
+from backend.services.conf_array_codec import pack_conf_array, conf_response_fields
+from backend.services.crud import crud_monthly_consumption as crud
+from backend.services.model.MonthlyConsumption import MonthlyConsumption
+
+# what FastAPI runs for response_model=list[MonthlyConsumption]
+RESPONSE_ADAPTER = TypeAdapter(list[MonthlyConsumption])
+
+
+def make_docs(count):
+    start = datetime(2000, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "modified_date": start + timedelta(hours=i, microseconds=(i % 7) * 1000),
+            "date": start + timedelta(days=i),
+            "total_kwh_consumed": 1000.0 + i * 12.5,
+            "price": round(i * 0.37 % 250, 4),
+            "original_file": ObjectId(),
+            "file_name": f"meter_{i}.jpg",
+            "label_file": None,
+            "file_label_name": None,
+            **pack_conf_array([{"char": char, "conf": 0.5 + (i % 50) / 100} for char in str(1000 + i)]),
+            "score": 0.5 + (i % 50) / 100,
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_response(docs, expand):
+    # the previous implementation: one validated model per document, then the response_model pass
+    readings = [
+        MonthlyConsumption(
+            _id=doc["_id"],
+            modified_date=doc["modified_date"],
+            date=doc["date"],
+            total_kwh_consumed=doc["total_kwh_consumed"],
+            price=doc["price"],
+            original_file=str(doc["original_file"]) if isinstance(doc["original_file"], ObjectId) else doc[
+                "original_file"],
+            file_name=doc["file_name"],
+            label_file=doc["label_file"],
+            file_label_name=doc["file_label_name"],
+            **conf_response_fields(doc, expand),
+            score=doc.get("score", 0.0),
+        )
+        for doc in docs
+    ]
+    return RESPONSE_ADAPTER.dump_json(RESPONSE_ADAPTER.validate_python(readings), by_alias=True)
+
+
+def trusted_response(expand):
+    return ORJSONResponse(crud.get_all_monthly_consumption_rows(expand)).body
+
+
+def timed(label, func, repeat, rows):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<28}{elapsed:>10.3f}s{rows / elapsed:>12,.0f} rows/s")
+    return result
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, *_):
+        return iter(self.docs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--expand", action="store_true", help="include conf_array (?expand=conf_array)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.rows)
+    crud.get_db = lambda: {"monthly_consumptions": FakeCollection(docs)}
+
+    print(f"rows: {args.rows}")
+    legacy = timed("validated models (legacy)", lambda: legacy_response(docs, args.expand), args.repeat, args.rows)
+    trusted = timed("trusted rows + orjson", lambda: trusted_response(args.expand), args.repeat, args.rows)
+    assert json.loads(legacy) == json.loads(trusted), "trusted response differs from the legacy response"
+    print(f"{'':<28}{len(trusted) / 1024 / 1024:>10.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
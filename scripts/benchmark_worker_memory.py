@@ -0,0 +1,88 @@
+"""
+Benchmark the memory of inference workers with and without loading the model before forking.
+
+Usage:
+    PYTHONPATH=. python scripts/benchmark_worker_memory.py --workers 4 [--weights models/best.pt] [--predict]
+
+Forks the workers the way gunicorn does and reports RSS, PSS (RSS with shared pages
+split between the processes that share them) and private memory per worker, read from
+/proc/<pid>/smaps_rollup while all of them are alive. Linux only. --weights also takes a
+model config such as yolo11s-obb.yaml, which builds the network without the weights file.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from backend.services import inference_model
+
+
+def memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def worker(weights, predict, preloaded, ready, go):
+    model = inference_model.get_model() if preloaded else inference_model.load_model(weights)
+    inference_model.set_worker_threads(1)
+    if predict:
+        model(np.zeros((640, 640, 3), np.uint8), verbose=False)
+    os.write(ready, b"r")
+    os.read(go, 1)
+    os._exit(0)
+
+
+def run(label, workers, weights, predict, preloaded):
+    pids, gates = [], []
+    ready_read, ready_write = os.pipe()
+    for _ in range(workers):
+        go_read, go_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            worker(weights, predict, preloaded, ready_write, go_read)
+        pids.append(pid)
+        gates.append(go_write)
+    for _ in range(workers):
+        os.read(ready_read, 1)
+
+    rows = [memory(pid) for pid in pids]
+    for gate in gates:
+        os.write(gate, b"g")
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    print(label)
+    for pid, (rss, pss, private) in zip(pids, rows):
+        print(f"  worker {pid:<10}{rss:>10.1f} MiB rss{pss:>10.1f} MiB pss{private:>10.1f} MiB private")
+    print(f"  {'total pss':<17}{sum(pss for _, pss, _ in rows):>10.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--weights", default=inference_model.MODEL_PATH)
+    parser.add_argument("--predict", action="store_true", help="run one prediction in every worker first")
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("needs Linux /proc/<pid>/smaps_rollup")
+
+    import torch
+    torch.set_num_threads(1)
+    # the ML stack is imported in both modes, only the model differs
+    import ultralytics  # noqa: F401
+
+    print(f"workers: {args.workers}, weights: {args.weights}")
+    run("each worker loads the model", args.workers, args.weights, args.predict, preloaded=False)
+    inference_model.MODEL_PATH = args.weights
+    inference_model.preload_model()
+    run("model loaded before forking", args.workers, args.weights, args.predict, preloaded=True)
+
+
+if __name__ == "__main__":
+    main()
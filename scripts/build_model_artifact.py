@@ -0,0 +1,36 @@
+"""
+Build the fused model artifact loaded at startup instead of fusing the weights again.
+
+Usage:
+    PYTHONPATH=. python scripts/build_model_artifact.py [--weights models/best.pt]
+
+Writes <name>-<sha256 prefix>.fused.pt next to the weights and compares loading it with
+loading and fusing the weights.
+"""
+import argparse
+import time
+
+from backend.services import inference_model
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", default=inference_model.MODEL_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    artifact = inference_model.build_artifact(args.weights)
+    print(f"built {artifact} in {time.perf_counter() - started:.2f}s")
+
+    from ultralytics import YOLO
+
+    started = time.perf_counter()
+    YOLO(args.weights).fuse()
+    print(f"{'weights + fuse':<20}{time.perf_counter() - started:>8.3f}s")
+    started = time.perf_counter()
+    YOLO(artifact)
+    print(f"{'artifact':<20}{time.perf_counter() - started:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
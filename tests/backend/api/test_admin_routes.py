@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import patch
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from backend.api.admin_routes import get_migrations, create_reprocess_job, get_reprocess_job_diff, \
+    replay_stored_detections, activate_model_version, rollback_model_version, get_image_quality
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.model.ImageQualityStats import ImageQualityStats
+from backend.services.model.MigrationProgress import MigrationProgress
+from backend.services.model.ModelRegistry import ModelSwap
+from backend.services.model.ReprocessJob import ReprocessDiff
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.get_migration_progress")
+async def test_get_migrations(mock_progress):
+    mock_progress.return_value = [MigrationProgress(migration_id="m", status="running", processed=5, remaining=5)]
+    result = await get_migrations()
+    assert result[0].remaining == 5
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.request_reprocess", side_effect=NoObjectHasFoundException())
+async def test_create_reprocess_job_unknown_model(mock_request):
+    with pytest.raises(HTTPException) as exc:
+        await create_reprocess_job("nope.pt")
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.get_reprocess_diff")
+async def test_get_reprocess_job_diff(mock_diff):
+    reading_id = ObjectId()
+    mock_diff.return_value = [ReprocessDiff(reading_id=reading_id, old_value=17.0, new_value=18.0)]
+    result = await get_reprocess_job_diff(str(ObjectId()))
+    assert result[0].new_value == 18.0
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.replay_detections")
+async def test_replay_stored_detections(mock_replay):
+    mock_replay.return_value = {"replayed": 3, "changed": 1, "applied": 0, "unpriced": 0,
+                                "diffs": [{"reading_id": ObjectId(), "old_value": 13.0, "new_value": 143.0}]}
+    result = await replay_stored_detections(conf=0.4, order="x", apply=False)
+    mock_replay.assert_called_once_with(0.4, "x", False)
+    assert result.diffs[0].new_value == 143.0
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.activate_model")
+async def test_activate_model_version(mock_activate):
+    mock_activate.return_value = ModelSwap(state="loading", target_version="v2-0123456789ab")
+    result = await activate_model_version("v2.pt")
+    assert result.target_version == "v2-0123456789ab"
+    mock_activate.assert_called_once_with("v2.pt")
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.rollback_model", side_effect=NoObjectHasFoundException())
+async def test_rollback_without_history(mock_rollback):
+    with pytest.raises(HTTPException) as exc:
+        await rollback_model_version()
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("backend.api.admin_routes.get_image_quality_stats")
+async def test_get_image_quality(mock_stats):
+    mock_stats.return_value = ImageQualityStats(thresholds={"min_side": 200}, checked=4, rejected=1,
+                                                rejection_rate=0.25, rejected_by_reason={"too_dark": 1})
+    result = await get_image_quality()
+    assert result.rejection_rate == 0.25
@@ -0,0 +1,56 @@
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+from backend.api.compression import CompressionMiddleware
+
+body = "reading,price\n" * 500
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get("/text")
+def text():
+    return PlainTextResponse(body)
+
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("ok")
+
+
+@app.get("/xlsx")
+def xlsx():
+    return Response(body, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
+client = TestClient(app)
+
+
+def test_prefers_brotli():
+    response = client.get("/text", headers={"Accept-Encoding": "gzip, deflate, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_brotli_body_round_trips():
+    with client.stream("GET", "/text", headers={"Accept-Encoding": "br"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert brotli.decompress(raw).decode() == body
+
+
+def test_gzip_when_brotli_is_refused():
+    response = client.get("/text", headers={"Accept-Encoding": "gzip, br;q=0"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == body
+
+
+def test_identity_for_small_or_excluded_responses():
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "br"}).headers
+    assert "content-encoding" not in client.get("/xlsx", headers={"Accept-Encoding": "br"}).headers
+    assert "content-encoding" not in client.get("/text", headers={"Accept-Encoding": "identity"}).headers
@@ -1,11 +1,17 @@
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 from fastapi import HTTPException
+from fastapi.responses import FileResponse
 from datetime import datetime, date
+from io import BytesIO
 from bson import ObjectId
 
 from backend.api.monthly_consumption_routes import get_file, update_monthly_consumption, get_monthly_consumption
+from backend.services.blob_store import LocalFile
 from backend.services.model.MonthlyConsumption import MonthlyConsumption
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+from backend.services.exception.ImageQualityTooLowException import ImageQualityTooLowException
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.api import monthly_consumption_routes
 
@@ -63,14 +69,26 @@ sample_consumption = MonthlyConsumption(
 
 
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.get_all_monthly_consumption_from_db")
+@patch("backend.api.monthly_consumption_routes.get_all_monthly_consumption_rows")
 async def test_get_all_monthly_consumptions(mock_get_all):
-    mock_get_all.return_value = [sample_consumption]
+    mock_get_all.return_value = [sample_consumption.model_dump(by_alias=True)]
 
     result = await monthly_consumption_routes.get_all_monthly_consumptions()
 
-    assert len(result) == 1
-    assert result[0].total_kwh_consumed == 150.0
+    body = json.loads(result.body)
+    assert len(body) == 1
+    assert body[0]["total_kwh_consumed"] == 150.0
+    mock_get_all.assert_called_once_with(False)
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_all_monthly_consumption_rows")
+async def test_get_all_monthly_consumptions_expands_conf_array(mock_get_all):
+    mock_get_all.return_value = [sample_consumption.model_dump(by_alias=True)]
+
+    await monthly_consumption_routes.get_all_monthly_consumptions(expand="conf_array")
+
+    mock_get_all.assert_called_once_with(True)
 
 
 @pytest.mark.asyncio
@@ -145,50 +163,293 @@ async def test_delete_monthly_consumption_404(mock_delete):
 
     assert exc.value.status_code == 404
 
+def _export_job(file_format, status="done"):
+    return {
+        "_id": ObjectId(sample_id),
+        "status": status,
+        "file_format": file_format,
+        "filters": {"from": None, "to": None, "columns": None, "summary": False},
+        "data_version": 3,
+        "file_id": ObjectId(),
+        "created_at": datetime.now(),
+    }
+
+
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.build_csv_bytes")
-async def test_export_monthly_consumptions_returns_csv(mock_build_csv):
-    mock_build_csv.return_value = b"col1,col2\n1,2\n"
+@patch("backend.api.monthly_consumption_routes.get_export_artifact")
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_returns_csv(mock_request, mock_wait, mock_artifact):
+    mock_request.return_value = mock_wait.return_value = _export_job("csv")
+    mock_artifact.return_value = _grid_out(b"col1,col2\n1,2\n")
     response = await monthly_consumption_routes.export_monthly_consumptions("csv")
     assert response.media_type == "text/csv"
     assert "attachment; filename=monthly_consumption.csv" in response.headers["Content-Disposition"]
-    assert response.body == b"col1,col2\n1,2\n"
+    assert await _read_body(response) == b"col1,col2\n1,2\n"
 
 
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.build_xlsx_bytes")
-async def test_export_monthly_consumptions_returns_xlsx(mock_build_xlsx):
-    mock_build_xlsx.return_value = b"xlsx-bytes"
+@patch("backend.api.monthly_consumption_routes.get_export_artifact")
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_returns_xlsx(mock_request, mock_wait, mock_artifact):
+    mock_request.return_value = mock_wait.return_value = _export_job("xlsx")
+    mock_artifact.return_value = _grid_out(b"xlsx-bytes")
     response = await monthly_consumption_routes.export_monthly_consumptions("xlsx")
     assert response.media_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     assert "attachment; filename=monthly_consumption.xlsx" in response.headers["Content-Disposition"]
-    assert response.body == b"xlsx-bytes"
+    assert await _read_body(response) == b"xlsx-bytes"
 
 
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.build_pdf_bytes")
-async def test_export_monthly_consumptions_returns_pdf(mock_build_pdf):
-    mock_build_pdf.return_value = b"%PDF-1.4"
+@patch("backend.api.monthly_consumption_routes.get_export_artifact")
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_returns_pdf(mock_request, mock_wait, mock_artifact):
+    mock_request.return_value = mock_wait.return_value = _export_job("pdf")
+    mock_artifact.return_value = _grid_out(b"%PDF-1.4")
     response = await monthly_consumption_routes.export_monthly_consumptions("pdf")
     assert response.media_type == "application/pdf"
     assert "attachment; filename=monthly_consumption.pdf" in response.headers["Content-Disposition"]
-    assert response.body == b"%PDF-1.4"
+    assert await _read_body(response) == b"%PDF-1.4"
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_export_artifact")
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_returns_arrow_stream(mock_request, mock_wait, mock_artifact):
+    mock_request.return_value = mock_wait.return_value = _export_job("arrow")
+    mock_artifact.return_value = _grid_out(b"arrow-bytes")
+    response = await monthly_consumption_routes.export_monthly_consumptions("arrow")
+    assert response.media_type == "application/vnd.apache.arrow.stream"
+    assert "attachment; filename=monthly_consumption.arrows" in response.headers["Content-Disposition"]
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_export_artifact", side_effect=NoObjectHasFoundException())
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_evicted_meanwhile(mock_request, mock_wait, mock_artifact):
+    mock_request.return_value = mock_wait.return_value = _export_job("csv")
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.export_monthly_consumptions("csv")
+    assert exc.value.status_code == 410
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_returns_202_while_running(mock_request, mock_wait):
+    mock_request.return_value = mock_wait.return_value = _export_job("csv", status="running")
+    response = await monthly_consumption_routes.export_monthly_consumptions("csv")
+    assert response.status_code == 202
+    assert b'"status":"running"' in response.body
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.wait_for_export_job")
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_passes_filters(mock_request, mock_wait):
+    mock_request.return_value = mock_wait.return_value = _export_job("csv", status="queued")
+    await monthly_consumption_routes.export_monthly_consumptions(
+        "csv", date(2025, 10, 1), date(2025, 10, 31), "date, price")
+    mock_request.assert_called_once_with("csv", date(2025, 10, 1), date(2025, 10, 31), ["date", "price"], False)
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_export_monthly_consumptions_rejects_unknown_columns(mock_request):
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.export_monthly_consumptions("csv", columns="date,file_name")
+    assert exc.value.status_code == 400
+    assert "file_name" in exc.value.detail
+    mock_request.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_export_monthly_consumptions_rejects_inverted_range():
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.export_monthly_consumptions("csv", date(2025, 11, 1), date(2025, 10, 1))
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.request_export")
+async def test_create_export_job(mock_request):
+    mock_request.return_value = _export_job("pdf", status="queued")
+    result = await monthly_consumption_routes.create_export_job("pdf")
+    assert result.status == "queued"
+    assert result.data_version == 3
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_export_job")
+async def test_get_export_job_status_404(mock_get_job):
+    mock_get_job.side_effect = NoObjectHasFoundException()
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.get_export_job_status("missing")
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_export_job")
+async def test_get_export_job_file_409_when_not_ready(mock_get_job):
+    mock_get_job.return_value = _export_job("csv", status="running")
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.get_export_job_file(sample_id)
+    assert exc.value.status_code == 409
+
+def _grid_out(data=b"0123456789", filename="meter.jpg", metadata=None):
+    grid_out = MagicMock(wraps=BytesIO(data))
+    grid_out._id = ObjectId(sample_id)
+    grid_out.length = len(data)
+    grid_out.filename = filename
+    grid_out.metadata = metadata
+    return grid_out
+
+
+async def _read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
 
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.get_file_from_db")
-async def test_returns_file_with_valid_id(mock_get_file):
-    mock_get_file.return_value = b"file-content"
-    response = await get_file("valid_file_id")
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_file_with_valid_id(mock_open_file):
+    mock_open_file.return_value = _grid_out(b"file-content")
+    response = await get_file(sample_id)
     assert response.status_code == 200
-    assert response.media_type == "image/jpg"
-    assert response.headers["Content-Disposition"] == "attachment; filename=valid_file_id.jpg"
-    assert response.body == b"file-content"
+    assert response.media_type == "image/jpeg"
+    assert response.headers["Content-Disposition"] == f"attachment; filename={sample_id}.jpg"
+    assert response.headers["Content-Length"] == "12"
+    assert response.headers["ETag"] == f'"{sample_id}"'
+    assert await _read_body(response) == b"file-content"
+    mock_open_file.return_value.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_label_file_as_text(mock_open_file):
+    mock_open_file.return_value = _grid_out(b"0 0.5 0.5 0.1 0.1", filename="meter.txt")
+    response = await get_file(sample_id)
+    assert response.media_type == "text/plain"
+    assert response.headers["Content-Disposition"] == f"attachment; filename={sample_id}.txt"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("range_header, content_range, body", [
+    ("bytes=2-5", "bytes 2-5/10", b"2345"),
+    ("bytes=7-", "bytes 7-9/10", b"789"),
+    ("bytes=-3", "bytes 7-9/10", b"789"),
+    ("bytes=8-100", "bytes 8-9/10", b"89"),
+])
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_partial_content_for_range(mock_open_file, range_header, content_range, body):
+    mock_open_file.return_value = _grid_out()
+    response = await get_file(sample_id, range_header=range_header)
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == content_range
+    assert response.headers["Content-Length"] == str(len(body))
+    assert await _read_body(response) == body
 
 
 @pytest.mark.asyncio
-@patch("backend.api.monthly_consumption_routes.get_file_from_db")
-async def test_raises_404_when_file_not_found(mock_get_file):
-    mock_get_file.return_value = None
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_full_file_for_multiple_or_stale_ranges(mock_open_file):
+    mock_open_file.return_value = _grid_out()
+    response = await get_file(sample_id, range_header="bytes=0-1,4-5")
+    assert response.status_code == 200
+
+    mock_open_file.return_value = _grid_out()
+    response = await get_file(sample_id, range_header="bytes=0-1", if_range='"other-etag"')
+    assert response.status_code == 200
+    assert await _read_body(response) == b"0123456789"
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_raises_416_for_unsatisfiable_range(mock_open_file):
+    mock_open_file.return_value = _grid_out()
+    with pytest.raises(HTTPException) as exc:
+        await get_file(sample_id, range_header="bytes=10-")
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */10"
+    mock_open_file.return_value.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_304_when_etag_matches(mock_open_file):
+    mock_open_file.return_value = _grid_out()
+    response = await get_file(sample_id, if_none_match=f'"{sample_id}"')
+    assert response.status_code == 304
+    assert response.headers["ETag"] == f'"{sample_id}"'
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_serves_local_files_by_path(mock_open_file, tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"jpeg")
+    mock_open_file.return_value = LocalFile(
+        {"_id": ObjectId(sample_id), "filename": "meter.jpg", "length": 4, "metadata": None}, str(path))
+    response = await get_file(sample_id, range_header="bytes=0-1")
+    assert isinstance(response, FileResponse)
+    assert response.path == str(path)
+    assert response.media_type == "image/jpeg"
+    assert response.headers["ETag"] == f'"{sample_id}"'
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_rendition_file_id")
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_returns_rendition_for_size(mock_open_file, mock_get_rendition):
+    rendition_id = ObjectId()
+    mock_get_rendition.return_value = rendition_id
+    mock_open_file.return_value = _grid_out(b"RIFF....WEBP", filename=f"{sample_id}_thumbnail.webp")
+    response = await get_file(sample_id, size="thumbnail")
+    mock_get_rendition.assert_called_once_with(sample_id, "thumbnail")
+    mock_open_file.assert_called_once_with(rendition_id)
+    assert response.media_type == "image/webp"
+    assert response.headers["Content-Disposition"] == f"attachment; filename={sample_id}.webp"
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_rendition_file_id")
+async def test_raises_415_for_rendition_of_non_image(mock_get_rendition):
+    mock_get_rendition.side_effect = FileIsNotAnImageException()
+    with pytest.raises(HTTPException) as exc:
+        await get_file(sample_id, size="medium")
+    assert exc.value.status_code == 415
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_annotated_image")
+async def test_returns_annotated_image(mock_get_annotated):
+    mock_get_annotated.return_value = (b"jpeg-bytes", "image/jpeg", "abc")
+    response = await monthly_consumption_routes.get_annotated_file(sample_id, size="medium")
+    mock_get_annotated.assert_called_once_with(sample_id, "medium")
+    assert response.media_type == "image/jpeg"
+    assert response.headers["ETag"] == '"abc"'
+    assert response.body == b"jpeg-bytes"
+
+    response = await monthly_consumption_routes.get_annotated_file(sample_id, if_none_match='"abc"')
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.get_annotated_image")
+async def test_raises_404_when_annotated_reading_not_found(mock_get_annotated):
+    mock_get_annotated.side_effect = NoObjectHasFoundException()
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.get_annotated_file("missing")
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.open_file_from_db")
+async def test_raises_404_when_file_not_found(mock_open_file):
+    mock_open_file.side_effect = NoObjectHasFoundException()
     with pytest.raises(HTTPException) as exc:
         await get_file("invalid_file_id")
     assert exc.value.status_code == 404
@@ -201,4 +462,16 @@ async def test_raises_404_when_monthly_consumption_not_found_update(mock_get):
     with pytest.raises(HTTPException) as exc:
         await get_monthly_consumption("invalid_id")
     assert exc.value.status_code == 404
-    assert exc.value.detail == "No object found with the given ID."
\ No newline at end of file
+    assert exc.value.detail == "No object found with the given ID."
+
+@pytest.mark.asyncio
+@patch("backend.api.monthly_consumption_routes.ProcessImage")
+async def test_process_image_rejects_low_quality_photos(mock_process_image):
+    mock_process_image.return_value.process_image.side_effect = ImageQualityTooLowException(
+        "too_blurry", "The image is too blurry to read the meter.")
+
+    with pytest.raises(HTTPException) as exc:
+        await monthly_consumption_routes.process_image(MagicMock())
+
+    assert exc.value.status_code == 422
+    assert exc.value.detail == "The image is too blurry to read the meter."
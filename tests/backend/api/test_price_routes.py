@@ -1,23 +1,33 @@
+import json
+from datetime import datetime, timezone
+
+import msgpack
 import pytest
 from unittest.mock import patch
 
+from bson import ObjectId
+
 from backend.services.model.ElectricityPrice import ElectricityPrice, PyObjectId
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.api.price_routes import get_prices, get_price, create_price, update_price, delete_price
 
 
 @pytest.mark.asyncio
-@patch("backend.api.price_routes.get_all_prices_from_db")
+@patch("backend.api.price_routes.get_all_price_rows")
 async def test_get_prices(mock_get_all_prices):
     mock_get_all_prices.return_value = [
-        ElectricityPrice(_id=PyObjectId("67f514095b899d19b77dc6d8"),price=0.15, date="2025-10-01", created_at=None, updated_at=None, is_default=True),
-        ElectricityPrice(_id=PyObjectId("673250f024d31720fe07fc4e"),price=0.20, date="2025-10-02", created_at=None, updated_at=None, is_default=False)
+        {"_id": ObjectId("67f514095b899d19b77dc6d8"), "price": 0.15, "date": "2025-10-01",
+         "created_at": datetime(2025, 10, 1, 8, 30), "updated_at": None, "is_default": True},
+        {"_id": ObjectId("673250f024d31720fe07fc4e"), "price": 0.20, "date": "2025-10-02",
+         "created_at": None, "updated_at": None, "is_default": False},
     ]
 
     result = await get_prices()
 
-    assert len(result) == 2
-    assert result[0].price == 0.15
+    body = json.loads(result.body)
+    assert len(body) == 2
+    assert body[0] == {"_id": "67f514095b899d19b77dc6d8", "price": 0.15, "date": "2025-10-01",
+                       "created_at": "2025-10-01T08:30:00", "updated_at": None, "is_default": True}
 
 @pytest.mark.asyncio
 @patch("backend.api.price_routes.get_price_from_db")
@@ -124,3 +134,17 @@ async def test_delete_price_not_found(mock_delete):
     assert exc.value.status_code == 404
     assert "No object found" in exc.value.detail
     mock_delete.assert_called_once_with(electricity_price_id)
+
+
+@pytest.mark.asyncio
+@patch("backend.api.price_routes.get_all_price_rows")
+async def test_get_prices_as_msgpack(mock_get_all_prices):
+    mock_get_all_prices.return_value = [
+        {"_id": ObjectId("67f514095b899d19b77dc6d8"), "price": 0.15, "date": "2025-10-01",
+         "created_at": datetime(2025, 10, 1, 8, 30), "updated_at": None, "is_default": True},
+    ]
+
+    result = await get_prices(accept="application/msgpack")
+
+    assert result.media_type == "application/msgpack"
+    assert msgpack.unpackb(result.body, timestamp=3)[0]["created_at"] == datetime(2025, 10, 1, 8, 30, tzinfo=timezone.utc)
@@ -0,0 +1,36 @@
+import json
+from datetime import datetime, timezone
+
+import msgpack
+from bson import ObjectId
+
+from backend.api.responses import negotiated_response, accepts_msgpack, MsgPackResponse, ORJSONResponse
+
+rows = [{"_id": ObjectId("67f514095b899d19b77dc6d8"), "date": datetime(2026, 3, 1, 10, 30, 0, 250000), "price": 0.15}]
+
+
+def test_msgpack_only_when_asked_for():
+    assert accepts_msgpack("application/msgpack")
+    assert accepts_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not accepts_msgpack("application/msgpack;q=0")
+    assert not accepts_msgpack("*/*")
+    assert not accepts_msgpack(None)
+
+
+def test_msgpack_sends_datetimes_as_timestamps():
+    response = negotiated_response(rows, "application/msgpack")
+
+    assert isinstance(response, MsgPackResponse)
+    assert response.media_type == "application/msgpack"
+    assert response.headers["vary"] == "Accept"
+    decoded = msgpack.unpackb(response.body, timestamp=3)
+    assert decoded == [{"_id": "67f514095b899d19b77dc6d8",
+                        "date": datetime(2026, 3, 1, 10, 30, 0, 250000, tzinfo=timezone.utc), "price": 0.15}]
+
+
+def test_json_by_default():
+    response = negotiated_response(rows, "application/json")
+
+    assert isinstance(response, ORJSONResponse)
+    assert json.loads(response.body) == [{"_id": "67f514095b899d19b77dc6d8", "date": "2026-03-01T10:30:00.250000",
+                                          "price": 0.15}]
@@ -19,3 +19,12 @@ async def test_update_settings(mock_get, mock_update):
     mock_get.return_value = expected
     result = await update_settings(expected)
     assert result.currency == "EUR"
+
+@pytest.mark.asyncio
+@patch("backend.api.settings_routes.get_retention_job")
+async def test_get_retention_status(mock_get):
+    from backend.api.settings_routes import get_retention_status
+    from backend.services.model.RetentionJob import RetentionJob
+    mock_get.return_value = RetentionJob(enabled=True, status="done", reencode_quality=60, bytes_reclaimed=42)
+    result = await get_retention_status()
+    assert result.bytes_reclaimed == 42
@@ -0,0 +1,31 @@
+import mongomock
+import mongomock.gridfs
+import pytest
+from mongomock.collection import BulkOperationBuilder
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """
+    An in-memory database for code that runs real queries and bulk writes
+    (migrations, retention passes).
+    """
+    add_update = BulkOperationBuilder.add_update
+
+    # pymongo passes the sort of UpdateOne, which mongomock does not know yet
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(BulkOperationBuilder, "add_update", add_update_without_sort)
+    mongomock.gridfs.enable_gridfs_integration()
+    return mongomock.MongoClient()["monthly-consumption"]
+
+
+@pytest.fixture
+def blob_db(mongo_db, monkeypatch):
+    """
+    mongo_db, also behind the blob store: GridFS, or the local store when BLOB_STORE=local.
+    """
+    for module in ("blob_store", "db_client"):
+        monkeypatch.setattr(f"backend.services.{module}.get_db", lambda: mongo_db)
+    return mongo_db
@@ -1,32 +1,125 @@
-from unittest.mock import patch, MagicMock, mock_open
+import hashlib
+from unittest.mock import patch, MagicMock
 
 import pytest
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from backend.services.crud.crud_files import get_file_from_db, save_file_to_db
+from backend.services.crud.crud_files import get_file_from_db, save_file_to_db, release_file_from_db
 
 
-@patch("backend.services.crud.crud_files.get_fs_bucket")
-def test_get_file_from_db_returns_bytes(mock_get_fs_bucket):
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_get_file_from_db_returns_bytes(mock_get_blob_store):
     mock_stream = MagicMock()
     mock_stream.read.return_value = b"image data"
-    mock_get_fs_bucket.return_value.open_download_stream.return_value = mock_stream
+    mock_get_blob_store.return_value.open.return_value = mock_stream
 
     result = get_file_from_db("682d6f4ef62c1c14eae9f014")
 
     assert result == b"image data"
-    mock_get_fs_bucket.return_value.open_download_stream.assert_called_once_with(
+    mock_get_blob_store.return_value.open.assert_called_once_with(
         ObjectId("682d6f4ef62c1c14eae9f014")
     )
 
 
-@patch("backend.services.crud.crud_files.get_fs_bucket")
-def test_save_file_to_db_returns_file_id(mock_get_fs_bucket):
+@patch("backend.services.crud.crud_files.get_db")
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_save_file_to_db_returns_file_id(mock_get_blob_store, mock_get_db, tmp_path):
     expected_id = ObjectId()
-    mock_get_fs_bucket.return_value.upload_from_stream.return_value = expected_id
+    mock_get_blob_store.return_value.upload.return_value = expected_id
+    file_refs = mock_get_db.return_value["file_refs"]
+    file_refs.find_one_and_update.return_value = None
+    path = tmp_path / "meter.jpg"
+    path.write_bytes(b"raw bytes")
 
-    with patch("builtins.open", mock_open(read_data=b"raw bytes")):
-        result = save_file_to_db("/tmp/meter.jpg", "meter.jpg")
+    result = save_file_to_db(str(path), "meter.jpg")
 
+    digest = hashlib.sha256(b"raw bytes").hexdigest()
     assert result == expected_id
-    mock_get_fs_bucket.return_value.upload_from_stream.assert_called_once()
\ No newline at end of file
+    mock_get_blob_store.return_value.upload.assert_called_once()
+    assert mock_get_blob_store.return_value.upload.call_args.kwargs["metadata"] == {
+        "contentType": "image/jpeg", "sha256": digest}
+    file_refs.insert_one.assert_called_once_with({"_id": digest, "file_id": expected_id, "refcount": 1})
+
+
+@patch("backend.services.crud.crud_files.get_db")
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_save_file_to_db_reuses_identical_file(mock_get_blob_store, mock_get_db, tmp_path):
+    existing_id = ObjectId()
+    file_refs = mock_get_db.return_value["file_refs"]
+    file_refs.find_one_and_update.return_value = {"file_id": existing_id, "refcount": 1}
+    path = tmp_path / "meter.jpg"
+    path.write_bytes(b"raw bytes")
+
+    assert save_file_to_db(str(path), "again.jpg") == existing_id
+
+    query, update = file_refs.find_one_and_update.call_args.args
+    assert query["_id"] == hashlib.sha256(b"raw bytes").hexdigest()
+    assert update == {"$inc": {"refcount": 1}}
+    mock_get_blob_store.return_value.upload.assert_not_called()
+
+
+@patch("backend.services.crud.crud_files.get_db")
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_save_file_to_db_keeps_concurrently_stored_copy(mock_get_blob_store, mock_get_db, tmp_path):
+    uploaded_id = ObjectId()
+    winner_id = ObjectId()
+    mock_get_blob_store.return_value.upload.return_value = uploaded_id
+    file_refs = mock_get_db.return_value["file_refs"]
+    file_refs.find_one_and_update.side_effect = [None, {"file_id": winner_id, "refcount": 2}]
+    file_refs.insert_one.side_effect = DuplicateKeyError("duplicate")
+    path = tmp_path / "meter.jpg"
+    path.write_bytes(b"raw bytes")
+
+    assert save_file_to_db(str(path), "meter.jpg") == winner_id
+    mock_get_blob_store.return_value.delete.assert_called_once_with(uploaded_id)
+
+
+@patch("backend.services.crud.crud_files.get_db")
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_release_file_from_db_deletes_only_unreferenced_files(mock_get_blob_store, mock_get_db):
+    file_id = ObjectId()
+    file_refs = mock_get_db.return_value["file_refs"]
+
+    file_refs.find_one_and_update.return_value = {"_id": "digest", "file_id": file_id, "refcount": 1}
+    release_file_from_db(file_id)
+    mock_get_blob_store.return_value.delete.assert_not_called()
+
+    file_refs.find_one_and_update.return_value = {"_id": "digest", "file_id": file_id, "refcount": 0}
+    file_refs.delete_one.return_value.deleted_count = 1
+    release_file_from_db(str(file_id))
+    file_refs.delete_one.assert_called_once_with({"_id": "digest", "refcount": {"$lte": 0}})
+    mock_get_blob_store.return_value.delete.assert_called_once_with(file_id)
+
+
+@patch("backend.services.crud.crud_files.get_db")
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_release_file_from_db_deletes_files_without_reference_count(mock_get_blob_store, mock_get_db):
+    file_id = ObjectId()
+    mock_get_db.return_value["file_refs"].find_one_and_update.return_value = None
+
+    release_file_from_db(file_id)
+
+    mock_get_blob_store.return_value.delete.assert_called_once_with(file_id)
+
+
+@patch("backend.services.crud.crud_files.get_blob_store")
+def test_open_file_from_db_raises_when_missing(mock_get_blob_store):
+    from gridfs.errors import NoFile
+    from backend.services.crud.crud_files import open_file_from_db
+    from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+
+    mock_get_blob_store.return_value.open.side_effect = NoFile()
+
+    with pytest.raises(NoObjectHasFoundException):
+        open_file_from_db("682d6f4ef62c1c14eae9f014")
+    with pytest.raises(NoObjectHasFoundException):
+        open_file_from_db("not-an-object-id")
+
+
+def test_get_file_content_type_prefers_stored_metadata():
+    from backend.services.crud.crud_files import get_file_content_type
+
+    assert get_file_content_type(MagicMock(filename="a.jpg", metadata={"contentType": "image/png"})) == "image/png"
+    assert get_file_content_type(MagicMock(filename="a.txt", metadata=None)) == "text/plain"
+    assert get_file_content_type(MagicMock(filename="blob", metadata=None)) == "application/octet-stream"
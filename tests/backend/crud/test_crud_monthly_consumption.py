@@ -3,11 +3,14 @@ from unittest.mock import patch
 from backend.services.crud.crud_monthly_consumption import (
     get_monthly_consumption_from_db,
     get_all_monthly_consumption_from_db,
+    get_all_monthly_consumption_rows,
     get_latest_monthly_consumption_from_db,
     save_monthly_consumption_to_db,
     update_monthly_consumption_in_db,
     delete_monthly_consumption_from_db,
 )
+from backend.api.responses import ORJSONResponse
+from backend.services.conf_array_codec import pack_conf_array
 from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
 from backend.services.model.MonthlyConsumption import MonthlyConsumption
 
@@ -112,6 +115,12 @@ def test_updates_existing_monthly_consumption_in_db(mock_get_db, mock_settings_g
         score=0.0
     ))
 
+    # file references stay ObjectIds, rendition and retention lookups match on them
+    update = mock_collection.update_one.call_args_list[0].args[1]["$set"]
+    assert not {"original_file", "label_file", "file_label_name", "file_name"} & update.keys()
+    # the value was corrected by hand, detection replays keep it
+    assert update["manually_edited"] is True
+
 
 @patch("backend.services.crud.crud_settings.get_db")
 @patch("backend.services.crud.crud_monthly_consumption.get_db")
@@ -175,10 +184,13 @@ def test_deletes_monthly_consumption_from_db(mock_get_db):
     }
     mock_collection.delete_one.return_value.deleted_count = 1
 
-    with patch("backend.services.crud.crud_monthly_consumption.get_fs_bucket") as mock_fs:
-        mock_fs.return_value.deleted_count = 1
+    with patch("backend.services.crud.crud_monthly_consumption.release_file_from_db") as mock_release:
         delete_monthly_consumption_from_db("682d6f4ef62c1c14eae9f014")
 
+    file_ids = [mock_collection.find_one.return_value[field] for field in
+                ("original_file", "label_file", "file_label_name")]
+    assert [str(call.args[0]) for call in mock_release.call_args_list] == [str(file_id) for file_id in file_ids]
+
 
 @patch("backend.services.crud.crud_monthly_consumption.get_db")
 def test_raises_exception_when_deleting_nonexistent_monthly_consumption(mock_get_db):
@@ -199,9 +211,9 @@ def test_raises_exception_when_deleting_nonexistent_monthly_consumption(mock_get
     mock_collection.delete_one.return_value.deleted_count = 0
 
     with pytest.raises(NoObjectHasFoundException):
-        with patch("backend.services.crud.crud_monthly_consumption.get_fs_bucket") as mock_fs:
-            mock_fs.return_value.deleted_count = 0
+        with patch("backend.services.crud.crud_monthly_consumption.release_file_from_db") as mock_release:
             delete_monthly_consumption_from_db("682d6f4ef62c1c14eae9f014")
+    mock_release.assert_not_called()
 
 
 @patch("backend.services.crud.crud_monthly_consumption.get_db")
@@ -223,6 +235,62 @@ def test_get_latest_monthly_consumption_from_db(mock_get_db):
     assert result.total_kwh_consumed == 100.0
 
 
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_reads_packed_conf_array(mock_get_db):
+    packed = pack_conf_array([{"char": "4", "conf": 0.75}, {"char": "2", "conf": 0.5}])
+    mock_get_db.return_value["monthly_consumptions"].find.return_value = [{
+        "_id": ObjectId(),
+        "modified_date": datetime.now(),
+        "date": datetime.now(),
+        "total_kwh_consumed": 42.0,
+        "price": 0.25,
+        "original_file": ObjectId(),
+        "file_name": "file.jpg",
+        "label_file": None,
+        "file_label_name": None,
+        **packed,
+        "score": 0.625
+    }]
+
+    compact = get_all_monthly_consumption_from_db()[0]
+    expanded = get_all_monthly_consumption_from_db(expand_conf_array=True)[0]
+
+    assert (compact.conf_chars, compact.conf_values, compact.conf_array) == ("42", [0.75, 0.5], None)
+    assert expanded.conf_array == [{"char": "4", "conf": 0.75}, {"char": "2", "conf": 0.5}]
+
+
+@patch("backend.services.crud.crud_settings.get_db")
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_saves_conf_array_packed(mock_mc_get_db, mock_settings_get_db):
+    mock_settings_get_db.return_value["settings"].find_one.return_value = {
+        "calculate_price": False,
+        "currency": "usd",
+        "debug_mode": False,
+        "dark_mode_preference": "auto",
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    }
+    collection = mock_mc_get_db.return_value["monthly_consumptions"]
+
+    save_monthly_consumption_to_db(MonthlyConsumption(
+        modified_date=datetime.now(),
+        date=datetime.now(),
+        total_kwh_consumed=17.0,
+        price=0.0,
+        original_file=ObjectId(),
+        file_name="file.jpg",
+        label_file=None,
+        file_label_name=None,
+        conf_array=[{"char": "1", "conf": 0.9}, {"char": "7", "conf": 0.8}],
+        score=0.85
+    ))
+
+    saved = collection.insert_one.call_args.args[0]
+    assert saved["conf_chars"] == "17"
+    assert len(saved["conf_packed"]) == 8
+    assert "conf_array" not in saved
+
+
 @patch("backend.services.crud.crud_monthly_consumption.get_db")
 def test_raises_exception_when_latest_monthly_consumption_not_found(mock_get_db):
     mock_get_db.return_value["monthly_consumptions"].find.return_value.sort.return_value.limit.return_value = []
@@ -234,6 +302,8 @@ from unittest.mock import MagicMock, patch
 from bson import ObjectId
 from datetime import datetime
 import pytest
+import json
+from pydantic import TypeAdapter
 
 
 @patch("backend.services.crud.crud_settings.get_db")
@@ -318,3 +388,87 @@ def test_calculate_price_raises_when_no_price_set(mock_mc_get_db, mock_settings_
 
     with pytest.raises(NoObjectHasFoundException):
         calculate_price_from_current_consumption_from_last_month(50)
+
+
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_get_monthly_consumptions_for_export_pushes_range_and_projection(mock_get_db):
+    from datetime import date
+    from backend.services.crud.crud_monthly_consumption import get_monthly_consumptions_for_export
+
+    mock_collection = mock_get_db.return_value["monthly_consumptions"]
+    mock_collection.find.return_value.sort.return_value = [{"date": datetime(2025, 10, 1), "price": 1.0}]
+
+    result = get_monthly_consumptions_for_export(date(2025, 10, 1), date(2025, 10, 31), ["date", "price"])
+
+    assert list(result) == [{"date": datetime(2025, 10, 1), "price": 1.0}]
+    mock_collection.find.assert_called_once_with(
+        {"date": {"$gte": datetime(2025, 10, 1), "$lt": datetime(2025, 11, 1)}},
+        {"_id": 0, "date": 1, "price": 1}
+    )
+    mock_collection.find.return_value.sort.assert_called_once_with("date", 1)
+
+
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_get_previous_total_kwh_consumed(mock_get_db):
+    from datetime import date
+    from backend.services.crud.crud_monthly_consumption import get_previous_total_kwh_consumed
+
+    mock_get_db.return_value["monthly_consumptions"].find_one.return_value = {"total_kwh_consumed": 90.0}
+    assert get_previous_total_kwh_consumed(date(2025, 10, 1)) == 90.0
+
+    mock_get_db.return_value["monthly_consumptions"].find_one.return_value = None
+    assert get_previous_total_kwh_consumed(date(2025, 10, 1)) is None
+
+
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_get_monthly_consumption_detections_from_db(mock_get_db):
+    from backend.services.crud.crud_monthly_consumption import get_monthly_consumption_detections_from_db
+
+    doc = {"_id": ObjectId(), "original_file": ObjectId(), "detections": []}
+    mock_collection = mock_get_db.return_value["monthly_consumptions"]
+    mock_collection.find_one.return_value = doc
+
+    assert get_monthly_consumption_detections_from_db(str(doc["_id"])) == doc
+    assert mock_collection.find_one.call_args.args[1] == {"original_file": 1, "label_file": 1, "detections": 1}
+
+    mock_collection.find_one.return_value = None
+    with pytest.raises(NoObjectHasFoundException):
+        get_monthly_consumption_detections_from_db(str(doc["_id"]))
+    with pytest.raises(NoObjectHasFoundException):
+        get_monthly_consumption_detections_from_db("not-an-id")
+
+
+@patch("backend.services.crud.crud_monthly_consumption.get_db")
+def test_rows_encode_like_the_validated_models(mock_get_db):
+    docs = [{
+        "_id": ObjectId(),
+        "modified_date": datetime(2026, 3, 1, 10, 30, 0, 123000),
+        "date": datetime(2026, 3, 1),
+        "total_kwh_consumed": 1234.5,
+        "price": 17.25,
+        "original_file": ObjectId(),
+        "file_name": "file.jpg",
+        "label_file": ObjectId(),
+        "file_label_name": None,
+        **pack_conf_array([{"char": "1", "conf": 0.9}, {"char": "2", "conf": 0.8}]),
+        "score": 0.85
+    }, {
+        "_id": ObjectId(),
+        "modified_date": datetime(2026, 4, 1),
+        "date": datetime(2026, 4, 1),
+        "total_kwh_consumed": 1300.0,
+        "price": 20.0,
+        "original_file": "legacy.jpg",
+        "file_name": "legacy.jpg",
+        "label_file": None,
+        "file_label_name": None,
+        "conf_array": [{"char": "1.", "conf": 0.7}],
+        "score": 0.7
+    }]
+    mock_get_db.return_value["monthly_consumptions"].find.return_value = docs
+
+    for expand in (False, True):
+        rows = ORJSONResponse(get_all_monthly_consumption_rows(expand)).body
+        models = TypeAdapter(list[MonthlyConsumption]).dump_json(
+            get_all_monthly_consumption_from_db(expand), by_alias=True)
+        assert json.loads(rows) == json.loads(models)
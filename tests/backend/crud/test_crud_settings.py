@@ -106,3 +106,51 @@ def test_raises_exception_when_updating_nonexistent_setting(mock_get_db):
     )
     with pytest.raises(NoObjectHasFoundException):
         update_setting_in_db(updated_setting)
+
+
+@patch("backend.services.crud.crud_settings.get_db")
+def test_cached_setting_is_reused_until_invalidated(mock_get_db):
+    from backend.services.crud.crud_settings import get_cached_setting_from_db, invalidate_settings_cache
+
+    invalidate_settings_cache()
+    mock_collection = mock_get_db.return_value["settings"]
+    mock_collection.find_one.return_value = {
+        "_id": 1,
+        "currency": "eur",
+        "dark_mode_preference": "on",
+        "debug_mode": False,
+        "calculate_price": True,
+        "created_at": None,
+        "updated_at": None
+    }
+
+    assert get_cached_setting_from_db().currency == "eur"
+    assert get_cached_setting_from_db().currency == "eur"
+    assert mock_collection.find_one.call_count == 1
+
+    invalidate_settings_cache()
+    get_cached_setting_from_db()
+    assert mock_collection.find_one.call_count == 2
+    invalidate_settings_cache()
+
+
+@patch("backend.services.crud.crud_settings.get_db")
+def test_settings_writes_rebuild_exports_in_every_worker(mock_get_db):
+    from backend.services.crud.crud_settings import get_cached_setting_from_db, invalidate_settings_cache
+
+    invalidate_settings_cache()
+    settings = mock_get_db.return_value["settings"]
+    settings.find_one.return_value = {"_id": 1, "currency": "eur", "debug_mode": False, "calculate_price": True,
+                                      "created_at": None, "updated_at": None}
+    get_cached_setting_from_db(data_version=3)
+
+    update_setting_in_db(Settings(_id=1, currency="usd", dark_mode_preference="auto", debug_mode=False,
+                                  calculate_price=True, created_at=None, updated_at=None))
+
+    mock_get_db.return_value["data_versions"].update_one.assert_called_with(
+        {"_id": "monthly_consumptions"}, {"$inc": {"version": 1}}, upsert=True)
+    # another worker still holds version 3 and reloads once it sees version 4
+    get_cached_setting_from_db(data_version=4)
+    get_cached_setting_from_db(data_version=4)
+    assert settings.find_one.call_count == 3
+    invalidate_settings_cache()
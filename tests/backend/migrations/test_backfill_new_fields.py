@@ -0,0 +1,112 @@
+import importlib
+from contextlib import nullcontext
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+from bson import ObjectId
+from gridfs import GridFS
+
+from backend.services.blob_store import get_blob_store
+
+migration = importlib.import_module("backend.migrations.20260217214100_backfill_new_fields")
+
+
+class FakeBox:
+    def __init__(self, cls, conf, x):
+        self.cls = np.array(cls)
+        self.conf = np.array(conf)
+        self.xywhr = np.array([[x, 10.0, 8.0, 16.0, 0.0]])
+
+
+class FakeResult:
+    def __init__(self, *boxes):
+        self.obb = [FakeBox(*box) for box in boxes]
+
+
+class FakeModel:
+    """Reads every image as the digits "12", the right one detected first."""
+
+    names = {i: str(i) for i in range(10)}
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images):
+        self.calls.append(len(images))
+        return [FakeResult((2, 0.8, 30.0), (1, 0.6, 10.0)) for _ in images]
+
+
+@pytest.fixture
+def model(blob_db):
+    model = FakeModel()
+    with patch.object(migration, "load_model", return_value=model), \
+            patch.object(migration, "active_model_path", return_value="best.pt"), \
+            patch.object(migration, "torch_threads", nullcontext), \
+            patch.object(migration, "throttle"):
+        yield model
+
+
+def _png():
+    return cv2.imencode(".png", np.zeros((20, 30, 3), np.uint8))[1].tobytes()
+
+
+def _reading(db, image=True):
+    file_id = GridFS(db).put(_png()) if image else ObjectId()
+    return db["monthly_consumptions"].insert_one({"original_file": file_id}).inserted_id
+
+
+@patch.object(migration, "BATCH_SIZE", 2)
+def test_backfills_one_model_call_per_batch(mongo_db, model):
+    reading_ids = [_reading(mongo_db) for _ in range(3)]
+
+    migration.run(mongo_db)
+
+    assert model.calls == [2, 1]
+    for reading_id in reading_ids:
+        reading = mongo_db["monthly_consumptions"].find_one({"_id": reading_id})
+        # ordered left to right
+        assert reading["conf_array"] == [{"char": "1", "conf": pytest.approx(0.6)},
+                                         {"char": "2", "conf": pytest.approx(0.8)}]
+        assert reading["score"] == pytest.approx(0.7)
+    state = mongo_db["data_migrations"].find_one({"_id": migration.MIGRATION_ID})
+    assert (state["status"], state["processed"], state["last_id"]) == ("done", 3, reading_ids[-1])
+
+
+def test_skips_readings_whose_original_is_missing(mongo_db, model):
+    missing = _reading(mongo_db, image=False)
+    present = _reading(mongo_db)
+
+    migration.run(mongo_db)
+
+    assert model.calls == [1]
+    assert "conf_array" not in mongo_db["monthly_consumptions"].find_one({"_id": missing})
+    assert "conf_array" in mongo_db["monthly_consumptions"].find_one({"_id": present})
+    assert mongo_db["data_migrations"].find_one({"_id": migration.MIGRATION_ID})["processed"] == 2
+
+
+def test_resumes_after_last_id(mongo_db, model):
+    done, pending = _reading(mongo_db), _reading(mongo_db)
+    # interrupted after the first batch
+    mongo_db["data_migrations"].insert_one(
+        {"_id": migration.MIGRATION_ID, "status": "running", "processed": 1, "last_id": done})
+
+    migration.run(mongo_db)
+
+    assert model.calls == [1]
+    assert "conf_array" not in mongo_db["monthly_consumptions"].find_one({"_id": done})
+    assert "conf_array" in mongo_db["monthly_consumptions"].find_one({"_id": pending})
+    assert mongo_db["data_migrations"].find_one({"_id": migration.MIGRATION_ID})["processed"] == 2
+
+
+def test_reads_originals_from_the_local_store(mongo_db, model, tmp_path, monkeypatch):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.setenv("BLOB_STORE_PATH", str(tmp_path))
+    file_id = get_blob_store().upload("meter.png", _png())
+    reading_id = mongo_db["monthly_consumptions"].insert_one({"original_file": file_id}).inserted_id
+
+    migration.run(mongo_db)
+
+    assert model.calls == [1]
+    assert "conf_array" in mongo_db["monthly_consumptions"].find_one({"_id": reading_id})
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from bson import ObjectId
+from gridfs import GridFS
+
+from backend.migrations import batching
+from backend.migrations.batching import batch_size, prefetch_files, throttle, torch_threads
+from backend.services.blob_store import get_blob_store
+
+
+def test_batch_size_from_env(monkeypatch):
+    monkeypatch.delenv("MIGRATION_BATCH_SIZE", raising=False)
+    assert batch_size(32) == 32
+    monkeypatch.setenv("MIGRATION_BATCH_SIZE", "0")
+    assert batch_size(32) == 1
+
+
+def test_prefetch_files_returns_none_for_missing_files(blob_db):
+    stored, missing = GridFS(blob_db).put(b"image"), ObjectId()
+
+    files = prefetch_files(get_blob_store(), [stored, str(stored), None, missing, stored])
+
+    # string ids are read like ObjectIds, empty and repeated ids are skipped
+    assert files == {stored: b"image", str(stored): b"image", missing: None}
+
+
+@patch("backend.migrations.batching.inference_busy", side_effect=[True, False, False])
+@patch("backend.migrations.batching.time")
+def test_throttle_keeps_the_rate_and_waits_for_inference(mock_time, _, monkeypatch):
+    mock_time.monotonic.side_effect = [0.0, 1.0, 2.0]
+    monkeypatch.setattr(batching, "_last_batch_at", None)
+
+    throttle(50, max_docs_per_second=10)
+    throttle(50, max_docs_per_second=10)
+
+    assert [call.args[0] for call in mock_time.sleep.call_args_list] == [batching.BUSY_POLL_SECONDS, 4.0]
+
+
+@patch("backend.migrations.batching.inference_busy", return_value=False)
+@patch("backend.migrations.batching.time")
+def test_throttle_without_a_rate_limit(mock_time, _, monkeypatch):
+    mock_time.monotonic.return_value = 0.0
+    monkeypatch.setattr(batching, "_last_batch_at", 0.0)
+
+    throttle(500, max_docs_per_second=0)
+
+    mock_time.sleep.assert_not_called()
+
+
+def test_overlapping_torch_threads_restore_the_value_from_before_both():
+    import torch
+
+    previous = torch.get_num_threads()
+    first, second = torch_threads(previous + 1), torch_threads(previous + 2)
+    first.__enter__()
+    second.__enter__()
+    assert torch.get_num_threads() == previous + 1
+    # the first caller leaves while the second is still running its model call
+    first.__exit__(None, None, None)
+    assert torch.get_num_threads() == previous + 1
+    second.__exit__(None, None, None)
+    assert torch.get_num_threads() == previous
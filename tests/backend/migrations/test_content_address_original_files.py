@@ -0,0 +1,47 @@
+import hashlib
+import importlib
+import os
+
+import pytest
+
+from backend.services.blob_store import get_blob_store
+
+migration = importlib.import_module("backend.migrations.20261019100000_content_address_original_files")
+
+
+@pytest.fixture
+def local_store(blob_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.setenv("BLOB_STORE_PATH", str(tmp_path))
+    monkeypatch.setattr(migration, "throttle", lambda *args: None)
+    return get_blob_store()
+
+
+def _reading(db, file_id):
+    return db["monthly_consumptions"].insert_one({"original_file": file_id}).inserted_id
+
+
+def test_registers_originals_of_the_local_store(mongo_db, local_store):
+    original_id = local_store.upload("meter.png", b"image")
+    _reading(mongo_db, original_id)
+
+    migration.run(mongo_db)
+
+    digest = hashlib.sha256(b"image").hexdigest()
+    assert mongo_db["local_files"].find_one({"_id": original_id})["metadata"]["sha256"] == digest
+    assert mongo_db["file_refs"].find_one({"_id": digest}) == {"_id": digest, "file_id": original_id,
+                                                                "refcount": 1}
+
+
+def test_shares_a_local_duplicate_and_deletes_it(mongo_db, local_store):
+    kept_id = local_store.upload("meter.png", b"image")
+    duplicate_id = local_store.upload("meter.png", b"image")
+    _reading(mongo_db, kept_id)
+    duplicate_reading = _reading(mongo_db, duplicate_id)
+
+    migration.run(mongo_db)
+
+    assert mongo_db["monthly_consumptions"].find_one({"_id": duplicate_reading})["original_file"] == kept_id
+    assert mongo_db["file_refs"].find_one()["refcount"] == 2
+    assert mongo_db["local_files"].find_one({"_id": duplicate_id}) is None
+    assert not os.path.exists(local_store.path_for(duplicate_id))
@@ -0,0 +1,23 @@
+import importlib
+from unittest.mock import patch
+
+from bson import ObjectId
+
+migration = importlib.import_module("backend.migrations.20261019130000_file_ids_as_object_ids")
+
+
+@patch.object(migration, "throttle")
+def test_converts_string_file_ids_to_object_ids(_, mongo_db):
+    db = mongo_db
+    original_id, label_id = ObjectId(), ObjectId()
+    edited = db["monthly_consumptions"].insert_one(
+        {"original_file": str(original_id), "label_file": str(label_id), "file_label_name": None}).inserted_id
+    untouched = db["monthly_consumptions"].insert_one(
+        {"original_file": original_id, "label_file": None, "file_label_name": "label.txt"}).inserted_id
+
+    migration.run(db)
+
+    assert db["monthly_consumptions"].find_one({"_id": edited}) == {
+        "_id": edited, "original_file": original_id, "label_file": label_id, "file_label_name": None}
+    assert db["monthly_consumptions"].find_one({"_id": untouched})["file_label_name"] == "label.txt"
+    assert db["data_migrations"].find_one({"_id": migration.MIGRATION_ID})["status"] == "done"
@@ -0,0 +1,40 @@
+import importlib
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from backend.migrations import runner
+from backend.services.exception.LeaseLostException import LeaseLostException
+
+pack_conf_arrays = importlib.import_module("backend.migrations.20261019120000_pack_conf_arrays")
+
+
+@patch.object(pack_conf_arrays, "throttle")
+def test_migration_stops_without_marking_done_once_the_lease_is_lost(_, mongo_db):
+    mongo_db["monthly_consumptions"].insert_many([{"_id": ObjectId(), "conf_array": []} for _ in range(2)])
+    lease = MagicMock()
+    lease.check.side_effect = LeaseLostException("lost")
+
+    with pytest.raises(LeaseLostException):
+        pack_conf_arrays.run(mongo_db, lease)
+
+    assert mongo_db["data_migrations"].find_one({"_id": pack_conf_arrays.MIGRATION_ID})["status"] == "running"
+
+
+@patch("backend.migrations.runner.time.sleep")
+def test_runner_waits_for_the_new_owner_after_losing_the_lease(mock_sleep, mongo_db):
+    def run(db, lease):
+        # taken over by another worker, which then finishes the migration
+        db["data_migrations"].replace_one({"_id": "m:lease"}, {"_id": "m:lease", "owner": "other"})
+        db["data_migrations"].insert_one({"_id": "m", "status": "done"})
+        raise LeaseLostException("lost")
+
+    module = SimpleNamespace(MIGRATION_ID="m", run=run)
+
+    runner._run_with_lease(mongo_db, module, "worker-1")
+
+    # the lease of the new owner is left alone
+    assert mongo_db["data_migrations"].find_one({"_id": "m:lease"})["owner"] == "other"
+    mock_sleep.assert_not_called()
@@ -0,0 +1,113 @@
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+
+import cv2
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from backend.services import annotated_images
+from backend.services.annotated_images import AnnotatedImageCache, detections_from_label_file, \
+    render_annotated_image, get_annotated_image
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+
+
+def _jpeg(width=400, height=200):
+    return cv2.imencode(".jpg", np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+def _grid_out(data):
+    grid_out = MagicMock(wraps=BytesIO(data))
+    grid_out.__enter__.return_value = grid_out
+    return grid_out
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    annotated_images._cache.clear()
+    yield
+    annotated_images._cache.clear()
+
+
+def test_render_annotated_image_draws_detection_boxes():
+    detections = [{"char": "7", "class_id": 7, "conf": 0.91, "corners": [[100, 80], [180, 80], [180, 160], [100, 160]]}]
+
+    image = cv2.imdecode(np.frombuffer(render_annotated_image(_jpeg(), detections), np.uint8), cv2.IMREAD_COLOR)
+
+    assert image.shape[:2] == (200, 400)
+    # box outline is drawn, the rest of the black image is left alone
+    assert image[120, 100].max() > 100
+    assert image[190, 390].max() < 30
+
+
+def test_render_annotated_image_rejects_non_images():
+    with pytest.raises(FileIsNotAnImageException):
+        render_annotated_image(b"not an image", [])
+
+
+def test_detections_from_label_file_uses_conf_array_order():
+    text = "3 0.5 0.1 0.6 0.1 0.6 0.9 0.5 0.9\n1 0.1 0.1 0.2 0.1 0.2 0.9 0.1 0.9\n"
+    conf_array = [{"char": "1", "conf": 0.8}, {"char": "3", "conf": 0.7}]
+
+    detections = detections_from_label_file(text, 1000, 500, conf_array)
+
+    assert [d["char"] for d in detections] == ["1", "3"]
+    assert [d["conf"] for d in detections] == [0.8, 0.7]
+    assert detections[0]["corners"] == [[100.0, 50.0], [200.0, 50.0], [200.0, 450.0], [100.0, 450.0]]
+
+
+def test_detections_from_label_file_falls_back_to_class_ids():
+    text = "5 0.1 0.1 0.2 0.1 0.2 0.9 0.1 0.9 0.65\ninvalid line\n"
+
+    detections = detections_from_label_file(text, 100, 100, [])
+
+    assert detections == [{"char": "5", "class_id": 5, "conf": 0.65,
+                           "corners": [[10.0, 10.0], [20.0, 10.0], [20.0, 90.0], [10.0, 90.0]]}]
+
+
+@patch("backend.services.annotated_images.open_file_from_db")
+@patch("backend.services.annotated_images.get_monthly_consumption_detections_from_db")
+def test_get_annotated_image_renders_once_and_caches(mock_get_reading, mock_open_file):
+    original_id = ObjectId()
+    mock_get_reading.return_value = {"_id": ObjectId(), "original_file": original_id, "detections": []}
+    mock_open_file.side_effect = lambda _: _grid_out(_jpeg())
+
+    first, media_type, key = get_annotated_image("682d6f4ef62c1c14eae9f014")
+    second, _, second_key = get_annotated_image("682d6f4ef62c1c14eae9f014")
+
+    assert media_type == "image/jpeg"
+    assert first == second and key == second_key
+    mock_open_file.assert_called_once_with(original_id)
+
+    mock_get_reading.return_value["detections"] = [
+        {"char": "1", "class_id": 1, "conf": 0.5, "corners": [[1, 1], [5, 1], [5, 5], [1, 5]]}]
+    _, _, changed_key = get_annotated_image("682d6f4ef62c1c14eae9f014")
+    assert changed_key != key
+
+
+@patch("backend.services.annotated_images.open_file_from_db")
+@patch("backend.services.annotated_images.get_monthly_consumption_detections_from_db")
+def test_get_annotated_image_serves_legacy_label_file(mock_get_reading, mock_open_file):
+    label_id = ObjectId()
+    mock_get_reading.return_value = {"_id": ObjectId(), "original_file": ObjectId(), "label_file": label_id}
+    mock_open_file.return_value = _grid_out(_jpeg(1280, 640))
+
+    data, media_type, _ = get_annotated_image("682d6f4ef62c1c14eae9f014", "thumbnail")
+
+    mock_open_file.assert_called_once_with(label_id)
+    assert media_type == "image/webp"
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (80, 160)
+
+
+def test_annotated_image_cache_evicts_least_recently_used():
+    cache = AnnotatedImageCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+
+    assert cache.get("a") == b"1234"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"1234"
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
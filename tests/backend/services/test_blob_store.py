@@ -0,0 +1,105 @@
+import os
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from backend.services.blob_store import LocalBlobStore, GridFSBlobStore, LocalFile, get_blob_store
+
+
+@patch("backend.services.blob_store.get_db")
+def test_local_upload_writes_sharded_file_and_metadata(mock_get_db, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    file_id = store.upload("meter.jpg", BytesIO(b"jpeg bytes"), metadata={"contentType": "image/jpeg"})
+
+    name = str(file_id)
+    path = tmp_path / name[-2:] / name[-4:-2] / name
+    assert path.read_bytes() == b"jpeg bytes"
+    # no temporary files are left next to the blob
+    assert os.listdir(path.parent) == [name]
+    query, doc = mock_get_db.return_value["local_files"].replace_one.call_args.args
+    assert query == {"_id": file_id}
+    assert doc["filename"] == "meter.jpg"
+    assert doc["length"] == 10
+    assert doc["metadata"] == {"contentType": "image/jpeg"}
+
+
+@patch("backend.services.blob_store.get_db")
+def test_local_upload_keeps_given_id_and_cleans_up_failed_writes(mock_get_db, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    file_id = ObjectId()
+
+    assert store.upload("a.txt", b"label", file_id=file_id) == file_id
+
+    class Broken:
+        def read(self, _size):
+            raise IOError("read failed")
+
+    with pytest.raises(IOError):
+        store.upload("b.txt", Broken(), file_id=ObjectId())
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.startswith(".upload-")]
+
+
+@patch("backend.services.blob_store.get_db")
+def test_local_open_reads_file_lazily(mock_get_db, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    file_id = store.upload("meter.jpg", b"0123456789")
+    mock_get_db.return_value["local_files"].find_one.return_value = {
+        "_id": file_id, "filename": "meter.jpg", "length": 10, "metadata": None}
+
+    with store.open(file_id) as local_file:
+        assert isinstance(local_file, LocalFile)
+        assert local_file.path == store.path_for(file_id)
+        local_file.seek(4)
+        assert local_file.read(3) == b"456"
+        assert b"".join(local_file) == b"789"
+
+
+@patch("backend.services.blob_store.get_fs_bucket")
+@patch("backend.services.blob_store.get_db")
+def test_local_open_falls_back_to_gridfs(mock_get_db, mock_get_fs_bucket, tmp_path):
+    file_id = ObjectId()
+    mock_get_db.return_value["local_files"].find_one.return_value = None
+
+    result = LocalBlobStore(str(tmp_path)).open(file_id)
+
+    assert result is mock_get_fs_bucket.return_value.open_download_stream.return_value
+    mock_get_fs_bucket.return_value.open_download_stream.assert_called_once_with(file_id)
+
+
+@patch("backend.services.blob_store.get_db")
+def test_local_open_raises_when_file_is_missing_on_disk(mock_get_db, tmp_path):
+    file_id = ObjectId()
+    mock_get_db.return_value["local_files"].find_one.return_value = {"_id": file_id, "length": 1}
+
+    with pytest.raises(NoFile):
+        LocalBlobStore(str(tmp_path)).open(file_id)
+
+
+@patch("backend.services.blob_store.get_fs_bucket")
+@patch("backend.services.blob_store.get_db")
+def test_local_delete_removes_file_or_gridfs_copy(mock_get_db, mock_get_fs_bucket, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    file_id = store.upload("meter.jpg", b"data")
+
+    store.delete(file_id)
+    assert not os.path.exists(store.path_for(file_id))
+    mock_get_db.return_value["local_files"].delete_one.assert_called_with({"_id": file_id})
+    mock_get_fs_bucket.return_value.delete.assert_not_called()
+
+    gridfs_id = ObjectId()
+    store.delete(gridfs_id)
+    mock_get_fs_bucket.return_value.delete.assert_called_once_with(gridfs_id)
+
+
+def test_get_blob_store_uses_environment(tmp_path):
+    with patch.dict(os.environ, {"BLOB_STORE": "local", "BLOB_STORE_PATH": str(tmp_path)}):
+        store = get_blob_store()
+    assert isinstance(store, LocalBlobStore)
+    assert store.root == str(tmp_path)
+
+    with patch.dict(os.environ, {}, clear=True):
+        assert isinstance(get_blob_store(), GridFSBlobStore)
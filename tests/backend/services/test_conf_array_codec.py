@@ -0,0 +1,46 @@
+from backend.services.conf_array_codec import pack_conf_array, conf_storage_fields, unpack_conf, \
+    unpack_conf_many, conf_response_fields
+
+
+def test_pack_and_unpack_round_trip():
+    conf_array = [{"char": "1", "conf": 0.91234}, {"char": "7", "conf": 0.5}]
+
+    packed = pack_conf_array(conf_array)
+
+    assert packed["conf_chars"] == "17"
+    assert len(packed["conf_packed"]) == 8
+    assert unpack_conf(packed) == ("17", [0.9123, 0.5])
+
+
+def test_multi_character_labels_stay_in_list_form():
+    conf_array = [{"char": "10", "conf": 0.9}]
+
+    assert pack_conf_array(conf_array) is None
+    assert conf_storage_fields(conf_array) == {"conf_array": conf_array}
+
+
+def test_response_fields_expand_only_on_request():
+    doc = pack_conf_array([{"char": "4", "conf": 0.75}])
+
+    assert conf_response_fields(doc) == {"conf_chars": "4", "conf_values": [0.75]}
+    assert conf_response_fields(doc, expand=True)["conf_array"] == [{"char": "4", "conf": 0.75}]
+
+
+def test_response_fields_of_legacy_documents():
+    doc = {"conf_array": [{"char": "2", "conf": 0.6}, {"char": "3", "conf": 0.8}]}
+
+    assert conf_response_fields(doc) == {"conf_chars": "23", "conf_values": [0.6, 0.8]}
+    assert conf_response_fields(doc, expand=True)["conf_array"] == doc["conf_array"]
+    assert conf_response_fields({}) == {"conf_chars": "", "conf_values": []}
+
+
+def test_unpack_many_matches_unpack_per_document():
+    docs = [
+        pack_conf_array([{"char": "1", "conf": 0.91234}, {"char": "2", "conf": 0.5}]),
+        {"conf_array": [{"char": "1.", "conf": 0.6}]},
+        {},
+        pack_conf_array([{"char": "9", "conf": 0.25}]),
+    ]
+
+    assert unpack_conf_many(docs) == [unpack_conf(doc) for doc in docs]
+    assert unpack_conf_many([]) == []
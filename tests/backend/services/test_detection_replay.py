@@ -0,0 +1,133 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from backend.services.crud.crud_monthly_consumption import get_monthly_consumption_data_version
+from backend.services.detection_replay import raw_detections_from_result, detections_from_raw, \
+    summarize_detections, unpack_raw_detections, replay_detections
+
+
+def _raw(*boxes, angle=0.0):
+    """boxes of (class, conf, x center, y center)"""
+    result = MagicMock()
+    result.obb.xywhr = np.array([[x, y, 10, 20, angle] for _, _, x, y in boxes], np.float32).reshape(-1, 5)
+    result.obb.conf = np.array([conf for _, conf, _, _ in boxes], np.float32)
+    result.obb.cls = np.array([cls for cls, _, _, _ in boxes], np.float32)
+    return raw_detections_from_result(result, {i: str(i) for i in range(10)})
+
+
+def test_raw_detections_round_trip():
+    raw = _raw((3, 0.9, 50, 10), (7, 0.2, 20, 10))
+
+    xywhr, conf, cls = unpack_raw_detections(raw)
+
+    assert len(raw["xywhr"]) == 2 * 5 * 4
+    assert xywhr.shape == (2, 5)
+    assert cls.tolist() == [3, 7]
+    assert np.allclose(conf, [0.9, 0.2])
+
+
+def test_detections_from_raw_applies_threshold_and_order():
+    raw = _raw((3, 0.9, 50, 10), (7, 0.2, 20, 10), (1, 0.6, 10, 10))
+
+    strict = detections_from_raw(raw)
+    loose = detections_from_raw(raw, conf_threshold=0.1)
+
+    assert [d["char"] for d in strict] == ["1", "3"]
+    assert [d["char"] for d in loose] == ["1", "7", "3"]
+    assert strict[0]["corners"] == [[15.0, 20.0], [15.0, 0.0], [5.0, 0.0], [5.0, 20.0]]
+    assert summarize_detections(loose)[0] == 173.0
+
+
+def test_detections_from_raw_orders_along_box_angle():
+    # digits running top to bottom on a meter photographed at 90 degrees
+    raw = _raw((1, 0.9, 10, 10), (2, 0.9, 12, 30), (3, 0.9, 8, 50), angle=np.pi / 2)
+
+    assert [d["char"] for d in detections_from_raw(raw, order="x")] == ["3", "1", "2"]
+    assert [d["char"] for d in detections_from_raw(raw, order="angle")] == ["1", "2", "3"]
+
+
+def test_summarize_detections_without_number():
+    assert summarize_detections([]) == (None, [], 0.0)
+
+
+@pytest.fixture
+def readings(mongo_db, monkeypatch):
+    for module in ("detection_replay", "crud.crud_monthly_consumption", "crud.crud_settings"):
+        monkeypatch.setattr(f"backend.services.{module}.get_db", lambda: mongo_db)
+    mongo_db["settings"].insert_one({"_id": 1, "currency": "usd", "calculate_price": True, "debug_mode": False,
+                                     "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 1)})
+    mongo_db["electricity-prices"].insert_one({"date": "2026/01/01", "price": 0.5})
+    return mongo_db["monthly_consumptions"]
+
+
+def test_replay_detections_reports_and_applies_changes(readings):
+    unchanged = readings.insert_one({"date": datetime(2026, 1, 1), "total_kwh_consumed": 13.0, "price": 6.5,
+                                     "raw_detections": _raw((1, 0.9, 10, 10), (3, 0.8, 20, 10))}).inserted_id
+    changed = readings.insert_one({"date": datetime(2026, 2, 1), "total_kwh_consumed": 113.0, "price": 50.0,
+                                   "score": 0.8, "raw_detections": _raw((1, 0.9, 10, 10), (3, 0.8, 30, 10),
+                                                                        (4, 0.45, 20, 10))}).inserted_id
+    following = readings.insert_one({"date": datetime(2026, 3, 1), "total_kwh_consumed": 163.0,
+                                     "price": 25.0}).inserted_id
+
+    dry_run = replay_detections(conf_threshold=0.4)
+    assert readings.find_one({"_id": changed})["total_kwh_consumed"] == 113.0
+    report = replay_detections(conf_threshold=0.4, apply=True)
+
+    assert dry_run["replayed"] == 2
+    assert dry_run["changed"] == 1
+    assert dry_run["diffs"][0]["new_value"] == 143.0
+    assert (report["applied"], report["unpriced"]) == (1, 0)
+    assert readings.find_one({"_id": unchanged})["price"] == 6.5
+    assert readings.find_one({"_id": changed})["total_kwh_consumed"] == 143.0
+    assert readings.find_one({"_id": changed})["price"] == (143.0 - 13.0) * 0.5
+    # the next reading's delta starts at the replayed value
+    assert readings.find_one({"_id": following})["price"] == (163.0 - 143.0) * 0.5
+    assert get_monthly_consumption_data_version() == 1
+
+
+def test_replay_detections_keeps_values_corrected_by_hand(readings):
+    corrected = readings.insert_one({"date": datetime(2026, 2, 1), "total_kwh_consumed": 140.0,
+                                     "manually_edited": True,
+                                     "raw_detections": _raw((1, 0.9, 10, 10), (3, 0.8, 30, 10),
+                                                            (4, 0.45, 20, 10))}).inserted_id
+
+    report = replay_detections(conf_threshold=0.4, apply=True)
+
+    assert (report["replayed"], report["changed"]) == (0, 0)
+    assert readings.find_one({"_id": corrected})["total_kwh_consumed"] == 140.0
+
+
+def test_replay_detections_prices_consecutive_changes_from_the_new_values(readings):
+    first = readings.insert_one({"date": datetime(2026, 2, 1), "total_kwh_consumed": 113.0,
+                                 "raw_detections": _raw((1, 0.9, 10, 10), (3, 0.8, 30, 10),
+                                                        (4, 0.45, 20, 10))}).inserted_id
+    second = readings.insert_one({"date": datetime(2026, 3, 1), "total_kwh_consumed": 153.0,
+                                  "raw_detections": _raw((1, 0.9, 10, 10), (5, 0.8, 30, 10),
+                                                         (6, 0.45, 20, 10))}).inserted_id
+
+    replay_detections(conf_threshold=0.4, apply=True)
+
+    assert readings.find_one({"_id": first})["price"] == 143.0 * 0.5
+    assert readings.find_one({"_id": second})["price"] == (165.0 - 143.0) * 0.5
+
+
+def test_replay_detections_skips_changes_without_a_price(readings):
+    readings.database["electricity-prices"].delete_many({})
+    readings.database["electricity-prices"].insert_one({"date": "2026/03/01", "price": 0.5})
+    unpriced = readings.insert_one({"date": datetime(2026, 2, 1), "total_kwh_consumed": 113.0, "price": 50.0,
+                                    "raw_detections": _raw((1, 0.9, 10, 10), (3, 0.8, 30, 10),
+                                                           (4, 0.45, 20, 10))}).inserted_id
+    priced = readings.insert_one({"date": datetime(2026, 3, 1), "total_kwh_consumed": 153.0,
+                                  "raw_detections": _raw((1, 0.9, 10, 10), (5, 0.8, 30, 10),
+                                                         (6, 0.45, 20, 10))}).inserted_id
+
+    report = replay_detections(conf_threshold=0.4, apply=True)
+
+    assert (report["changed"], report["applied"], report["unpriced"]) == (2, 1, 1)
+    assert readings.find_one({"_id": unpriced})["total_kwh_consumed"] == 113.0
+    assert readings.find_one({"_id": unpriced})["price"] == 50.0
+    assert readings.find_one({"_id": priced})["price"] == (165.0 - 113.0) * 0.5
+    assert get_monthly_consumption_data_version() == 1
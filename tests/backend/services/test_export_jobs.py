@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta, date
+from unittest.mock import patch, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from backend.services import export_jobs
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.export_jobs import request_export, run_export_job, evict_export_artifacts, get_export_artifact, \
+    wait_for_export_job
+
+
+def _settings(currency="usd"):
+    return type("S", (), {"currency": currency})()
+
+
+@patch("backend.services.export_jobs._executor")
+@patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=4)
+@patch("backend.services.export_jobs.get_cached_setting_from_db", return_value=_settings())
+@patch("backend.services.export_jobs.get_db")
+def test_request_export_queues_new_job(mock_get_db, mock_settings, mock_version, mock_executor):
+    jobs = mock_get_db.return_value["export_jobs"]
+    jobs.find_one_and_update.side_effect = lambda query, update, **kwargs: {
+        "key": query["key"], **update["$setOnInsert"], **update["$set"]}
+
+    job = request_export("csv", date(2025, 1, 1), None, ["date"])
+
+    assert job["status"] == "queued"
+    assert job["data_version"] == 4
+    assert job["filters"] == {"from": "2025-01-01", "to": None, "columns": ["date"], "summary": False}
+    mock_executor.submit.assert_called_once_with(run_export_job, job["_id"])
+
+
+@patch("backend.services.export_jobs._executor")
+@patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=4)
+@patch("backend.services.export_jobs.get_cached_setting_from_db", return_value=_settings())
+@patch("backend.services.export_jobs.get_db")
+def test_request_export_reuses_cached_artifact(mock_get_db, mock_settings, mock_version, mock_executor):
+    cached = {"_id": ObjectId(), "status": "done", "created_at": datetime.now() - timedelta(days=1)}
+    mock_get_db.return_value["export_jobs"].find_one_and_update.return_value = cached
+
+    job = request_export("pdf")
+
+    assert job is cached
+    mock_executor.submit.assert_not_called()
+
+
+@patch("backend.services.export_jobs._executor")
+@patch("backend.services.export_jobs.get_cached_setting_from_db", return_value=_settings())
+@patch("backend.services.export_jobs.get_db")
+def test_export_key_depends_on_data_version(mock_get_db, mock_settings, mock_executor):
+    jobs = mock_get_db.return_value["export_jobs"]
+    jobs.find_one_and_update.return_value = {"_id": ObjectId(), "status": "done", "created_at": datetime.now()}
+
+    with patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=1):
+        request_export("csv")
+    with patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=2):
+        request_export("csv")
+
+    keys = [call.args[0]["key"] for call in jobs.find_one_and_update.call_args_list]
+    assert keys[0] != keys[1]
+
+
+@patch("backend.services.export_jobs.evict_export_artifacts")
+@patch("backend.services.export_jobs.get_export_fs_bucket")
+@patch("backend.services.export_jobs.build_csv_bytes", return_value=b"a,b\n")
+@patch("backend.services.export_jobs.get_db")
+def test_run_export_job_stores_artifact(mock_get_db, mock_build, mock_bucket, mock_evict):
+    job_id = ObjectId()
+    file_id = ObjectId()
+    jobs = mock_get_db.return_value["export_jobs"]
+    jobs.find_one_and_update.return_value = {
+        "_id": job_id, "key": "k", "file_format": "csv",
+        "filters": {"from": "2025-01-01", "to": "2025-01-31", "columns": None, "summary": False},
+    }
+    mock_bucket.return_value.upload_from_stream.return_value = file_id
+
+    run_export_job(job_id)
+
+    mock_build.assert_called_once_with(date(2025, 1, 1), date(2025, 1, 31), None)
+    update = jobs.update_one.call_args.args[1]["$set"]
+    assert update["status"] == "done"
+    assert update["file_id"] == file_id
+    assert update["size"] == 4
+    mock_evict.assert_called_once()
+
+
+@patch("backend.services.export_jobs.build_pdf_bytes", side_effect=RuntimeError("boom"))
+@patch("backend.services.export_jobs.get_db")
+def test_run_export_job_marks_failure(mock_get_db, mock_build):
+    jobs = mock_get_db.return_value["export_jobs"]
+    jobs.find_one_and_update.return_value = {
+        "_id": ObjectId(), "key": "k", "file_format": "pdf",
+        "filters": {"from": None, "to": None, "columns": None, "summary": False},
+    }
+
+    run_export_job(ObjectId())
+
+    update = jobs.update_one.call_args.args[1]["$set"]
+    assert update["status"] == "failed"
+    assert update["error"] == "boom"
+
+
+@patch("backend.services.export_jobs.get_export_fs_bucket")
+@patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=7)
+@patch("backend.services.export_jobs.get_db")
+def test_evict_export_artifacts_removes_stale_and_least_recently_used(mock_get_db, mock_version, mock_bucket):
+    stale = {"_id": ObjectId(), "file_id": ObjectId()}
+    least_recent = {"_id": ObjectId(), "file_id": ObjectId()}
+    jobs = mock_get_db.return_value["export_jobs"]
+    stale_cursor = [stale]
+    lru_cursor = MagicMock()
+    lru_cursor.sort.return_value.skip.return_value = [least_recent]
+    jobs.find.side_effect = [stale_cursor, lru_cursor]
+
+    evicted = evict_export_artifacts()
+
+    assert evicted == 2
+    stale_query = jobs.find.call_args_list[0].args[0]
+    assert {"data_version": {"$lt": 7}} in stale_query["$or"]
+    lru_cursor.sort.return_value.skip.assert_called_once_with(export_jobs.EXPORT_CACHE_MAX_ARTIFACTS)
+    assert mock_bucket.return_value.delete.call_count == 2
+    assert jobs.delete_one.call_count == 2
+
+
+@patch("backend.services.export_jobs.get_export_fs_bucket")
+@patch("backend.services.export_jobs.get_monthly_consumption_data_version", return_value=7)
+@patch("backend.services.export_jobs.get_db")
+def test_evict_export_artifacts_keeps_recently_read_artifacts(mock_get_db, mock_version, mock_bucket):
+    jobs = mock_get_db.return_value["export_jobs"]
+    jobs.find.side_effect = [[{"_id": ObjectId(), "file_id": ObjectId()}], MagicMock()]
+    # a download read it within the grace period
+    jobs.find_one_and_update.return_value = None
+
+    assert evict_export_artifacts() == 0
+
+    claim_query = jobs.find_one_and_update.call_args.args[0]
+    assert claim_query["last_accessed_at"]["$lt"] < datetime.now() - export_jobs.EXPORT_EVICTION_GRACE \
+        + timedelta(seconds=5)
+    mock_bucket.return_value.delete.assert_not_called()
+    jobs.delete_one.assert_not_called()
+
+
+@patch("backend.services.export_jobs.get_export_fs_bucket")
+@patch("backend.services.export_jobs.get_db")
+def test_get_export_artifact_of_an_evicted_job(mock_get_db, mock_bucket):
+    mock_get_db.return_value["export_jobs"].update_one.return_value.matched_count = 0
+
+    with pytest.raises(NoObjectHasFoundException):
+        get_export_artifact({"_id": ObjectId(), "file_id": ObjectId()})
+
+    mock_bucket.return_value.open_download_stream.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("backend.services.export_jobs.EXPORT_JOB_POLL_SECONDS", 0)
+@patch("backend.services.export_jobs.get_export_job")
+async def test_wait_for_export_job_polls_until_done(mock_get_export_job):
+    job_id = ObjectId()
+    mock_get_export_job.side_effect = [{"_id": job_id, "status": "running"}, {"_id": job_id, "status": "done"}]
+
+    job = await wait_for_export_job({"_id": job_id, "status": "queued"}, timeout=5)
+
+    assert job["status"] == "done"
+    assert mock_get_export_job.call_count == 2
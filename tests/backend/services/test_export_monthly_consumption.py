@@ -1,5 +1,5 @@
 from unittest.mock import patch
-from datetime import datetime
+from datetime import datetime, date
 from io import BytesIO
 from pypdf import PdfReader
 
@@ -7,66 +7,21 @@ import pandas as pd
 import pytest
 
 from backend.services.export_monthly_consumption import build_pdf_bytes
-from backend.services.model.MonthlyConsumption import MonthlyConsumption
 
 
-@patch("backend.services.export_monthly_consumption.get_setting_from_db")
-@patch("backend.services.export_monthly_consumption.get_all_monthly_consumption_from_db")
-def test_build_csv_uses_currency_symbol(mock_get_all, mock_get_settings):
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_csv_uses_currency_symbol(mock_get_rows, mock_get_settings):
     # Arrange
     mock_get_settings.return_value = type("S", (), {"currency": "USD"})()
-    items = [
-        MonthlyConsumption(
-            modified_date=datetime(2025, 12, 1, 12, 0, 0),
-            date=datetime(2025, 12, 1),
-            total_kwh_consumed=100.0,
-            price=12.3456,
-            original_file=None,
-            file_name="a.jpg",
-            label_file=None,
-            file_label_name="b.jpg",
-            conf_array= [
-                {
-                    "char": "0",
-                    "conf": 0.9783397912979126
-                },
-                {
-                    "char": "0",
-                    "conf": 0.8652015328407288
-                },
-                {
-                    "char": "5",
-                    "conf": 0.9761660695075989
-                },
-                {
-                    "char": "7",
-                    "conf": 0.9605460166931152
-                },
-                {
-                    "char": "1",
-                    "conf": 0.8946158289909363
-                },
-                {
-                    "char": "8",
-                    "conf": 0.9541907906532288
-                },
-                {
-                    "char": ".",
-                    "conf": 0.8447996377944946
-                },
-                {
-                    "char": "1",
-                    "conf": 0.9127216339111328
-                },
-                {
-                    "char": "3",
-                    "conf": 0.9876267313957214
-                }
-            ],
-            score= 0.9304675592316521
-        )
+    mock_get_rows.return_value = [
+        {
+            "modified_date": datetime(2025, 12, 1, 12, 0, 0),
+            "date": datetime(2025, 12, 1),
+            "total_kwh_consumed": 100.0,
+            "price": 12.3456,
+        }
     ]
-    mock_get_all.return_value = items
 
     # Act
     from backend.services.export_monthly_consumption import build_csv_bytes
@@ -79,63 +34,19 @@ def test_build_csv_uses_currency_symbol(mock_get_all, mock_get_settings):
     assert b"total_kwh_consumed" in csv_bytes
 
 
-@patch("backend.services.export_monthly_consumption.get_setting_from_db")
-@patch("backend.services.export_monthly_consumption.get_all_monthly_consumption_from_db")
-def test_build_xlsx_uses_currency_symbol(mock_get_all, mock_get_settings):
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_xlsx_uses_currency_symbol(mock_get_rows, mock_get_settings):
     # Arrange
     mock_get_settings.return_value = type("S", (), {"currency": "EUR"})()
-    items = [
-        MonthlyConsumption(
-            modified_date=datetime(2025, 11, 1, 12, 0, 0),
-            date=datetime(2025, 11, 1),
-            total_kwh_consumed=50.0,
-            price=3.1,
-            original_file=None,
-            file_name="c.jpg",
-            label_file=None,
-            file_label_name="d.jpg",
-            conf_array= [
-                {
-                    "char": "0",
-                    "conf": 0.9783397912979126
-                },
-                {
-                    "char": "0",
-                    "conf": 0.8652015328407288
-                },
-                {
-                    "char": "5",
-                    "conf": 0.9761660695075989
-                },
-                {
-                    "char": "7",
-                    "conf": 0.9605460166931152
-                },
-                {
-                    "char": "1",
-                    "conf": 0.8946158289909363
-                },
-                {
-                    "char": "8",
-                    "conf": 0.9541907906532288
-                },
-                {
-                    "char": ".",
-                    "conf": 0.8447996377944946
-                },
-                {
-                    "char": "1",
-                    "conf": 0.9127216339111328
-                },
-                {
-                    "char": "3",
-                    "conf": 0.9876267313957214
-                }
-            ],
-            score= 0.9304675592316521
-        )
+    mock_get_rows.return_value = [
+        {
+            "modified_date": datetime(2025, 11, 1, 12, 0, 0),
+            "date": datetime(2025, 11, 1),
+            "total_kwh_consumed": 50.0,
+            "price": 3.1,
+        }
     ]
-    mock_get_all.return_value = items
 
     # Act
     from backend.services.export_monthly_consumption import build_xlsx_bytes
@@ -150,126 +61,150 @@ def test_build_xlsx_uses_currency_symbol(mock_get_all, mock_get_settings):
     assert "date" in df.columns
 
 
-@patch("backend.services.export_monthly_consumption.get_setting_from_db")
-@patch("backend.services.export_monthly_consumption.get_all_monthly_consumption_from_db")
-def test_prepare_dataframe_formats_price_with_currency_symbol(mock_get_all, mock_get_settings):
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+def test_prepare_dataframe_formats_price_with_currency_symbol(mock_get_settings):
     # Arrange
     mock_get_settings.return_value = type("S", (), {"currency": "ILS"})()
-    items = [
-        MonthlyConsumption(
-            modified_date=datetime(2025, 10, 1, 12, 0, 0),
-            date=datetime(2025, 10, 1),
-            total_kwh_consumed=75.0,
-            price=7.5,
-            original_file=None,
-            file_name="e.jpg",
-            label_file=None,
-            file_label_name="f.jpg",
-            conf_array= [
-                {
-                    "char": "0",
-                    "conf": 0.9783397912979126
-                },
-                {
-                    "char": "0",
-                    "conf": 0.8652015328407288
-                },
-                {
-                    "char": "5",
-                    "conf": 0.9761660695075989
-                },
-                {
-                    "char": "7",
-                    "conf": 0.9605460166931152
-                },
-                {
-                    "char": "1",
-                    "conf": 0.8946158289909363
-                },
-                {
-                    "char": "8",
-                    "conf": 0.9541907906532288
-                },
-                {
-                    "char": ".",
-                    "conf": 0.8447996377944946
-                },
-                {
-                    "char": "1",
-                    "conf": 0.9127216339111328
-                },
-                {
-                    "char": "3",
-                    "conf": 0.9876267313957214
-                }
-            ],
-            score= 0.9304675592316521
-        )
+    rows = [
+        {
+            "modified_date": datetime(2025, 10, 1, 12, 0, 0),
+            "date": datetime(2025, 10, 1),
+            "total_kwh_consumed": 75.0,
+            "price": 7.5,
+        }
     ]
-    mock_get_all.return_value = items
 
     # Act
     from backend.services.export_monthly_consumption import _prepare_dataframe
 
-    df = _prepare_dataframe(items)
+    df = _prepare_dataframe(rows)
 
     # Assert
     assert df.loc[0, "price"] == "₪7.50"
 
 
+@patch("backend.services.export_monthly_consumption.get_previous_total_kwh_consumed")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_csv_pushes_filters_and_columns_down(mock_get_rows, mock_get_previous):
+    # Arrange
+    mock_get_previous.return_value = 90.0
+    mock_get_rows.return_value = [
+        {"date": datetime(2025, 10, 1), "total_kwh_consumed": 100.0},
+        {"date": datetime(2025, 11, 1), "total_kwh_consumed": 130.0},
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import build_csv_bytes
+
+    csv_bytes = build_csv_bytes(date(2025, 10, 1), date(2025, 11, 30), ["date", "delta_kwh"])
+
+    # Assert
+    mock_get_rows.assert_called_once_with(date(2025, 10, 1), date(2025, 11, 30), ["date", "total_kwh_consumed"])
+    mock_get_previous.assert_called_once_with(date(2025, 10, 1))
+    assert csv_bytes.decode().splitlines() == ["date,delta_kwh", "2025-10-01,10.0", "2025-11-01,30.0"]
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+def test_prepare_dataframe_vectorized_formatting_matches_row_formatting(mock_get_settings):
+    # Arrange
+    mock_get_settings.return_value = type("S", (), {"currency": "GBP"})()
+    modified_dates = [datetime(2025, 9, 1, 8, 30, 0), datetime(2025, 10, 1, 8, 30, 0, 123000), None]
+    prices = [0.0, -1.005, None]
+    rows = [
+        {"modified_date": modified, "date": datetime(2025, 9 + i, 1, 23, 59), "total_kwh_consumed": 10.0 * (i + 1),
+         "price": price}
+        for i, (modified, price) in enumerate(zip(modified_dates, prices))
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import _prepare_dataframe
+
+    df = _prepare_dataframe(rows)
+
+    # Assert
+    assert df["modified_date"].tolist() == [modified_dates[0].isoformat(), modified_dates[1].isoformat(), ""]
+    assert df["date"].tolist() == ["2025-09-01", "2025-10-01", "2025-11-01"]
+    assert df["price"].tolist() == ["£0.00", "£-1.00", ""]
+    assert df["delta_kwh"].tolist() == [10.0, 10.0, 10.0]
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_iter_dataframes_carries_delta_across_chunks(mock_get_rows, mock_get_settings):
+    # Arrange
+    mock_get_settings.return_value = type("S", (), {"currency": "USD"})()
+    mock_get_rows.return_value = [
+        {"modified_date": datetime(2025, m, 2), "date": datetime(2025, m, 1), "total_kwh_consumed": 100.0 * m,
+         "price": 1.0}
+        for m in range(1, 6)
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import _iter_dataframes
+
+    frames = list(_iter_dataframes(chunk_size=2))
+
+    # Assert
+    assert [len(frame) for frame in frames] == [2, 2, 1]
+    assert pd.concat(frames)["delta_kwh"].tolist() == [100.0, 100.0, 100.0, 100.0, 100.0]
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_xlsx_with_summary_sheet(mock_get_rows, mock_get_settings):
+    # Arrange
+    mock_get_settings.return_value = type("S", (), {"currency": "USD"})()
+    mock_get_rows.return_value = [
+        {"date": datetime(2024, 12, 1), "total_kwh_consumed": 100.0, "price": 10.0},
+        {"date": datetime(2025, 1, 1), "total_kwh_consumed": 150.0, "price": 5.0},
+        {"date": datetime(2025, 1, 20), "total_kwh_consumed": 160.0, "price": 1.0},
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import build_xlsx_bytes
+
+    xlsx_bytes = build_xlsx_bytes(columns=["date", "total_kwh_consumed"], summary=True)
+
+    # Assert
+    mock_get_rows.assert_called_once_with(None, None, ["date", "total_kwh_consumed", "price"])
+    sheets = pd.read_excel(BytesIO(xlsx_bytes), sheet_name=None, header=None)
+    assert list(sheets) == ["monthly_consumption", "summary"]
+    assert sheets["monthly_consumption"].iloc[0].tolist() == ["date", "total_kwh_consumed"]
+    summary = sheets["summary"].values.tolist()
+    # the first reading has nothing to be compared with, its meter reading is not consumption
+    assert summary[1] == ["2024-12", 0, 10, 1]
+    assert summary[2] == ["2025-01", 60, 6, 2]
+    assert summary[5] == [2024, 0, 10, 1]
+    assert summary[6] == [2025, 60, 6, 2]
+
+
+@patch("backend.services.export_monthly_consumption.get_previous_total_kwh_consumed", return_value=90.0)
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_summary_counts_the_first_delta_after_an_earlier_reading(mock_get_rows, mock_previous):
+    from backend.services.export_monthly_consumption import ExportSummary, _iter_raw_frames
+
+    mock_get_rows.return_value = [
+        {"date": datetime(2025, 1, 1), "total_kwh_consumed": 100.0, "price": 1.0},
+        {"date": datetime(2025, 2, 1), "total_kwh_consumed": 130.0, "price": 3.0},
+    ]
+    summary = ExportSummary()
+
+    list(_iter_raw_frames(date(2025, 1, 1), None, ["date"], summary, chunk_size=1))
+
+    assert summary.monthly_rows() == [("2025-01", 10.0, 1.0, 1), ("2025-02", 30.0, 3.0, 1)]
+    assert summary.totals() == (40.0, 4.0, 2)
+
+
 @pytest.mark.asyncio
-@patch("backend.services.export_monthly_consumption.get_all_monthly_consumption_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
 async def test_builds_pdf_with_valid_data(mock_get_data):
     mock_get_data.return_value = [
-        MonthlyConsumption(
-            modified_date=datetime(2025, 10, 1, 12, 0, 0),
-            date=datetime(2025, 10, 1),
-            total_kwh_consumed=75.0,
-            price=7.5,
-            original_file=None,
-            file_name="e.jpg",
-            label_file=None,
-            file_label_name="f.jpg",
-            conf_array= [
-                {
-                    "char": "0",
-                    "conf": 0.9783397912979126
-                },
-                {
-                    "char": "0",
-                    "conf": 0.8652015328407288
-                },
-                {
-                    "char": "5",
-                    "conf": 0.9761660695075989
-                },
-                {
-                    "char": "7",
-                    "conf": 0.9605460166931152
-                },
-                {
-                    "char": "1",
-                    "conf": 0.8946158289909363
-                },
-                {
-                    "char": "8",
-                    "conf": 0.9541907906532288
-                },
-                {
-                    "char": ".",
-                    "conf": 0.8447996377944946
-                },
-                {
-                    "char": "1",
-                    "conf": 0.9127216339111328
-                },
-                {
-                    "char": "3",
-                    "conf": 0.9876267313957214
-                }
-            ],
-            score= 0.9304675592316521
-        )
+        {
+            "modified_date": datetime(2025, 10, 1, 12, 0, 0),
+            "date": datetime(2025, 10, 1),
+            "total_kwh_consumed": 75.0,
+            "price": 7.5,
+        }
     ]
     result = build_pdf_bytes()
     assert b"%PDF" in result
@@ -286,7 +221,7 @@ async def test_builds_pdf_with_valid_data(mock_get_data):
 
 
 @pytest.mark.asyncio
-@patch("backend.services.export_monthly_consumption.get_all_monthly_consumption_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
 async def test_builds_pdf_with_empty_data(mock_get_data):
     mock_get_data.return_value = []
     result = build_pdf_bytes()
@@ -300,3 +235,120 @@ async def test_builds_pdf_with_empty_data(mock_get_data):
         extracted_text += page.extract_text() or ""
 
     assert "No data available" in extracted_text
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_builds_paginated_pdf_with_repeated_headers_and_totals(mock_get_data, mock_get_settings):
+    mock_get_settings.return_value = type("S", (), {"currency": "USD"})()
+    mock_get_data.return_value = [
+        {
+            "modified_date": datetime(2025, 1, 1),
+            "date": datetime(2020, 1, 1) + pd.Timedelta(days=10 * i),
+            "total_kwh_consumed": 10.0 * (i + 1),
+            "price": 1.5,
+        }
+        for i in range(100)
+    ]
+
+    result = build_pdf_bytes()
+
+    reader = PdfReader(BytesIO(result))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    assert len(pages) > 2
+    assert "Monthly consumption report" in pages[0]
+    assert "$150.00" in pages[0]
+    # 10 to 1000 kWh, the first reading is not consumption
+    assert "990.000" in pages[0]
+    # every readings page starts with its own header row
+    assert all("total_kwh_consumed" in page for page in pages[1:])
+
+
+@patch("backend.services.export_monthly_consumption.get_previous_total_kwh_consumed")
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_parquet_keeps_native_types(mock_get_rows, mock_get_settings, mock_get_previous):
+    # Arrange
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    mock_get_settings.return_value = type("S", (), {"currency": "usd"})()
+    mock_get_previous.return_value = 90.0
+    mock_get_rows.return_value = [
+        {"modified_date": datetime(2025, 10, 2, 8, 30), "date": datetime(2025, 10, 1), "total_kwh_consumed": 100.0,
+         "price": 12.3456},
+        {"modified_date": None, "date": datetime(2025, 11, 1), "total_kwh_consumed": 130.0, "price": None},
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import build_parquet_bytes
+
+    table = pq.read_table(BytesIO(build_parquet_bytes(date(2025, 10, 1))))
+
+    # Assert
+    assert table.schema.field("date").type == pa.timestamp("us")
+    assert table.schema.field("price").type == pa.float64()
+    assert table.schema.metadata[b"currency"] == b"USD"
+    assert table.column("date").to_pylist() == [datetime(2025, 10, 1), datetime(2025, 11, 1)]
+    assert table.column("price").to_pylist() == [12.3456, None]
+    assert table.column("modified_date").to_pylist() == [datetime(2025, 10, 2, 8, 30), None]
+    assert table.column("delta_kwh").to_pylist() == [10.0, 30.0]
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_build_arrow_streams_one_batch_per_chunk(mock_get_rows, mock_get_settings):
+    # Arrange
+    import pyarrow as pa
+
+    mock_get_settings.return_value = type("S", (), {"currency": "EUR"})()
+    mock_get_rows.return_value = [
+        {"date": datetime(2025, m, 1), "total_kwh_consumed": 100.0 * m} for m in range(1, 6)
+    ]
+
+    # Act
+    from backend.services.export_monthly_consumption import build_arrow_bytes, _arrow_schema, _iter_record_batches
+
+    arrow_bytes = build_arrow_bytes(columns=["date", "delta_kwh"])
+    schema = _arrow_schema(["date", "delta_kwh"])
+    batches = list(_iter_record_batches(None, None, ["date", "delta_kwh"], schema, chunk_size=2))
+
+    # Assert
+    table = pa.ipc.open_stream(arrow_bytes).read_all()
+    assert table.column_names == ["date", "delta_kwh"]
+    assert table.schema.metadata[b"currency"] == b"EUR"
+    assert table.column("delta_kwh").to_pylist() == [100.0] * 5
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+    assert pa.Table.from_batches(batches).equals(table)
+
+
+@patch("backend.services.export_monthly_consumption.get_cached_setting_from_db")
+@patch("backend.services.export_monthly_consumption.get_monthly_consumptions_for_export")
+def test_pdf_tables_fill_pages_across_chunks(mock_get_data, mock_get_settings):
+    from backend.services import export_monthly_consumption
+
+    mock_get_settings.return_value = type("S", (), {"currency": "USD"})()
+    mock_get_data.return_value = [
+        {"date": datetime(2020, 1, 1) + pd.Timedelta(days=10 * i), "total_kwh_consumed": 10.0 * (i + 1)}
+        for i in range(100)
+    ]
+    iter_dataframes = export_monthly_consumption._iter_dataframes
+    pdf_table = export_monthly_consumption._pdf_table
+    table_rows = []
+
+    def record_table(data, *args, **kwargs):
+        if data[0] == ["date", "total_kwh_consumed"]:
+            table_rows.append(len(data) - 1)
+        return pdf_table(data, *args, **kwargs)
+
+    # chunks of 7 rows, far fewer than a page holds
+    with patch.object(export_monthly_consumption, "_iter_dataframes",
+                      lambda *args: iter_dataframes(*args, chunk_size=7)), \
+            patch.object(export_monthly_consumption, "_pdf_table", side_effect=record_table):
+        build_pdf_bytes(columns=["date", "total_kwh_consumed"])
+
+    assert sum(table_rows) == 100
+    assert table_rows[0] > 7
+    assert len(set(table_rows[:-1])) == 1
+    assert 0 < table_rows[-1] <= table_rows[0]
+    assert len(table_rows) == -(-100 // table_rows[0])
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.services.exception.ImageQualityTooLowException import ImageQualityTooLowException
+from backend.services.image_quality import assess_image, check_image_quality, get_image_quality_stats, \
+    QualityThresholds
+
+
+def meter_photo(width=1200, height=900):
+    image = np.full((height, width, 3), 110, np.uint8)
+    cv2.rectangle(image, (width // 5, height // 3), (width * 4 // 5, height * 2 // 3), (40, 40, 40), -1)
+    cv2.putText(image, "012345", (width // 4, height * 3 // 5), cv2.FONT_HERSHEY_SIMPLEX, width / 300, (220, 220, 220),
+                max(2, width // 150))
+    return image
+
+
+def jpeg(image):
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def test_sharp_photo_passes():
+    report = assess_image(jpeg(meter_photo()), QualityThresholds())
+
+    assert report.reason is None
+    assert (report.width, report.height) == (1200, 900)
+    assert report.sharpness > QualityThresholds.min_sharpness
+
+
+@pytest.mark.parametrize("image, reason", [
+    (meter_photo(160, 120), "too_small"),
+    ((meter_photo() * 0.05).astype(np.uint8), "too_dark"),
+    (np.clip(meter_photo().astype(int) + 200, 0, 255).astype(np.uint8), "too_bright"),
+    (cv2.GaussianBlur(meter_photo(), (0, 0), 20), "too_blurry"),
+])
+def test_hopeless_photos_are_rejected(image, reason):
+    assert assess_image(jpeg(image), QualityThresholds()).reason == reason
+
+
+def test_not_an_image():
+    assert assess_image(b"not an image", QualityThresholds()).reason == "not_an_image"
+
+
+def test_thresholds_from_env(monkeypatch):
+    monkeypatch.setenv("QUALITY_MIN_SIDE", "100")
+    monkeypatch.setenv("QUALITY_MIN_SHARPNESS", "0")
+    monkeypatch.setenv("QUALITY_GATE_ENABLED", "false")
+
+    thresholds = QualityThresholds.from_env()
+
+    assert (thresholds.enabled, thresholds.min_side, thresholds.min_sharpness) == (False, 100, 0.0)
+    assert assess_image(jpeg(meter_photo(160, 120)), thresholds).reason is None
+
+
+@patch("backend.services.image_quality.get_db")
+def test_check_raises_with_reason_and_counts(mock_get_db):
+    stats = mock_get_db.return_value["background_jobs"]
+
+    with pytest.raises(ImageQualityTooLowException) as exc:
+        check_image_quality(jpeg(meter_photo(160, 120)), QualityThresholds())
+    check_image_quality(jpeg(meter_photo()), QualityThresholds())
+
+    assert exc.value.reason == "too_small"
+    assert "too small" in exc.value.message
+    assert [call.args[1] for call in stats.update_one.call_args_list] == [
+        {"$inc": {"checked": 1, "rejected": 1, "rejected_by_reason.too_small": 1}},
+        {"$inc": {"checked": 1}},
+    ]
+
+
+@patch("backend.services.image_quality.get_db")
+def test_disabled_gate_lets_everything_through(mock_get_db):
+    check_image_quality(b"not an image", QualityThresholds(enabled=False))
+
+    mock_get_db.assert_not_called()
+
+
+@patch("backend.services.image_quality.get_db")
+def test_rejection_rate(mock_get_db):
+    mock_get_db.return_value["background_jobs"].find_one.return_value = {
+        "checked": 8, "rejected": 2, "rejected_by_reason": {"too_blurry": 2}}
+
+    stats = get_image_quality_stats()
+
+    assert stats.rejection_rate == 0.25
+    assert stats.rejected_by_reason == {"too_blurry": 2}
+    assert stats.thresholds["min_side"] == QualityThresholds.min_side
@@ -0,0 +1,106 @@
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+
+import cv2
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from backend.services.exception.FileIsNotAnImageException import FileIsNotAnImageException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.image_renditions import render_rendition, get_rendition_file_id
+
+source_id = "682d6f4ef62c1c14eae9f014"
+
+
+def _jpeg(width, height):
+    image = np.full((height, width, 3), 200, dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def _decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_render_rendition_downscales_longest_edge_as_webp():
+    data = render_rendition(_jpeg(1600, 1200), 160)
+
+    assert data[8:12] == b"WEBP"
+    assert _decode(data).shape[:2] == (120, 160)
+
+
+def test_render_rendition_does_not_upscale():
+    assert _decode(render_rendition(_jpeg(100, 50), 640)).shape[:2] == (50, 100)
+
+
+def test_render_rendition_rejects_non_images():
+    with pytest.raises(FileIsNotAnImageException):
+        render_rendition(b"0 0.5 0.5 0.1 0.1", 160)
+
+
+@patch("backend.services.image_renditions.open_file_from_db")
+@patch("backend.services.image_renditions.get_db")
+def test_get_rendition_file_id_returns_linked_rendition(mock_get_db, mock_open_file):
+    rendition_id = ObjectId()
+    mock_get_db.return_value["monthly_consumptions"].find_one.return_value = {
+        "_id": ObjectId(), "renditions": {source_id: {"thumbnail": rendition_id}}}
+
+    assert get_rendition_file_id(source_id, "thumbnail") == rendition_id
+    mock_open_file.assert_not_called()
+    # readings edited before the file id migration hold the id as a string
+    query = mock_get_db.return_value["monthly_consumptions"].find_one.call_args.args[0]
+    assert {"original_file": {"$in": [ObjectId(source_id), source_id]}} in query["$or"]
+
+
+@patch("backend.services.image_renditions.save_bytes_to_db")
+@patch("backend.services.image_renditions.open_file_from_db")
+@patch("backend.services.image_renditions.get_db")
+def test_get_rendition_file_id_renders_and_links_on_first_request(mock_get_db, mock_open_file, mock_save):
+    reading_id = ObjectId()
+    rendition_id = ObjectId()
+    collection = mock_get_db.return_value["monthly_consumptions"]
+    collection.find_one.return_value = {"_id": reading_id}
+    collection.update_one.return_value.modified_count = 1
+    mock_open_file.return_value = MagicMock(wraps=BytesIO(_jpeg(1280, 960)))
+    mock_open_file.return_value.__enter__.return_value = mock_open_file.return_value
+    mock_save.return_value = rendition_id
+
+    assert get_rendition_file_id(source_id, "medium") == rendition_id
+
+    data, filename, content_type = mock_save.call_args.args
+    assert _decode(data).shape[:2] == (480, 640)
+    assert filename == f"{source_id}_medium.webp"
+    assert content_type == "image/webp"
+    query, update = collection.update_one.call_args.args
+    assert query == {"_id": reading_id, f"renditions.{source_id}.medium": {"$exists": False}}
+    assert update == {"$set": {f"renditions.{source_id}.medium": rendition_id}}
+
+
+@patch("backend.services.image_renditions.delete_file_from_db")
+@patch("backend.services.image_renditions.save_bytes_to_db")
+@patch("backend.services.image_renditions.open_file_from_db")
+@patch("backend.services.image_renditions.get_db")
+def test_get_rendition_file_id_keeps_concurrently_linked_rendition(mock_get_db, mock_open_file, mock_save,
+                                                                   mock_delete_file):
+    reading_id = ObjectId()
+    winner_id = ObjectId()
+    collection = mock_get_db.return_value["monthly_consumptions"]
+    collection.find_one.side_effect = [
+        {"_id": reading_id},
+        {"_id": reading_id, "renditions": {source_id: {"thumbnail": winner_id}}},
+    ]
+    collection.update_one.return_value.modified_count = 0
+    mock_open_file.return_value.__enter__.return_value.read.return_value = _jpeg(320, 240)
+
+    assert get_rendition_file_id(source_id, "thumbnail") == winner_id
+    mock_delete_file.assert_called_once_with(mock_save.return_value)
+
+
+@patch("backend.services.image_renditions.get_db")
+def test_get_rendition_file_id_raises_for_files_without_reading(mock_get_db):
+    mock_get_db.return_value["monthly_consumptions"].find_one.return_value = None
+
+    with pytest.raises(NoObjectHasFoundException):
+        get_rendition_file_id(source_id, "thumbnail")
+    with pytest.raises(NoObjectHasFoundException):
+        get_rendition_file_id("not-an-id", "thumbnail")
@@ -0,0 +1,209 @@
+import hashlib
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import cv2
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from backend.services.blob_store import get_blob_store
+from backend.services.crud.crud_files import open_file_from_db, get_file_from_db
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.image_retention import RetentionPolicy, months_ago, run_retention, get_retention_job
+
+
+def _png(width=400, height=300):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def _stored(data, filename="meter.png"):
+    stored = MagicMock()
+    stored.__enter__.return_value = stored
+    stored.filename = filename
+    stored.length = len(data)
+    stored.read.return_value = data
+    return stored
+
+
+def _db(readings, job=None):
+    db = MagicMock()
+    collections = {"background_jobs": MagicMock(), "monthly_consumptions": MagicMock(), "file_refs": MagicMock()}
+    db.__getitem__.side_effect = collections.__getitem__
+    collections["background_jobs"].find_one.return_value = job
+    cursor = MagicMock()
+    cursor.sort.return_value.limit.side_effect = [readings, []]
+    collections["monthly_consumptions"].find.side_effect = lambda query, *args: \
+        cursor if args == () else [{"_id": reading["_id"]} for reading in readings]
+    collections["monthly_consumptions"].find_one.side_effect = lambda query, *args: \
+        next(reading for reading in readings if reading["_id"] == query["_id"])
+    return db, collections
+
+
+def test_months_ago_clamps_day():
+    assert months_ago(datetime(2026, 3, 31), 1) == datetime(2026, 2, 28)
+    assert months_ago(datetime(2026, 1, 15), 13) == datetime(2024, 12, 15)
+
+
+@patch.dict("os.environ", {"RETENTION_REENCODE_AFTER_MONTHS": "12", "RETENTION_THROTTLE_SECONDS": "0"}, clear=True)
+def test_policy_from_env():
+    policy = RetentionPolicy.from_env()
+    assert policy.enabled
+    assert policy.reencode_after_months == 12
+    assert policy.drop_derived_after_months is None
+    assert policy.throttle_seconds == 0
+
+
+@patch("backend.services.image_retention.get_db")
+def test_run_retention_is_noop_when_disabled(mock_get_db):
+    db, collections = _db([])
+    mock_get_db.return_value = db
+
+    run_retention(RetentionPolicy())
+
+    collections["background_jobs"].update_one.assert_not_called()
+    collections["monthly_consumptions"].find.assert_not_called()
+
+
+@patch("backend.services.image_retention.delete_file_from_db")
+@patch("backend.services.image_retention.release_file_from_db")
+@patch("backend.services.image_retention.open_file_from_db")
+@patch("backend.services.image_retention.get_db")
+def test_run_retention_drops_derived_files(mock_get_db, mock_open, mock_release, mock_delete):
+    label_text_id, rendition_id = ObjectId(), ObjectId()
+    reading = {"_id": ObjectId(), "date": datetime(2024, 1, 1), "original_file": ObjectId(),
+               "file_label_name": label_text_id, "renditions": {"x": {"thumbnail": rendition_id}}}
+    db, collections = _db([reading])
+    mock_get_db.return_value = db
+    mock_open.return_value = _stored(b"x" * 100)
+
+    run_retention(RetentionPolicy(drop_derived_after_months=6, throttle_seconds=0), now=datetime(2026, 10, 19))
+
+    mock_release.assert_called_once_with(label_text_id)
+    mock_delete.assert_called_once_with(rendition_id)
+    update = collections["monthly_consumptions"].update_one.call_args.args[1]
+    assert update == {"$set": {"file_label_name": None}, "$unset": {"renditions": ""}}
+    checkpoint = collections["background_jobs"].update_one.call_args_list[1].args[1]
+    assert checkpoint["$set"]["last_id"] == reading["_id"]
+    assert checkpoint["$inc"] == {"processed": 1, "bytes_reclaimed": 200}
+
+
+@pytest.fixture
+def local_store(mongo_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.setenv("BLOB_STORE_PATH", str(tmp_path))
+    for module in ("image_retention", "crud.crud_files", "blob_store", "db_client"):
+        monkeypatch.setattr(f"backend.services.{module}.get_db", lambda: mongo_db)
+    return mongo_db
+
+
+def _store_original(db, data, refcount):
+    original_id = get_blob_store().upload("meter.png", data, metadata={"contentType": "image/png"})
+    db["file_refs"].insert_one({"_id": hashlib.sha256(data).hexdigest(), "file_id": original_id,
+                                "refcount": refcount})
+    return original_id
+
+
+def test_run_retention_reencodes_old_originals(local_store):
+    db = local_store
+    original = _png()
+    original_id = _store_original(db, original, refcount=2)
+    # edited through PUT before file ids were kept as ObjectIds
+    edited = db["monthly_consumptions"].insert_one(
+        {"date": datetime(2024, 1, 1), "original_file": str(original_id)}).inserted_id
+    shared = db["monthly_consumptions"].insert_one(
+        {"date": datetime(2024, 2, 1), "original_file": original_id}).inserted_id
+
+    run_retention(RetentionPolicy(reencode_after_months=12, throttle_seconds=0), now=datetime(2026, 10, 19))
+
+    new_id = db["monthly_consumptions"].find_one({"_id": edited})["original_file"]
+    assert db["monthly_consumptions"].find_one({"_id": shared})["original_file"] == new_id
+    with open_file_from_db(str(new_id)) as stored_file:
+        assert stored_file.filename == "meter.jpg"
+        data = stored_file.read()
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape == (300, 400, 3)
+    with pytest.raises(NoObjectHasFoundException):
+        open_file_from_db(str(original_id))
+    # a new upload of the original photo does not deduplicate to the lossy copy
+    assert db["file_refs"].find_one({"_id": hashlib.sha256(original).hexdigest()}) is None
+    assert db["file_refs"].find_one({"_id": hashlib.sha256(data).hexdigest()}) == {
+        "_id": hashlib.sha256(data).hexdigest(), "file_id": new_id, "refcount": 2}
+    assert db["background_jobs"].find_one({"_id": "image_retention"})["bytes_reclaimed"] == len(original) - len(data)
+
+
+def test_run_retention_keeps_originals_referenced_by_a_pending_upload(local_store):
+    db = local_store
+    # one reference belongs to an upload that has not saved its reading yet
+    original_id = _store_original(db, _png(), refcount=2)
+    db["monthly_consumptions"].insert_one({"date": datetime(2024, 1, 1), "original_file": original_id})
+
+    run_retention(RetentionPolicy(reencode_after_months=12, throttle_seconds=0), now=datetime(2026, 10, 19))
+
+    assert get_file_from_db(original_id) == _png()
+    assert db["background_jobs"].find_one({"_id": "image_retention"})["bytes_reclaimed"] == 0
+
+
+def test_run_retention_stops_once_the_lease_is_lost(local_store):
+    db = local_store
+    original_id = _store_original(db, _png(), refcount=1)
+    db["monthly_consumptions"].insert_one({"date": datetime(2024, 1, 1), "original_file": original_id})
+    lease = MagicMock()
+    lease.check.side_effect = LeaseLostException("lost")
+
+    with pytest.raises(LeaseLostException):
+        run_retention(RetentionPolicy(reencode_after_months=12, throttle_seconds=0), now=datetime(2026, 10, 19),
+                      lease=lease)
+
+    assert get_file_from_db(original_id) == _png()
+    # left running for the worker that holds the lease now
+    assert db["background_jobs"].find_one({"_id": "image_retention"})["status"] == "running"
+
+
+@patch("backend.services.image_retention.save_bytes_to_db")
+@patch("backend.services.image_retention.open_file_from_db")
+@patch("backend.services.image_retention.get_db")
+def test_run_retention_keeps_originals_that_do_not_shrink(mock_get_db, mock_open, mock_save):
+    original_id = ObjectId()
+    small = cv2.imencode(".jpg", np.zeros((300, 400, 3), np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 10])[1].tobytes()
+    db, collections = _db([{"_id": ObjectId(), "date": datetime(2024, 1, 1), "original_file": original_id}])
+    mock_get_db.return_value = db
+    mock_open.return_value = _stored(small)
+
+    run_retention(RetentionPolicy(reencode_after_months=12, throttle_seconds=0), now=datetime(2026, 10, 19))
+
+    mock_save.assert_not_called()
+    collections["monthly_consumptions"].update_many.assert_called_once_with(
+        {"original_file": {"$in": [original_id, str(original_id)]}}, {"$set": {"original_reencoded": True}})
+
+
+@patch("backend.services.image_retention.get_db")
+def test_run_retention_resumes_running_job(mock_get_db):
+    last_id = ObjectId()
+    job = {"_id": "image_retention", "status": "running", "last_id": last_id,
+           "reencode_before": datetime(2025, 10, 19), "drop_derived_before": None}
+    db, collections = _db([], job=job)
+    mock_get_db.return_value = db
+
+    run_retention(RetentionPolicy(reencode_after_months=1, throttle_seconds=0), now=datetime(2026, 10, 19))
+
+    query = collections["monthly_consumptions"].find.call_args.args[0]
+    # the cutoff of the interrupted pass is kept, not recomputed from the new policy
+    assert query == {"date": {"$lt": datetime(2025, 10, 19)}, "_id": {"$gt": last_id}}
+
+
+@patch.dict("os.environ", {"RETENTION_DROP_DERIVED_AFTER_MONTHS": "6"}, clear=True)
+@patch("backend.services.image_retention.get_db")
+def test_get_retention_job(mock_get_db):
+    mock_get_db.return_value["background_jobs"].find_one.return_value = {
+        "_id": "image_retention", "status": "done", "processed": 3, "bytes_reclaimed": 10,
+        "total_bytes_reclaimed": 50, "started_at": "2026-10-19T00:00:00+00:00", "finished_at": None}
+
+    job = get_retention_job()
+
+    assert job.enabled
+    assert job.drop_derived_after_months == 6
+    assert job.status == "done"
+    assert job.total_bytes_reclaimed == 50
@@ -0,0 +1,8 @@
+from backend.services.inference_activity import request_inference, inference_busy
+
+
+def test_inference_busy_during_and_shortly_after_request():
+    with request_inference():
+        assert inference_busy(grace_seconds=0)
+    assert inference_busy(grace_seconds=60)
+    assert not inference_busy(grace_seconds=0)
@@ -0,0 +1,85 @@
+import sys
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from backend.services import inference_model
+
+
+@patch("backend.services.inference_model.gc")
+@patch("backend.services.model_registry.load_active_model")
+def test_preload_loads_on_one_thread_and_freezes(mock_load_active_model, mock_gc):
+    model = MagicMock()
+    mock_load_active_model.return_value = (model, "best-0123456789ab")
+    torch = MagicMock()
+    with patch.dict(sys.modules, {"torch": torch}):
+        inference_model.preload_model()
+
+    torch.set_num_threads.assert_called_once_with(1)
+    model.assert_called_once()
+    assert "warmup" in inference_model.load_timings
+    mock_gc.freeze.assert_called_once()
+
+
+@pytest.fixture
+def yolo():
+    ultralytics = MagicMock()
+    with patch.dict(sys.modules, {"ultralytics": ultralytics}):
+        yield ultralytics.YOLO
+
+
+@patch("backend.services.inference_model.save_artifact")
+def test_fuses_the_weights_and_writes_the_artifact(mock_save_artifact, yolo, tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+
+    model = inference_model.load_model(str(weights))
+
+    yolo.assert_called_once_with(str(weights))
+    model.fuse.assert_called_once()
+    mock_save_artifact.assert_called_once_with(model, inference_model.artifact_path(str(weights)))
+    assert {"load_weights", "fuse", "total"} <= inference_model.load_timings.keys()
+
+
+@patch("backend.services.inference_model.save_artifact")
+def test_loads_the_artifact_of_the_same_weights(mock_save_artifact, yolo, tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+    artifact = inference_model.artifact_path(str(weights))
+    open(artifact, "wb").close()
+
+    model = inference_model.load_model(str(weights))
+
+    yolo.assert_called_once_with(artifact)
+    model.fuse.assert_not_called()
+    mock_save_artifact.assert_not_called()
+
+    # new weights do not match the old artifact
+    weights.write_bytes(b"retrained")
+    assert inference_model.artifact_path(str(weights)) != artifact
+
+
+@patch("backend.services.inference_model.save_artifact")
+def test_falls_back_to_the_weights_when_the_artifact_is_unreadable(mock_save_artifact, yolo, tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+    open(inference_model.artifact_path(str(weights)), "wb").close()
+    yolo.side_effect = [RuntimeError("truncated"), MagicMock()]
+
+    inference_model.load_model(str(weights))
+
+    assert yolo.call_args_list[-1].args == (str(weights),)
+    mock_save_artifact.assert_called_once()
+
+
+@patch("backend.services.inference_model.os.cpu_count", return_value=8)
+def test_worker_threads_split_the_cpus(_, monkeypatch):
+    monkeypatch.delenv("INFERENCE_TORCH_THREADS", raising=False)
+    torch = MagicMock()
+    with patch.dict(sys.modules, {"torch": torch}):
+        assert inference_model.set_worker_threads(3) == 2
+        assert inference_model.set_worker_threads(16) == 1
+        monkeypatch.setenv("INFERENCE_TORCH_THREADS", "4")
+        assert inference_model.set_worker_threads(3) == 4
+
+    torch.set_num_threads.assert_called_with(4)
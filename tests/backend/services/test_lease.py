@@ -0,0 +1,95 @@
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.lease import Lease
+
+
+def test_acquire_takes_free_or_expired_lease():
+    collection = MagicMock()
+    collection.find_one_and_update.side_effect = lambda query, update, **kwargs: {"_id": query["_id"],
+                                                                                    **update["$set"]}
+    lease = Lease(collection, "m:lease", "worker-1", ttl=timedelta(seconds=30))
+
+    assert lease.acquire()
+    query, update = collection.find_one_and_update.call_args.args
+    assert query["$or"][0] == {"owner": "worker-1"}
+    assert "$lt" in query["$or"][1]["expires_at"]
+    assert update["$set"]["expires_at"] - update["$set"]["heartbeat_at"] == timedelta(seconds=30)
+    assert collection.find_one_and_update.call_args.kwargs["upsert"]
+
+
+def test_acquire_fails_while_another_owner_holds_it():
+    collection = MagicMock()
+    collection.find_one_and_update.side_effect = DuplicateKeyError("duplicate")
+
+    assert not Lease(collection, "m:lease", "worker-2").acquire()
+
+
+def test_renew_and_release_only_touch_own_lease():
+    collection = MagicMock()
+    collection.update_one.return_value.matched_count = 0
+    lease = Lease(collection, "m:lease", "worker-1")
+
+    assert not lease.renew()
+    assert collection.update_one.call_args.args[0] == {"_id": "m:lease", "owner": "worker-1"}
+    lease.release()
+    collection.delete_one.assert_called_once_with({"_id": "m:lease", "owner": "worker-1"})
+
+
+def test_heartbeat_renews_until_done():
+    collection = MagicMock()
+    collection.update_one.return_value.matched_count = 1
+    lease = Lease(collection, "m:lease", "worker-1", ttl=timedelta(seconds=0.03))
+
+    with lease.heartbeat():
+        time.sleep(0.1)
+    renewals = collection.update_one.call_count
+    time.sleep(0.05)
+
+    assert renewals >= 2
+    assert collection.update_one.call_count == renewals
+
+
+def test_heartbeat_retries_failed_renewals():
+    collection = MagicMock()
+    renewed = MagicMock(matched_count=1)
+    collection.update_one.side_effect = [ServerSelectionTimeoutError("blip"), renewed, renewed, renewed, renewed]
+    lease = Lease(collection, "m:lease", "worker-1", ttl=timedelta(seconds=0.3))
+
+    with lease.heartbeat():
+        time.sleep(0.25)
+
+    assert collection.update_one.call_count >= 2
+    assert not lease.lost.is_set()
+    lease.check()
+
+
+def test_heartbeat_marks_the_lease_lost_once_it_expired():
+    collection = MagicMock()
+    collection.update_one.side_effect = ServerSelectionTimeoutError("down")
+    lease = Lease(collection, "m:lease", "worker-1", ttl=timedelta(seconds=0.03))
+
+    with lease.heartbeat():
+        assert lease.lost.wait(1)
+
+    with pytest.raises(LeaseLostException):
+        lease.check()
+
+
+def test_heartbeat_marks_the_lease_lost_when_taken_over():
+    collection = MagicMock()
+    collection.update_one.return_value.matched_count = 0
+    lease = Lease(collection, "m:lease", "worker-1", ttl=timedelta(seconds=0.03))
+
+    with lease.heartbeat():
+        assert lease.lost.wait(1)
+
+    # acquiring it again starts over
+    collection.find_one_and_update.return_value = {"_id": "m:lease", "owner": "worker-1"}
+    assert lease.acquire()
+    lease.check()
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch, MagicMock
+
+from bson import ObjectId
+
+from backend.services.migration_progress import get_migration_progress
+
+
+def _db(records, remaining=0):
+    db = MagicMock()
+    migrations = MagicMock()
+    migrations.find.return_value.sort.return_value = records
+    collections = {"data_migrations": migrations, "monthly_consumptions": MagicMock()}
+    collections["monthly_consumptions"].count_documents.return_value = remaining
+    db.__getitem__.side_effect = collections.__getitem__
+    return db, collections
+
+
+@patch("backend.services.migration_progress.get_db")
+def test_progress_of_running_migration(mock_get_db):
+    last_id = ObjectId()
+    started_at = (datetime.now(timezone.utc) - timedelta(seconds=100)).isoformat()
+    db, collections = _db([{"_id": "20261019090000_detections_from_label_files", "status": "running",
+                            "processed": 200, "last_id": last_id, "started_at": started_at}], remaining=300)
+    mock_get_db.return_value = db
+
+    [progress] = get_migration_progress()
+
+    assert collections["data_migrations"].find.call_args.args[0] == {"kind": {"$ne": "lease"}}
+    collections["monthly_consumptions"].count_documents.assert_called_once_with({"_id": {"$gt": last_id}})
+    assert progress.remaining == 300
+    assert 1.9 < progress.docs_per_second <= 2.0
+    assert 150 <= progress.eta_seconds < 160
+
+
+@patch("backend.services.migration_progress.get_db")
+def test_progress_of_finished_and_unknown_migrations(mock_get_db):
+    db, collections = _db([
+        {"_id": "20261019090000_detections_from_label_files", "status": "done", "processed": 10,
+         "started_at": "2026-10-19T00:00:00+00:00", "finished_at": "2026-10-19T00:00:05+00:00"},
+        {"_id": "20200101000000_removed", "status": "failed", "processed": 0, "error": "boom"},
+    ])
+    mock_get_db.return_value = db
+
+    done, removed = get_migration_progress()
+
+    assert done.remaining == 0
+    assert done.docs_per_second == 2.0
+    assert done.eta_seconds is None
+    assert removed.remaining is None
+    assert removed.error == "boom"
+    collections["monthly_consumptions"].count_documents.assert_not_called()
@@ -0,0 +1,140 @@
+import json
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from backend.services import model_registry
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+
+
+@pytest.fixture(autouse=True)
+def registry_dir(tmp_path):
+    (tmp_path / "best.pt").write_bytes(b"v1 weights")
+    (tmp_path / "v2.pt").write_bytes(b"v2 weights")
+    (tmp_path / "v2.json").write_text(json.dumps({"map50": 0.97}))
+    # artifacts and other files are not versions
+    (tmp_path / "best-0123456789ab.fused.pt").write_bytes(b"fused")
+    with patch.object(model_registry, "MODEL_REGISTRY_DIR", str(tmp_path)), \
+            patch.object(model_registry, "_active", None), \
+            patch.object(model_registry, "_watcher_pid", 0), \
+            patch.object(model_registry, "watch_registry"), \
+            patch.dict(model_registry._swap, {"state": "idle", "target_version": None, "error": None}):
+        yield tmp_path
+
+
+def version_of(path):
+    return model_registry.model_version(str(path))
+
+
+@patch("backend.services.model_registry.get_db")
+def test_lists_versions_with_metadata(mock_get_db, registry_dir):
+    mock_get_db.return_value["model_registry"].find_one.return_value = None
+
+    models = model_registry.list_models()
+
+    assert [(model.name, model.active) for model in models] == [("best.pt", True), ("v2.pt", False)]
+    assert models[1].version == version_of(registry_dir / "v2.pt")
+    assert models[1].metadata == {"map50": 0.97}
+
+
+@patch("backend.services.model_registry.load_model")
+@patch("backend.services.model_registry.get_db")
+def test_loads_the_active_version_once(mock_get_db, mock_load_model, registry_dir):
+    mock_get_db.return_value["model_registry"].find_one.return_value = {
+        "active": {"name": "v2.pt", "version": version_of(registry_dir / "v2.pt")}}
+
+    model, version = model_registry.get_active_model()
+
+    assert model_registry.get_active_model() == (model, version)
+    assert version == version_of(registry_dir / "v2.pt")
+    mock_load_model.assert_called_once_with(str(registry_dir / "v2.pt"))
+
+
+@patch("backend.services.model_registry._executor")
+@patch("backend.services.model_registry.warm_up")
+@patch("backend.services.model_registry.load_model")
+@patch("backend.services.model_registry.get_db")
+def test_activate_swaps_after_warm_up_and_records_history(mock_get_db, mock_load_model, mock_warm_up, mock_executor,
+                                                          registry_dir):
+    collection = mock_get_db.return_value["model_registry"]
+    collection.find_one.return_value = None
+    old_model = MagicMock()
+    model_registry._active = (old_model, version_of(registry_dir / "best.pt"))
+    mock_executor.submit.side_effect = lambda func, *args: func(*args)
+
+    model_registry.activate_model("v2.pt")
+
+    new_model = mock_load_model.return_value
+    mock_warm_up.assert_called_once_with(new_model)
+    assert model_registry._active == (new_model, version_of(registry_dir / "v2.pt"))
+    update = collection.update_one.call_args.args[1]
+    assert update["$set"]["active"]["name"] == "v2.pt"
+    assert update["$push"]["history"]["version"] == version_of(registry_dir / "best.pt")
+    assert model_registry.get_model_swap().state == "idle"
+
+
+@patch("backend.services.model_registry._executor")
+@patch("backend.services.model_registry.warm_up", side_effect=RuntimeError("bad weights"))
+@patch("backend.services.model_registry.load_model")
+@patch("backend.services.model_registry.get_db")
+def test_failed_swap_keeps_the_current_model(mock_get_db, mock_load_model, mock_warm_up, mock_executor, registry_dir):
+    collection = mock_get_db.return_value["model_registry"]
+    collection.find_one.return_value = None
+    current = (MagicMock(), version_of(registry_dir / "best.pt"))
+    model_registry._active = current
+    mock_executor.submit.side_effect = lambda func, *args: func(*args)
+
+    model_registry.activate_model("v2.pt")
+
+    assert model_registry._active == current
+    collection.update_one.assert_not_called()
+    swap = model_registry.get_model_swap()
+    assert (swap.state, swap.error) == ("failed", "bad weights")
+
+
+@patch("backend.services.model_registry._start_swap")
+@patch("backend.services.model_registry.get_db")
+def test_activating_the_active_version_changes_nothing(mock_get_db, mock_start_swap, registry_dir):
+    mock_get_db.return_value["model_registry"].find_one.return_value = {
+        "active": {"name": "v2.pt", "version": version_of(registry_dir / "v2.pt")}, "history": []}
+
+    model_registry.activate_model("v2.pt")
+
+    mock_start_swap.assert_not_called()
+    assert model_registry.get_model_swap().state == "idle"
+
+    # the default model is active until another version has been activated
+    mock_get_db.return_value["model_registry"].find_one.return_value = None
+    model_registry.activate_model("best.pt")
+
+    mock_start_swap.assert_not_called()
+
+
+@patch("backend.services.model_registry._start_swap")
+@patch("backend.services.model_registry.get_db")
+def test_rollback_goes_to_the_previous_version(mock_get_db, mock_start_swap, registry_dir):
+    best = {"name": "best.pt", "version": version_of(registry_dir / "best.pt")}
+    mock_get_db.return_value["model_registry"].find_one.return_value = {
+        "active": {"name": "v2.pt", "version": version_of(registry_dir / "v2.pt")}, "history": [best]}
+
+    model_registry.rollback_model()
+
+    mock_start_swap.assert_called_once_with("best.pt", best["version"], {"$pop": {"history": 1}})
+
+
+@patch("backend.services.model_registry.get_db")
+def test_rollback_needs_the_same_weights(mock_get_db, registry_dir):
+    collection = mock_get_db.return_value["model_registry"]
+    collection.find_one.return_value = None
+    with pytest.raises(NoObjectHasFoundException):
+        model_registry.rollback_model()
+
+    collection.find_one.return_value = {"history": [{"name": "best.pt", "version": "best-000000000000"}]}
+    with pytest.raises(NoObjectHasFoundException):
+        model_registry.rollback_model()
+
+
+def test_rejects_names_outside_the_registry():
+    for name in ("missing.pt", "../best.pt", "best-0123456789ab.fused.pt"):
+        with pytest.raises(NoObjectHasFoundException):
+            model_registry.model_path(name)
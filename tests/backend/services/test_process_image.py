@@ -0,0 +1,74 @@
+from io import BytesIO
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from starlette.datastructures import UploadFile
+
+from backend.services.exception.ResultIsAlreadyExistsException import ResultIsAlreadyExistsException
+from backend.services.exception.ResultIsNotFoundException import ResultIsNotFoundException
+from backend.services.process_image import ProcessImage
+
+
+def _model(*boxes):
+    """boxes of (class, conf, x center)"""
+    result = MagicMock()
+    result.obb.xywhr = np.array([[x, 10, 10, 20, 0] for _, _, x in boxes], np.float32).reshape(-1, 5)
+    result.obb.conf = np.array([conf for _, conf, _ in boxes], np.float32)
+    result.obb.cls = np.array([cls for cls, _, _ in boxes], np.float32)
+    model = MagicMock(return_value=[result])
+    model.names = {i: str(i) for i in range(10)}
+    return model
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch("backend.services.process_image.check_image_quality"):
+        yield UploadFile(BytesIO(b"jpeg-bytes"), filename="meter.jpg")
+
+
+@patch("backend.services.process_image.crud_monthly_consumption")
+@patch("backend.services.process_image.crud_files")
+@patch("backend.services.process_image.get_active_model")
+def test_process_image_saves_reading(mock_model, mock_files, mock_consumption, upload, tmp_path):
+    mock_model.return_value = _model((1, 0.9, 10), (2, 0.9, 30)), "best-abc"
+    mock_files.save_file_to_db.return_value = ObjectId()
+
+    result = ProcessImage().process_image(upload)
+
+    saved = mock_consumption.save_monthly_consumption_to_db.call_args.args[0]
+    assert saved.total_kwh_consumed == 12.0
+    assert saved.original_file == mock_files.save_file_to_db.return_value
+    assert result == mock_consumption.get_monthly_consumption_from_db.return_value
+    mock_files.release_file_from_db.assert_not_called()
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch("backend.services.process_image.crud_monthly_consumption")
+@patch("backend.services.process_image.crud_files")
+@patch("backend.services.process_image.get_active_model")
+def test_process_image_releases_file_of_a_rejected_reading(mock_model, mock_files, mock_consumption, upload,
+                                                           tmp_path):
+    mock_model.return_value = _model((1, 0.9, 10)), "best-abc"
+    mock_files.save_file_to_db.return_value = ObjectId()
+    mock_consumption.save_monthly_consumption_to_db.side_effect = ResultIsAlreadyExistsException()
+
+    with pytest.raises(ResultIsAlreadyExistsException):
+        ProcessImage().process_image(upload)
+
+    mock_files.release_file_from_db.assert_called_once_with(mock_files.save_file_to_db.return_value)
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch("backend.services.process_image.crud_files")
+@patch("backend.services.process_image.get_active_model")
+def test_process_image_removes_temp_file_when_nothing_is_read(mock_model, mock_files, upload, tmp_path):
+    mock_model.return_value = _model(), "best-abc"
+
+    with pytest.raises(ResultIsNotFoundException):
+        ProcessImage().process_image(upload)
+
+    mock_files.save_file_to_db.assert_not_called()
+    assert list(tmp_path.iterdir()) == []
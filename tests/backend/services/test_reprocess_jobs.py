@@ -0,0 +1,116 @@
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import cv2
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from backend.services import model_registry
+from backend.services.exception.LeaseLostException import LeaseLostException
+from backend.services.exception.NoObjectHasFoundException import NoObjectHasFoundException
+from backend.services.reprocess_jobs import request_reprocess, model_version, _process_batch, run_reprocess_job
+
+
+def _result(*boxes):
+    """boxes of (class, conf, x center)"""
+    result = MagicMock()
+    result.obb.xywhr = np.array([[x, 10, 10, 20, 0] for _, _, x in boxes], np.float32).reshape(-1, 5)
+    result.obb.conf = np.array([conf for _, conf, _ in boxes], np.float32)
+    result.obb.cls = np.array([cls for cls, _, _ in boxes], np.float32)
+    return result
+
+
+def _model(*results):
+    model = MagicMock(side_effect=lambda images, **kwargs: list(results)[:len(images)])
+    model.names = {i: str(i) for i in range(10)}
+    return model
+
+
+def test_model_version_tags_file_content(tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+
+    version = model_version(str(weights))
+
+    assert version.startswith("best-")
+    assert "." not in version
+    weights.write_bytes(b"retrained")
+    assert model_version(str(weights)) != version
+
+
+@pytest.mark.parametrize("name", ["../secrets.pt", "missing.pt", "best.txt"])
+def test_request_reprocess_rejects_unknown_models(name):
+    with pytest.raises(NoObjectHasFoundException):
+        request_reprocess(name)
+
+
+@patch("backend.services.reprocess_jobs._executor")
+@patch("backend.services.reprocess_jobs.get_db")
+def test_request_reprocess_queues_job(mock_get_db, mock_executor, tmp_path):
+    (tmp_path / "v2.pt").write_bytes(b"weights")
+
+    with patch.object(model_registry, "MODEL_REGISTRY_DIR", str(tmp_path)):
+        job = request_reprocess("v2.pt")
+
+    assert job["status"] == "queued"
+    assert job["model_version"].startswith("v2-")
+    mock_get_db.return_value["reprocess_jobs"].insert_one.assert_called_once_with(job)
+    mock_executor.submit.assert_called_once_with(run_reprocess_job, job["_id"])
+
+
+@patch("backend.services.reprocess_jobs.get_file_from_db")
+@patch("backend.services.reprocess_jobs.get_db")
+def test_process_batch_stores_results_and_diffs(mock_get_db, mock_get_file):
+    image = cv2.imencode(".png", np.zeros((40, 60, 3), np.uint8))[1].tobytes()
+    mock_get_file.return_value = image
+    job = {"_id": ObjectId(), "model_version": "v2-abc"}
+    same = {"_id": ObjectId(), "original_file": "a", "total_kwh_consumed": 12.0, "score": 0.9,
+            "date": datetime(2026, 1, 1)}
+    changed = {"_id": ObjectId(), "original_file": "b", "total_kwh_consumed": 17.0, "score": 0.8,
+               "date": datetime(2026, 2, 1)}
+    collection = MagicMock()
+    model = _model(_result((2, 0.9, 30), (1, 0.7, 0), (5, 0.2, 15)), _result((1, 0.6, 0), (8, 0.8, 20)))
+
+    changed_count = _process_batch([same, changed], job, collection, model)
+
+    assert changed_count == 1
+    assert len(model.call_args.args[0]) == 2
+    operations = collection.bulk_write.call_args.args[0]
+    result = operations[0]._doc["$set"]["model_results.v2-abc"]
+    assert result["total_kwh_consumed"] == 12.0
+    assert result["conf_chars"] == "12"
+    assert len(result["raw_detections"]["conf"]) == 3 * 4
+    [diff] = mock_get_db.return_value["reprocess_diffs"].insert_many.call_args.args[0]
+    assert diff["reading_id"] == changed["_id"]
+    assert (diff["old_value"], diff["new_value"]) == (17.0, 18.0)
+
+
+@patch("backend.services.reprocess_jobs.get_file_from_db", side_effect=NoObjectHasFoundException())
+def test_process_batch_skips_missing_originals(mock_get_file):
+    collection = MagicMock()
+    model = _model()
+
+    assert _process_batch([{"_id": ObjectId(), "original_file": "gone"}], {"_id": ObjectId()}, collection, model) == 0
+
+    model.assert_not_called()
+    collection.bulk_write.assert_not_called()
+
+
+@patch("backend.services.reprocess_jobs.load_model")
+@patch("backend.services.reprocess_jobs.Lease")
+@patch("backend.services.reprocess_jobs.get_db")
+def test_run_reprocess_job_stops_once_the_lease_is_lost(mock_get_db, mock_lease, mock_load_model):
+    job_id = ObjectId()
+    jobs = mock_get_db.return_value["reprocess_jobs"]
+    jobs.find_one_and_update.return_value = {"_id": job_id, "model_path": "v2.pt", "last_id": None}
+    lease = mock_lease.return_value
+    lease.acquire.return_value = True
+    lease.check.side_effect = LeaseLostException("lost")
+
+    run_reprocess_job(job_id)
+
+    # left running for the worker that holds the lease now
+    jobs.update_one.assert_not_called()
+    mock_get_db.return_value["monthly_consumptions"].find.assert_not_called()
+    lease.release.assert_called_once()
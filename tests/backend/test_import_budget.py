@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# modules only inference (uploads, reprocessing, the detection backfill) may load
+ML_MODULES = ("torch", "ultralytics")
+# torch alone takes several seconds, the API without it about one
+IMPORT_BUDGET_SECONDS = 3.0
+
+
+def import_in_fresh_interpreter(module):
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'seconds': time.perf_counter() - started, 'modules': sorted(sys.modules)}))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", [
+    "backend.main",
+    "backend.services.crud.crud_monthly_consumption",
+    "backend.api.settings_routes",
+    "backend.api.price_routes",
+])
+def test_does_not_import_the_ml_stack(module):
+    loaded = import_in_fresh_interpreter(module)["modules"]
+
+    assert [name for name in ML_MODULES if name in loaded] == []
+
+
+def test_api_imports_within_budget():
+    assert import_in_fresh_interpreter("backend.main")["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,21 @@
+from unittest.mock import patch
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from backend import main
+
+
+@patch("backend.main.time.sleep")
+@patch("backend.main.create_export_job_indexes")
+@patch("backend.main.create_file_ref_indexes")
+@patch("backend.main.create_monthly_consumption_indexes")
+def test_create_indexes_retries_until_mongo_is_reachable(mock_consumption_indexes, mock_file_ref_indexes,
+                                                         mock_export_job_indexes, mock_sleep):
+    mock_consumption_indexes.side_effect = [ServerSelectionTimeoutError("not yet"), None]
+
+    main.create_indexes()
+
+    assert mock_consumption_indexes.call_count == 2
+    mock_sleep.assert_called_once_with(main.INDEX_RETRY_SECONDS)
+    mock_file_ref_indexes.assert_called_once()
+    mock_export_job_indexes.assert_called_once()